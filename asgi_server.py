@@ -0,0 +1,159 @@
+"""ASGI entry point for the triage model server.
+
+/predict and /healthz are served natively: the request coroutine awaits
+the micro-batcher's Future, so thousands of in-flight predictions need
+no request threads. /ingest is native too: each body chunk a monitor
+gateway sends is applied and scored as one batch, and updates stream back
+on the same connection. Every other route is delegated to the Flask app
+through asgiref's WsgiToAsgi adapter.
+
+    uvicorn asgi_server:app --workers 4      (or: python serve.py --asgi)
+"""
+import asyncio
+import json
+
+import model_server
+from instrumentation import stage
+from model_serving import PREDICT_TIMEOUT_S
+from model_server import (feature_row, get_router, get_vitals_state, init_worker, predict_matrix,
+                          prediction_payload, shutdown_worker)
+from vitals_stream import IngestSession
+from wire_format import (BINARY_MIMETYPE, FEATURE_ORDER, FEATURE_ORDER_HEADER, check_feature_order, decode_rows,
+                         encode_probs)
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+    _wsgi_fallback = WsgiToAsgi(model_server.app)
+except ImportError:
+    _wsgi_fallback = None
+
+async def _read_body(receive):
+    body, more = b"", True
+    while more:
+        message = await receive()
+        body += message.get("body", b"")
+        more = message.get("more_body", False)
+    return body
+
+async def _send_json(send, payload, status=200, headers=()):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def _predict(scope, receive, send):
+    headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+    if headers.get("content-type", "").split(";")[0].strip() == BINARY_MIMETYPE:
+        await _predict_binary(headers, receive, send)
+        return
+    try:
+        body = await _read_body(receive)
+        with stage("json_parse"):
+            data = json.loads(body or b"{}")
+        x = feature_row(data)
+    except (ValueError, TypeError, AttributeError) as e:
+        await _send_json(send, {"error": str(e)}, 400)
+        return
+    future, version = get_router().submit(x, headers.get("x-model-slot"), headers.get("x-route-key"))
+    try:
+        prob = await asyncio.wait_for(asyncio.wrap_future(future), PREDICT_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        await _send_json(send, {"error": "prediction timed out"}, 503)
+        return
+    await _send_json(send, prediction_payload(x, float(prob), version, data.get("explain")),
+                     headers=[(b"x-model-version", version.encode())])
+
+async def _predict_binary(headers, receive, send):
+    try:
+        body = await _read_body(receive)
+        with stage("json_parse"):
+            check_feature_order(headers.get(FEATURE_ORDER_HEADER.lower()))
+            X = decode_rows(body)
+        if len(X) != 1:
+            raise ValueError("/predict takes exactly one row; use /predict_batch")
+    except ValueError as e:
+        await _send_json(send, {"error": str(e)}, 400)
+        return
+    future, version = get_router().submit(X[0], headers.get("x-model-slot"), headers.get("x-route-key"))
+    try:
+        prob = await asyncio.wait_for(asyncio.wrap_future(future), PREDICT_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        await _send_json(send, {"error": "prediction timed out"}, 503)
+        return
+    body = encode_probs([prob])
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", BINARY_MIMETYPE.encode()), (b"content-length", str(len(body)).encode()),
+                    (b"x-model-version", version.encode()),
+                    (FEATURE_ORDER_HEADER.lower().encode(), FEATURE_ORDER.encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def _ingest(scope, receive, send):
+    headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+    requested, route_key = headers.get("x-model-slot"), headers.get("x-route-key")
+    loop = asyncio.get_running_loop()
+    session = IngestSession(get_vitals_state(), lambda X: predict_matrix(X, requested, route_key))
+
+    def process(lines, final):
+        updates = []
+        for line in lines:
+            updates.extend(session.feed(line))
+        updates.extend(session.flush())
+        if final:
+            # Always non-empty, so the last send closes the response
+            updates.append({"summary": session.summary()})
+        return "".join(json.dumps(u, ensure_ascii=False) + "\n" for u in updates).encode("utf-8")
+
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/x-ndjson")]})
+    tail, more = b"", True
+    while more:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+        more = message.get("more_body", False)
+        *lines, tail = (tail + message.get("body", b"")).split(b"\n")
+        if not more:
+            lines.append(tail)
+        # Parsing and the forward pass run off the event loop
+        body = await loop.run_in_executor(None, process, lines, not more)
+        if body:
+            await send({"type": "http.response.body", "body": body, "more_body": more})
+
+async def _lifespan(receive, send):
+    loop = asyncio.get_running_loop()
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Load the model in this worker process before accepting traffic
+            await loop.run_in_executor(None, init_worker)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # Drain queued predictions and explanation jobs
+            await loop.run_in_executor(None, shutdown_worker)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    route = (scope["method"], scope["path"])
+    if route == ("POST", "/predict"):
+        await _predict(scope, receive, send)
+    elif route == ("POST", "/ingest"):
+        await _ingest(scope, receive, send)
+    elif route == ("GET", "/healthz"):
+        await _send_json(send, {"status": "ok", "model_loaded": True, "pid": init_worker()["pid"]})
+    elif _wsgi_fallback is not None:
+        await _wsgi_fallback(scope, receive, send)
+    else:
+        await _send_json(send, {"error": "route needs asgiref (pip install asgiref)"}, 404)
@@ -0,0 +1,184 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# =========================
+# Configuration
+# =========================
+
+BATCH_MAX_SIZE = int(os.environ.get("TRIAGE_BATCH_MAX_SIZE", "64"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("TRIAGE_BATCH_MAX_WAIT_MS", "2.0"))
+
+# Histogram bucket upper bounds
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+QUEUE_WAIT_BUCKETS_MS = [0.1, 0.5, 1, 2, 5, 10, 25, 50, 100]
+
+# =========================
+# Batch Metrics
+# =========================
+
+class BatchMetrics:
+    """Thread-safe counters for batch size and queue wait"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.queue_wait_counts = [0] * (len(QUEUE_WAIT_BUCKETS_MS) + 1)
+        self.queue_wait_total_ms = 0.0
+        self.queue_wait_max_ms = 0.0
+        self.max_batch_size = 0
+
+    def record_batch(self, size, waits_ms):
+        with self._lock:
+            self.batches += 1
+            self.requests += size
+            self.max_batch_size = max(self.max_batch_size, size)
+            self.batch_size_counts[_bucket_index(BATCH_SIZE_BUCKETS, size)] += 1
+            for wait in waits_ms:
+                self.queue_wait_counts[_bucket_index(QUEUE_WAIT_BUCKETS_MS, wait)] += 1
+                self.queue_wait_total_ms += wait
+                if wait > self.queue_wait_max_ms:
+                    self.queue_wait_max_ms = wait
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "batch_size_histogram": _histogram(BATCH_SIZE_BUCKETS, self.batch_size_counts),
+                "mean_queue_wait_ms": self.queue_wait_total_ms / self.requests if self.requests else 0.0,
+                "max_queue_wait_ms": self.queue_wait_max_ms,
+                "queue_wait_histogram_ms": _histogram(QUEUE_WAIT_BUCKETS_MS, self.queue_wait_counts),
+            }
+
+def _bucket_index(bounds, value):
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            return i
+    return len(bounds)
+
+def _histogram(bounds, counts):
+    labels = [f"<={b}" for b in bounds] + [f">{bounds[-1]}"]
+    return dict(zip(labels, counts))
+
+# =========================
+# Dynamic Micro-Batcher
+# =========================
+
+class MicroBatcher:
+    """Collect concurrent single-row requests into one matrix per forward pass.
+
+    `predict_fn` receives an (n, n_features) float32 matrix and must return n
+    probabilities. A batch is dispatched once it holds `max_batch_size` rows or
+    the oldest row has waited `max_wait_ms`, whichever comes first.
+    """
+
+    def __init__(self, predict_fn, n_features, max_batch_size=BATCH_MAX_SIZE,
+                 max_wait_ms=BATCH_MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.n_features = n_features
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.metrics = BatchMetrics()
+        self._queue = queue.Queue()
+        self._closed = False
+        # Makes the closed check + put atomic with close(), so no row can
+        # be queued behind the sentinel
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, row):
+        """Queue one feature row; returns a Future resolving to its probability"""
+        row = np.asarray(row, dtype=np.float32)
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((row, time.perf_counter(), future))
+        return future
+
+    def predict(self, row, timeout=None):
+        """Blocking single-row prediction through the shared batch"""
+        return self.submit(row).result(timeout=timeout)
+
+    def close(self):
+        """Stop accepting work and drain pending requests"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join()
+
+    def stats(self):
+        stats = self.metrics.snapshot()
+        stats["pending"] = self._queue.qsize()
+        stats["max_batch_size_config"] = self.max_batch_size
+        stats["max_wait_ms_config"] = self.max_wait * 1000.0
+        return stats
+
+    def _collect(self, first):
+        items = [first]
+        deadline = first[1] + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Re-queue the sentinel so the run loop exits after this batch
+                self._queue.put(None)
+                break
+            items.append(item)
+        return items
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._fail_remaining()
+                return
+            items = self._collect(first)
+
+            X = np.empty((len(items), self.n_features), dtype=np.float32)
+            for i, (row, _, _) in enumerate(items):
+                X[i] = row
+            started = time.perf_counter()
+            waits_ms = [(started - enqueued) * 1000.0 for _, enqueued, _ in items]
+
+            try:
+                probs = np.asarray(self.predict_fn(X), dtype=np.float64).ravel()
+            except Exception as e:
+                for _, _, future in items:
+                    future.set_exception(e)
+                continue
+
+            if len(probs) != len(items):
+                error = ValueError(f"predict_fn returned {len(probs)} probabilities for {len(items)} rows")
+                for _, _, future in items:
+                    future.set_exception(error)
+                continue
+
+            self.metrics.record_batch(len(items), waits_ms)
+            for (_, _, future), prob in zip(items, probs):
+                future.set_result(float(prob))
+
+    def _fail_remaining(self):
+        """Fail anything still queued behind the sentinel so no caller waits forever"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[2].set_exception(RuntimeError("MicroBatcher is closed"))
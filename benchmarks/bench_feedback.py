@@ -0,0 +1,147 @@
+"""Feedback store append and scan throughput at increasing log sizes.
+
+Synthetic records have the shape main.save_feedback writes to
+feedback_log.jsonl. For every store and size the log is built from
+scratch in a temporary directory with batched append_many calls, then
+scanned three ways: iter_records (full record decode),
+iter_feature_chunks (the streaming retrain path) and a cold
+FeedbackAnalytics.update (the /analytics path).
+
+    python benchmarks/bench_feedback.py [--stores jsonl,sqlite,parquet] [--sizes 10000,1000000,10000000]
+
+The 10M size writes several GB per store; pass smaller --sizes for a quick run.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import common  # noqa: F401  (puts the repo on sys.path)
+from feedback_analytics import FeedbackAnalytics
+from feedback_store import STORES
+from triage_rules import FEATURES, risk_level
+
+SIZES = [10_000, 1_000_000, 10_000_000]
+APPEND_BATCH = 10_000
+
+CLINICIAN_DECISIONS = ["CRITICAL", "URGENT", "STANDARD", None]
+SIGNALS = ["low oxygen level", "severe pain", "prolonged waiting time", "tachycardia", "fever"]
+
+def synthetic_records(n, seed=0, batch_size=APPEND_BATCH, start=datetime(2026, 1, 1)):
+    """Yield lists of feedback records shaped like save_feedback's output"""
+    rng = np.random.default_rng(seed)
+    for offset in range(0, n, batch_size):
+        m = min(batch_size, n - offset)
+        vitals = np.column_stack([
+            rng.integers(1, 95, m),
+            rng.integers(40, 180, m),
+            rng.integers(80, 101, m),
+            np.round(rng.uniform(35.0, 41.0, m), 1),
+            rng.integers(0, 11, m),
+            rng.integers(0, 240, m),
+            rng.integers(0, 4, m),
+        ])
+        probs = rng.random(m)
+        decisions = rng.integers(0, len(CLINICIAN_DECISIONS), m)
+        n_signals = rng.integers(0, 4, m)
+        batch = []
+        for i in range(m):
+            decision = risk_level(probs[i])
+            clinician = CLINICIAN_DECISIONS[decisions[i]]
+            batch.append({
+                "timestamp": (start + timedelta(seconds=offset + i)).isoformat(),
+                "model_version": "v2.0",
+                "patient_data": {k: v.item() for k, v in zip(FEATURES, vitals[i])},
+                "ai_risk_probability": float(probs[i]),
+                "ai_decision": decision,
+                "ai_signals": SIGNALS[:n_signals[i]],
+                "ai_explanation": f"Predicted risk probability {probs[i]:.2f}. Decision: {decision}.",
+                "clinician_decision": clinician,
+                "clinician_notes": None,
+                "agreement": clinician == decision if clinician else None,
+            })
+        yield batch
+
+def _store_size_bytes(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+def bench_store(kind, n, workdir):
+    cls, default_path = STORES[kind]
+    path = os.path.join(workdir, f"{kind}-{n}-{os.path.basename(default_path)}")
+    store = cls(path)
+
+    append_s = 0.0
+    for batch in synthetic_records(n):
+        start = time.perf_counter()
+        store.append_many(batch)
+        append_s += time.perf_counter() - start
+
+    start = time.perf_counter()
+    scanned = sum(1 for _ in store.iter_records())
+    scan_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    feature_rows = sum(len(X) for X, _ in store.iter_feature_chunks())
+    features_s = time.perf_counter() - start
+
+    analytics = FeedbackAnalytics(store, checkpoint_path=None)
+    start = time.perf_counter()
+    analytics.update()
+    analytics_s = time.perf_counter() - start
+
+    size_mb = _store_size_bytes(path) / 1e6
+    store.close()
+    if scanned != n or feature_rows != n:
+        raise RuntimeError(f"{kind}: wrote {n} records, scanned {scanned} / {feature_rows}")
+    return {
+        "store": kind,
+        "records": n,
+        "size_mb": round(size_mb, 1),
+        "append_records_per_s": round(n / append_s, 1),
+        "scan_records_per_s": round(n / scan_s, 1),
+        "feature_scan_records_per_s": round(n / features_s, 1),
+        "analytics_records_per_s": round(n / analytics_s, 1),
+        "append_s": round(append_s, 3),
+        "scan_s": round(scan_s, 3),
+    }
+
+def run(stores=tuple(STORES), sizes=SIZES, workdir=None):
+    print(f"Feedback store benchmark (sizes {', '.join(f'{n:,}' for n in sizes)})\n")
+    print(f"  {'store':<8} {'records':>11} {'append/s':>11} {'scan/s':>11} {'features/s':>11} {'MB':>8}")
+    results = {"runs": []}
+    for kind in stores:
+        for n in sizes:
+            with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+                try:
+                    r = bench_store(kind, n, tmp)
+                except ImportError as e:
+                    # parquet needs pyarrow
+                    r = {"store": kind, "records": n, "skipped": str(e)}
+                    print(f"  {kind:<8} {n:>11,} skipped: {e}")
+                    results["runs"].append(r)
+                    break
+            results["runs"].append(r)
+            print(f"  {kind:<8} {n:>11,} {r['append_records_per_s']:>11,.0f} {r['scan_records_per_s']:>11,.0f} "
+                  f"{r['feature_scan_records_per_s']:>11,.0f} {r['size_mb']:>8.1f}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stores", default=",".join(STORES), help="comma-separated store kinds")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in SIZES), help="comma-separated record counts")
+    parser.add_argument("--workdir", help="directory for the temporary stores (default: system temp)")
+    parser.add_argument("--json", help="write results to this path")
+    args = parser.parse_args()
+
+    results = run(args.stores.split(","), [int(n) for n in args.sizes.split(",")], args.workdir)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0)
@@ -0,0 +1,114 @@
+"""Inference latency and throughput for every serving backend.
+
+Each backend runs in its own spawned process (TensorFlow state and BLAS
+pools stay isolated) and reports single-row p50/p99 latency plus rows/s
+at several batch sizes. Backends whose artifacts or libraries are missing
+are reported as skipped. The end-to-end main.predict_patient path
+(feature assembly, signals, no explanation, cache off) is timed too.
+
+    python benchmarks/bench_inference.py [--backends numpy,rf] [--json out.json]
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+
+import numpy as np
+
+from common import REPO_ROOT, latency_stats, time_calls
+
+BACKENDS = ["keras", "tflite", "numpy", "bundle", "rf", "hgb"]
+BATCH_SIZES = [1, 32, 256, 4096]
+SINGLE_ROW_RUNS = 500
+# Each batch size scores about this many rows, within the call bounds
+BATCH_ROWS_TARGET = 50000
+BATCH_CALLS = (3, 100)
+
+def _rows(n, seed=0):
+    from inference_backends import sample_rows
+    X = sample_rows(n, os.path.join(REPO_ROOT, "triage_synthetic_dataset.csv"), seed)
+    return np.resize(X, (n, X.shape[1])).astype(np.float32)
+
+def bench_backend(name, single_row_runs=SINGLE_ROW_RUNS, batch_sizes=BATCH_SIZES):
+    """Latency/throughput for one backend (runs inside a fresh process)"""
+    os.chdir(REPO_ROOT)
+    from inference_backends import load_backend
+
+    try:
+        backend = load_backend(name)
+    except (RuntimeError, ImportError, OSError) as e:
+        return {"backend": name, "skipped": str(e)}
+
+    X = _rows(max(batch_sizes))
+    backend.predict(X[:1])
+    rows = iter(range(single_row_runs))
+    result = {"backend": name, "single_row": latency_stats(
+        time_calls(lambda: backend.predict(X[next(rows) % len(X)][None]), single_row_runs)
+    )}
+
+    batches = {}
+    for size in batch_sizes:
+        batch = X[:size]
+        backend.predict(batch)
+        repeat = min(max(BATCH_ROWS_TARGET // size, BATCH_CALLS[0]), BATCH_CALLS[1])
+        timings = time_calls(lambda: backend.predict(batch), repeat)
+        batches[str(size)] = {
+            "rows_per_s": round(size / float(np.median(timings)), 1),
+            **latency_stats(timings),
+        }
+    result["batches"] = batches
+    return result
+
+def bench_predict_patient(runs=SINGLE_ROW_RUNS):
+    """End-to-end main.predict_patient latency with the default backend"""
+    os.chdir(REPO_ROOT)
+    os.environ["TRIAGE_PREDICT_CACHE_SIZE"] = "0"
+    import main
+    from inference_backends import resolve_backend
+    from triage_rules import FEATURES
+
+    try:
+        main.load_model_for_inference()
+    except (RuntimeError, ImportError, OSError) as e:
+        return {"skipped": str(e)}
+    patients = [dict(zip(FEATURES, row.tolist())) for row in _rows(runs, seed=1)]
+    rows = iter(patients)
+    main.predict_patient(patients[0], explanation="none")
+    timings = time_calls(lambda: main.predict_patient(next(rows), explanation="none"), runs)
+    return {"backend": resolve_backend(), **latency_stats(timings)}
+
+def run(backends=BACKENDS, single_row_runs=SINGLE_ROW_RUNS, batch_sizes=BATCH_SIZES):
+    print(f"Inference benchmark ({single_row_runs} single-row calls, batches {batch_sizes})\n")
+    context = mp.get_context("spawn")
+    results = {"backends": []}
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for name in backends:
+            r = pool.apply(bench_backend, (name, single_row_runs, batch_sizes))
+            results["backends"].append(r)
+            if "skipped" in r:
+                print(f"  {name:<7} skipped: {r['skipped']}")
+                continue
+            largest = r["batches"][str(batch_sizes[-1])]
+            print(f"  {name:<7} p50 {r['single_row']['p50_ms']:.3f} ms  p99 {r['single_row']['p99_ms']:.3f} ms  "
+                  f"{largest['rows_per_s']:.0f} rows/s @ {batch_sizes[-1]}")
+        results["predict_patient"] = pool.apply(bench_predict_patient, (single_row_runs,))
+    pp = results["predict_patient"]
+    if "skipped" in pp:
+        print(f"  predict_patient skipped: {pp['skipped']}")
+    else:
+        print(f"  predict_patient ({pp['backend']}) p50 {pp['p50_ms']:.3f} ms  p99 {pp['p99_ms']:.3f} ms")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="comma-separated backend names")
+    parser.add_argument("--runs", type=int, default=SINGLE_ROW_RUNS, help="single-row calls per backend")
+    parser.add_argument("--json", help="write results to this path")
+    args = parser.parse_args()
+
+    results = run(args.backends.split(","), args.runs)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0)
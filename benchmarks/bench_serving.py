@@ -0,0 +1,83 @@
+"""/predict throughput against a locally launched server.
+
+Starts `serve.py` on a free port with the given backend and worker count,
+waits for /healthz, runs the closed-loop client from load_test.py at each
+concurrency level, then shuts the server down with SIGTERM.
+
+    python benchmarks/bench_serving.py [--backend numpy] [--workers 2] [--concurrency 1,8,32]
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from common import REPO_ROOT
+import load_test
+
+STARTUP_TIMEOUT_S = 120.0
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_healthy(url, proc, timeout=STARTUP_TIMEOUT_S):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"{url}/healthz", timeout=2) as response:
+                if response.status == 200:
+                    return time.monotonic() - (deadline - timeout)
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server not healthy after {timeout:.0f}s")
+
+def run(backend=None, workers=2, levels=(1, 8, 32), duration=5.0, endpoint="/predict", batch_size=64):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, TRIAGE_RELOAD_INTERVAL_S="0")
+    if backend:
+        env["TRIAGE_BACKEND"] = backend
+    proc = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        startup_s = wait_healthy(url, proc)
+        # Every worker loads its model lazily; one request per worker warms them up
+        load_test.run_level(url, endpoint, workers, 1.0, batch_size)
+        results = load_test.run(url, endpoint, list(levels), duration, batch_size)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    results.update(backend=env.get("TRIAGE_BACKEND", "keras"), workers=workers, startup_s=round(startup_s, 3))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", help="TRIAGE_BACKEND for the server (default: environment)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--endpoint", default="/predict", choices=["/predict", "/predict_batch"])
+    parser.add_argument("--batch-size", type=int, default=64, help="rows per /predict_batch request")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per concurrency level")
+    parser.add_argument("--json", help="write results to this path")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    batch_size = args.batch_size if args.endpoint == "/predict_batch" else 1
+    results = run(args.backend, args.workers, levels, args.duration, args.endpoint, batch_size)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if all(r["requests"] for r in results["levels"]) else 1)
@@ -0,0 +1,95 @@
+"""Cold-start benchmark for the main.py CLI.
+
+Runs each probe in a fresh interpreter, reports the median wall time and
+fails (exit 1) when a probe exceeds its budget or when `import main`
+pulls in a module that must stay lazy.
+
+With --backend, a probe also times a fresh process up to its first
+prediction (import, model load, one predict_patient call).
+
+    python benchmarks/bench_startup.py [--repeat 5] [--scale 1.0] [--backend numpy]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, argv, budget in seconds)
+PROBES = [
+    ("import_main", [sys.executable, "-c", "import main"], 1.0),
+    ("cli_analyze", [sys.executable, "main.py", "analyze"], 1.5),
+    ("import_model_server", [sys.executable, "-c", "import model_server"], 1.5),
+]
+
+FIRST_PREDICTION = (
+    "import main; "
+    "main.predict_patient({'age': 50, 'heart_rate': 110, 'oxygen': 93, 'temperature': 38.0, "
+    "'pain_scale': 6, 'waiting_time': 30, 'complaint_encoded': 1}, explanation='none')"
+)
+# Loading TensorFlow dominates the keras/tflite backends
+FIRST_PREDICTION_BUDGET_S = 10.0
+
+# Modules that must not be imported by `import main`
+LAZY_MODULES = ["tensorflow", "pandas", "sklearn", "google.genai", "joblib"]
+
+def time_probe(argv, repeat, env=None):
+    """Median wall time of `argv` over `repeat` fresh processes"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=REPO_ROOT, check=True, env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), samples
+
+def eagerly_imported():
+    """Lazy modules that `import main` loaded anyway"""
+    code = (
+        "import sys, json, main; "
+        f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def run(repeat=5, scale=1.0, backend=None):
+    results = {"probes": {}, "eager_imports": eagerly_imported()}
+    failed = bool(results["eager_imports"])
+    probes = [(name, argv, budget, None) for name, argv, budget in PROBES]
+    if backend:
+        env = dict(os.environ, TRIAGE_BACKEND=backend)
+        probes.append((f"first_prediction_{backend}", [sys.executable, "-c", FIRST_PREDICTION],
+                       FIRST_PREDICTION_BUDGET_S, env))
+    for name, argv, budget, env in probes:
+        median, samples = time_probe(argv, repeat, env)
+        budget *= scale
+        ok = median <= budget
+        failed |= not ok
+        results["probes"][name] = {"median_s": median, "samples_s": samples, "budget_s": budget, "ok": ok}
+        print(f"{'✅' if ok else '❌'} {name}: {median * 1000:.0f} ms (budget {budget * 1000:.0f} ms)")
+
+    if results["eager_imports"]:
+        print(f"❌ import main loaded: {', '.join(results['eager_imports'])}")
+    else:
+        print("✅ import main keeps TensorFlow/pandas/sklearn/genai lazy")
+    results["ok"] = not failed
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget (slow CI machines)")
+    parser.add_argument("--backend", help="also time the first prediction with this TRIAGE_BACKEND")
+    parser.add_argument("--json", help="write results to this path")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.scale, args.backend)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if results["ok"] else 1)
@@ -0,0 +1,84 @@
+"""Training wall time: data preparation and Keras time per epoch.
+
+Times main.load_and_prepare_data and main.prepare_training_arrays, then
+fits build_enhanced_model for a few epochs and records every epoch's wall
+time. The first epoch includes graph tracing, so the steady-state figure
+is the median of the remaining epochs. Needs TensorFlow for the epoch
+timings; data preparation is measured either way.
+
+    python benchmarks/bench_training.py [--epochs 5] [--batch-size 32]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from common import REPO_ROOT, latency_stats, time_calls
+
+EPOCHS = 5
+DATA_PREP_RUNS = 3
+
+def run(epochs=EPOCHS, batch_size=32, data_prep_runs=DATA_PREP_RUNS):
+    os.chdir(REPO_ROOT)
+    import main
+
+    print(f"Training benchmark ({epochs} epochs, batch size {batch_size})\n")
+    results = {
+        "load_and_prepare_data": latency_stats(time_calls(main.load_and_prepare_data, data_prep_runs)),
+    }
+    start = time.perf_counter()
+    X_train, X_test, y_train, y_test, _ = main.prepare_training_arrays()
+    results["prepare_training_arrays_s"] = round(time.perf_counter() - start, 4)
+    results["train_rows"] = int(len(X_train))
+    print(f"  load_and_prepare_data p50 {results['load_and_prepare_data']['p50_ms']:.1f} ms")
+    print(f"  prepare_training_arrays {results['prepare_training_arrays_s']:.2f} s ({len(X_train)} train rows)")
+
+    try:
+        import tensorflow as tf
+    except ImportError as e:
+        results["epochs"] = {"skipped": str(e)}
+        print(f"  epochs skipped: {e}")
+        return results
+
+    epoch_s = []
+
+    class EpochTimer(tf.keras.callbacks.Callback):
+        def on_epoch_begin(self, epoch, logs=None):
+            self.started = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            epoch_s.append(time.perf_counter() - self.started)
+
+    tf.keras.utils.set_random_seed(42)
+    start = time.perf_counter()
+    model = main.build_enhanced_model(X_train.shape[1])
+    build_s = time.perf_counter() - start
+    model.fit(X_train, y_train, validation_data=(X_test, y_test), epochs=epochs, batch_size=batch_size,
+              class_weight=main.balanced_class_weights(y_train), callbacks=[EpochTimer()], verbose=0)
+
+    steady = epoch_s[1:] or epoch_s
+    results["epochs"] = {
+        "build_model_s": round(build_s, 4),
+        "first_epoch_s": round(epoch_s[0], 4),
+        "epoch_s": round(statistics.median(steady), 4),
+        "train_rows_per_s": round(len(X_train) / statistics.median(steady), 1),
+        "all_epochs_s": [round(s, 4) for s in epoch_s],
+    }
+    print(f"  first epoch {epoch_s[0]:.2f} s, steady-state {results['epochs']['epoch_s']:.2f} s/epoch "
+          f"({results['epochs']['train_rows_per_s']:.0f} rows/s)")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--json", help="write results to this path")
+    args = parser.parse_args()
+
+    results = run(args.epochs, args.batch_size)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0)
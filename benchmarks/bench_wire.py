@@ -0,0 +1,160 @@
+"""JSON vs binary wire format for /predict and /predict_batch.
+
+`decode` times the server's body parsing alone (parse_batch_payload on a
+request context) for JSON records, JSON columns and packed float32 rows.
+`requests` times whole requests through the Flask app, model included
+(TRIAGE_BACKEND; skipped if its artifacts are missing), or against a
+running server with --url, using triage_client for both formats (start
+it with TRIAGE_PREDICT_CACHE_SIZE=0, or repeated rows hit the cache).
+
+    python benchmarks/bench_wire.py [--url http://127.0.0.1:5000] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from common import REPO_ROOT, latency_stats, time_calls
+
+BATCH_SIZES = [1, 32, 256, 4096]
+SINGLE_ROW_RUNS = 500
+BATCH_ROWS_TARGET = 50000
+BATCH_CALLS = (3, 200)
+FORMATS = ["json_records", "json_columns", "binary"]
+
+def _rows(n, seed=0):
+    from inference_backends import sample_rows
+    X = sample_rows(n, os.path.join(REPO_ROOT, "triage_synthetic_dataset.csv"), seed)
+    return np.resize(X, (n, X.shape[1])).astype(np.float32)
+
+def encode(fmt, X):
+    """(body, content type) for a batch in one of FORMATS"""
+    from triage_rules import FEATURES
+    from wire_format import BINARY_MIMETYPE, encode_rows
+
+    if fmt == "binary":
+        return encode_rows(X), BINARY_MIMETYPE
+    if fmt == "json_columns":
+        payload = {"columns": {k: X[:, j].tolist() for j, k in enumerate(FEATURES)}}
+    else:
+        payload = [dict(zip(FEATURES, row)) for row in X.tolist()]
+    return json.dumps(payload).encode(), "application/json"
+
+def _repeat(size):
+    return min(max(BATCH_ROWS_TARGET // size, BATCH_CALLS[0]), BATCH_CALLS[1])
+
+def bench_decode(batch_sizes=BATCH_SIZES):
+    """Body bytes per row and parse throughput per format and batch size"""
+    from model_server import app, parse_batch_payload
+
+    X = _rows(max(batch_sizes))
+    results = {}
+    for fmt in FORMATS:
+        per_size = {}
+        for size in batch_sizes:
+            body, content_type = encode(fmt, X[:size])
+
+            def parse():
+                with app.test_request_context("/predict_batch", method="POST", data=body,
+                                              content_type=content_type) as ctx:
+                    return parse_batch_payload(ctx.request)
+
+            assert parse().shape == (size, X.shape[1])
+            timings = time_calls(parse, _repeat(size))
+            per_size[str(size)] = {
+                "bytes_per_row": round(len(body) / size, 1),
+                "rows_per_s": round(size / float(np.median(timings)), 1),
+                **latency_stats(timings),
+            }
+        results[fmt] = per_size
+    return results
+
+def _post_fn(url, fmt):
+    """post(path, X) -> probabilities, via the Flask test client or a TriageClient"""
+    if url:
+        from triage_client import TriageClient
+        client = TriageClient(url, binary=fmt == "binary")
+        if fmt == "json_records":
+            return None
+        return lambda path, X: client.predict_batch(X)[0] if path == "/predict_batch" else client.predict(X[0])[0]
+
+    from model_server import app
+    from triage_rules import FEATURES
+    from wire_format import decode_probs
+
+    client = app.test_client()
+
+    def post(path, X):
+        if path == "/predict" and fmt != "binary":
+            body, content_type = json.dumps({"features": dict(zip(FEATURES, X[0].tolist()))}).encode(), "application/json"
+        else:
+            body, content_type = encode(fmt, X)
+        response = client.post(path, data=body, content_type=content_type)
+        assert response.status_code == 200, response.get_data()[:200]
+        if fmt == "binary":
+            return decode_probs(response.get_data())
+        return response.get_json()
+    return post
+
+def bench_requests(url=None, batch_sizes=BATCH_SIZES, single_row_runs=SINGLE_ROW_RUNS):
+    """End-to-end request latency / rows per second for each format"""
+    if not url:
+        import model_server
+        try:
+            model_server.init_worker()
+        except (RuntimeError, ImportError, OSError) as e:
+            return {"skipped": str(e)}
+
+    X = _rows(max(batch_sizes), seed=1)
+    results = {}
+    for fmt in FORMATS:
+        post = _post_fn(url, fmt)
+        if post is None:
+            # The client sends columns; records only exist as a server-side parse format here
+            continue
+        rows = iter(range(single_row_runs + 1))
+        post("/predict", X[:1])
+        result = {"single_row": latency_stats(
+            time_calls(lambda: post("/predict", X[next(rows) % len(X)][None]), single_row_runs))}
+        for size in batch_sizes:
+            batch = X[:size]
+            post("/predict_batch", batch)
+            timings = time_calls(lambda: post("/predict_batch", batch), _repeat(size))
+            result[str(size)] = {"rows_per_s": round(size / float(np.median(timings)), 1), **latency_stats(timings)}
+        results[fmt] = result
+    return results
+
+def run(url=None, batch_sizes=BATCH_SIZES, single_row_runs=SINGLE_ROW_RUNS):
+    os.chdir(REPO_ROOT)
+    # Repeated rows would otherwise be answered by the prediction cache (read at import)
+    os.environ["TRIAGE_PREDICT_CACHE_SIZE"] = "0"
+    print(f"Wire format benchmark (batches {batch_sizes})\n")
+    results = {"decode": bench_decode(batch_sizes)}
+    largest = str(batch_sizes[-1])
+    for fmt, per_size in results["decode"].items():
+        r = per_size[largest]
+        print(f"  decode   {fmt:<13} {r['bytes_per_row']:>6.1f} B/row  {r['rows_per_s']:>12.0f} rows/s @ {largest}")
+
+    results["requests"] = bench_requests(url, batch_sizes, single_row_runs)
+    if "skipped" in results["requests"]:
+        print(f"  requests skipped: {results['requests']['skipped']}")
+        return results
+    for fmt, r in results["requests"].items():
+        print(f"  request  {fmt:<13} /predict p50 {r['single_row']['p50_ms']:.3f} ms  "
+              f"{r[largest]['rows_per_s']:>10.0f} rows/s @ {largest}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process Flask app")
+    parser.add_argument("--runs", type=int, default=SINGLE_ROW_RUNS, help="single-row /predict calls per format")
+    parser.add_argument("--json", help="write results to this path")
+    args = parser.parse_args()
+
+    results = run(args.url, single_row_runs=args.runs)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0)
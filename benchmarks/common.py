@@ -0,0 +1,57 @@
+"""Shared helpers for the benchmark scripts.
+
+Every benchmark returns a JSON-serializable dict. Metric names carry their
+unit and direction: `*_ms` / `*_s` are lower-is-better and `*_per_s` is
+higher-is-better, which is what compare.py relies on.
+"""
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+# The benchmarks import the project modules and read repo-relative artifacts
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+def latency_stats(seconds):
+    """p50/p99/mean in milliseconds for a list of timings in seconds"""
+    ms = np.asarray(seconds, dtype=np.float64) * 1e3
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+    }
+
+def time_calls(fn, repeat):
+    """Wall time of each of `repeat` calls to fn()"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment():
+    """Machine and version metadata stored next to every result set"""
+    return {
+        "created": datetime.utcnow().isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
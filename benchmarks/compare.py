@@ -0,0 +1,104 @@
+"""Compare two benchmark result files and flag regressions.
+
+Every numeric leaf is matched by its path. Names ending in `_per_s` are
+throughputs (higher is better); names ending in `_ms` or `_s` are
+durations (lower is better); anything else (counts, sizes, budgets) is
+shown but never flagged. A change worse than --threshold is a
+regression, and the exit code is 1 if there is any.
+
+    python benchmarks/compare.py benchmarks/results/base.json benchmarks/results/new.json [--threshold 0.10]
+"""
+import argparse
+import json
+import sys
+
+THRESHOLD = 0.10
+# Durations this small are dominated by timer noise
+MIN_DURATION_MS = 0.05
+
+# List items are keyed by the first of these fields they carry
+LIST_KEYS = ("backend", "store", "name", "concurrency", "records")
+
+def flatten(value, prefix=""):
+    """{"a.b.c": number} for every numeric leaf"""
+    if isinstance(value, bool):
+        return {}
+    if isinstance(value, (int, float)):
+        return {prefix: float(value)}
+    flat = {}
+    if isinstance(value, dict):
+        for k, v in value.items():
+            flat.update(flatten(v, f"{prefix}.{k}" if prefix else str(k)))
+    elif isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+        for i, item in enumerate(value):
+            key = next((f"{k}={item[k]}" for k in LIST_KEYS if k in item), str(i))
+            if "records" in item and not key.startswith("records"):
+                key += f",records={item['records']}"
+            flat.update(flatten(item, f"{prefix}[{key}]"))
+    # Lists of raw samples are summarized elsewhere and not compared
+    return flat
+
+def direction(path):
+    """+1 if higher is better, -1 if lower is better, 0 if not a performance metric"""
+    name = path.rsplit(".", 1)[-1]
+    if "budget" in name or name.startswith("samples"):
+        return 0
+    if name.endswith("_per_s"):
+        return 1
+    if name.endswith("_ms") or name.endswith("_s"):
+        return -1
+    return 0
+
+def compare(base, new, threshold=THRESHOLD):
+    """Rows of (path, base, new, relative change, status) for metrics in both files"""
+    base_flat = flatten(base.get("suites", base))
+    new_flat = flatten(new.get("suites", new))
+    rows = []
+    for path in sorted(base_flat.keys() & new_flat.keys()):
+        b, n = base_flat[path], new_flat[path]
+        sign = direction(path)
+        change = (n - b) / b if b else 0.0
+        status = ""
+        if sign:
+            worse = -change * sign
+            tiny = sign < 0 and _as_ms(path, max(b, n)) < MIN_DURATION_MS
+            if worse > threshold and not tiny:
+                status = "REGRESSION"
+            elif worse < -threshold:
+                status = "improved"
+        rows.append((path, b, n, change, status))
+    return rows
+
+def _as_ms(path, value):
+    return value if path.endswith("_ms") else value * 1e3
+
+def print_comparison(rows, show_all=False):
+    print(f"  {'metric':<72} {'base':>12} {'new':>12} {'change':>8}")
+    for path, b, n, change, status in rows:
+        if not show_all and not status:
+            continue
+        print(f"  {path:<72} {b:>12.4g} {n:>12.4g} {change:>+8.1%}  {status}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="relative change flagged (0.10 = 10%%)")
+    parser.add_argument("--all", action="store_true", help="list unchanged metrics too")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    for label, results in (("base", base), ("new", new)):
+        env = results.get("environment", {})
+        print(f"{label}: {env.get('commit')} {env.get('created')} ({env.get('platform')}, {env.get('cpu_count')} cpus)")
+    print()
+
+    rows = compare(base, new, args.threshold)
+    regressions = [r for r in rows if r[4] == "REGRESSION"]
+    print_comparison(rows, args.all)
+    print(f"\n{len(rows)} metrics compared, {len(regressions)} regressions "
+          f"(threshold {args.threshold:.0%})")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,118 @@
+"""Closed-loop HTTP load test for the triage model server.
+
+Each concurrency level runs N client threads that POST random patients
+back to back for --duration seconds, then reports requests/sec and
+p50/p99 latency. Start the server first (python serve.py ...).
+
+    python benchmarks/load_test.py [--url http://127.0.0.1:5000] [--concurrency 1,4,16,64]
+"""
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+FEATURE_RANGES = {
+    "age": (1, 95),
+    "heart_rate": (40, 180),
+    "oxygen": (80, 100),
+    "temperature": (35.0, 41.0),
+    "pain_scale": (0, 10),
+    "waiting_time": (0, 240),
+    "complaint_encoded": (0, 3),
+}
+
+def random_patient(rng):
+    return {k: round(rng.uniform(lo, hi), 1) for k, (lo, hi) in FEATURE_RANGES.items()}
+
+def make_body(rng, endpoint, batch_size):
+    if endpoint == "/predict_batch":
+        return json.dumps([random_patient(rng) for _ in range(batch_size)]).encode()
+    return json.dumps({"features": random_patient(rng)}).encode()
+
+def client_loop(url, endpoint, batch_size, stop_at, seed, latencies, errors):
+    rng = random.Random(seed)
+    parts = urlsplit(url)
+    conn = None
+    while time.perf_counter() < stop_at:
+        body = make_body(rng, endpoint, batch_size)
+        start = time.perf_counter()
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            conn.request("POST", endpoint, body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+            if response.getheader("Connection", "").lower() == "close" or response.version == 10:
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn = None
+            continue
+        latencies.append(time.perf_counter() - start)
+
+def run_level(url, endpoint, concurrency, duration, batch_size=1):
+    latencies, errors = [], []
+    stop_at = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=client_loop, args=(url, endpoint, batch_size, stop_at, i, latencies, errors))
+        for i in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    timings = np.array(latencies) * 1e3
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "req_per_s": len(latencies) / elapsed,
+        "rows_per_s": len(latencies) * batch_size / elapsed,
+        "p50_ms": float(np.percentile(timings, 50)) if len(timings) else None,
+        "p99_ms": float(np.percentile(timings, 99)) if len(timings) else None,
+        "max_ms": float(timings.max()) if len(timings) else None,
+    }
+
+def run(url, endpoint, levels, duration, batch_size=1):
+    print(f"Load test {url}{endpoint} ({duration:.0f}s per level)\n")
+    print(f"  {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    results = []
+    for concurrency in levels:
+        r = run_level(url, endpoint, concurrency, duration, batch_size)
+        results.append(r)
+        if r["requests"]:
+            print(f"  {concurrency:>5} {r['req_per_s']:>9.1f} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['errors']:>7}")
+        else:
+            print(f"  {concurrency:>5} {'-':>9} {'-':>9} {'-':>9} {r['errors']:>7}")
+    return {"url": url, "endpoint": endpoint, "duration_s": duration, "batch_size": batch_size, "levels": results}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--endpoint", default="/predict", choices=["/predict", "/predict_batch"])
+    parser.add_argument("--batch-size", type=int, default=64, help="rows per /predict_batch request")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--json", help="write results to this path")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    batch_size = args.batch_size if args.endpoint == "/predict_batch" else 1
+    results = run(args.url, args.endpoint, levels, args.duration, batch_size)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if all(r["requests"] for r in results["levels"]) else 1)
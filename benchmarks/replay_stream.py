@@ -0,0 +1,215 @@
+"""Record and replay vital-sign telemetry streams against /ingest.
+
+`record` writes a synthetic NDJSON stream: one admission line per patient
+(all 7 features), then heart rate, SpO2 and temperature samples at --hz
+per patient following a random walk, with some patients deteriorating
+through the signal bands. `replay` sends a recorded file as one chunked
+POST /ingest, paced by its "t" stamps (--speed 0 sends as fast as
+possible), reads the streamed updates on the same connection, and
+reports samples/s and how many samples caused a re-inference. --local
+feeds the stream into an in-process VitalsState instead of a server.
+
+    python benchmarks/replay_stream.py record vitals.ndjson [--patients 200] [--seconds 600] [--hz 1]
+    python benchmarks/replay_stream.py replay vitals.ndjson [--url http://127.0.0.1:5000] [--speed 0] [--local]
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from common import REPO_ROOT
+
+CHUNK_LINES = 256
+
+# =========================
+# Recording
+# =========================
+
+def synthesize(path, patients=200, seconds=600, hz=1.0, seed=0, start=1_700_000_000.0):
+    """Write a recorded stream; returns the number of lines"""
+    rng = np.random.default_rng(seed)
+    steps = max(1, int(seconds * hz))
+    ids = [f"bed-{i:04d}" for i in range(patients)]
+    hr = rng.normal(85, 12, patients)
+    spo2 = rng.normal(97, 1.5, patients)
+    temp = rng.normal(37.0, 0.4, patients)
+    # A quarter of the patients drift toward tachycardia, hypoxemia and fever
+    trend = (rng.random(patients) < 0.25) / steps
+    lines = 0
+    with open(path, "w") as f:
+        for i, pid in enumerate(ids):
+            f.write(json.dumps({
+                "patient_id": pid, "t": start,
+                "age": int(rng.integers(1, 95)), "pain_scale": int(rng.integers(0, 11)),
+                "waiting_time": int(rng.integers(0, 120)), "complaint_encoded": int(rng.integers(0, 4)),
+                "heart_rate": round(float(hr[i]), 1), "oxygen": round(float(spo2[i]), 1),
+                "temperature": round(float(temp[i]), 2),
+            }) + "\n")
+            lines += 1
+        for step in range(1, steps + 1):
+            t = start + step / hz
+            hr += rng.normal(0, 1.0, patients) + trend * 60
+            spo2 += rng.normal(0, 0.2, patients) - trend * 12
+            temp += rng.normal(0, 0.02, patients) + trend * 2.5
+            for i, pid in enumerate(ids):
+                f.write(f'{{"patient_id": "{pid}", "t": {t:.3f}, "heart_rate": {hr[i]:.1f}, '
+                        f'"oxygen": {min(spo2[i], 100.0):.1f}, "temperature": {temp[i]:.2f}}}\n')
+            lines += patients
+    return lines
+
+# =========================
+# Replay
+# =========================
+
+def paced_chunks(path, speed=0.0, chunk_lines=CHUNK_LINES):
+    """Byte chunks of the recording; with speed > 0 each line waits for its scaled timestamp"""
+    first_t, started = None, time.perf_counter()
+    chunk = []
+    with open(path, "rb") as f:
+        for line in f:
+            if speed > 0:
+                t = json.loads(line).get("t")
+                if t is not None:
+                    first_t = t if first_t is None else first_t
+                    delay = (t - first_t) / speed - (time.perf_counter() - started)
+                    if delay > 0:
+                        if chunk:
+                            yield b"".join(chunk)
+                            chunk = []
+                        time.sleep(delay)
+            chunk.append(line)
+            if len(chunk) >= chunk_lines:
+                yield b"".join(chunk)
+                chunk = []
+    if chunk:
+        yield b"".join(chunk)
+
+def replay_http(url, path, speed=0.0, chunk_lines=CHUNK_LINES, bulk=False):
+    """Full-duplex POST: a sender thread writes while this thread reads updates.
+
+    The body is chunked (a live stream) unless `bulk`, which uploads the
+    file unpaced with a Content-Length.
+    """
+    parts = urlsplit(url)
+    sock = socket.create_connection((parts.hostname, parts.port or 80), timeout=60)
+    framing = f"Content-Length: {os.path.getsize(path)}" if bulk else "Transfer-Encoding: chunked"
+    head = (f"POST /ingest HTTP/1.1\r\nHost: {parts.netloc}\r\nContent-Type: application/x-ndjson\r\n"
+            f"{framing}\r\nConnection: close\r\n\r\n")
+    sock.sendall(head.encode())
+
+    sent = {"error": None}
+
+    def sender():
+        try:
+            if bulk:
+                with open(path, "rb") as f:
+                    sock.sendfile(f)
+                return
+            for chunk in paced_chunks(path, speed, chunk_lines):
+                sock.sendall(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            sock.sendall(b"0\r\n\r\n")
+        except OSError as e:
+            sent["error"] = f"{type(e).__name__}: {e}"
+
+    start = time.perf_counter()
+    thread = threading.Thread(target=sender, daemon=True)
+    thread.start()
+    response = http.client.HTTPResponse(sock)
+    response.begin()
+    if response.status != 200:
+        raise RuntimeError(f"/ingest returned {response.status}: {response.read()[:200]!r}")
+    result = _collect((line for line in response), start)
+    thread.join()
+    sock.close()
+    if sent["error"]:
+        raise RuntimeError(f"sending failed: {sent['error']}")
+    return result
+
+def replay_local(path, speed=0.0, chunk_lines=CHUNK_LINES):
+    """Same stream through an in-process VitalsState and the configured backend"""
+    path = os.path.abspath(path)
+    os.chdir(REPO_ROOT)
+    import model_server
+    from vitals_stream import VitalsState, ingest_lines
+
+    model_server.init_worker()
+    state = VitalsState()
+    lines = (line for chunk in paced_chunks(path, speed, chunk_lines) for line in chunk.splitlines())
+    start = time.perf_counter()
+    return _collect(ingest_lines(state, model_server.predict_matrix, lines), start)
+
+def _collect(update_lines, start):
+    updates, reasons, errors, summary, first = 0, {}, 0, None, None
+    for line in update_lines:
+        if not line.strip():
+            continue
+        update = json.loads(line)
+        if "summary" in update:
+            summary = update["summary"]
+        elif "error" in update:
+            errors += 1
+        elif "probability" in update:
+            updates += 1
+            reasons[update["reason"]] = reasons.get(update["reason"], 0) + 1
+            if first is None:
+                first = time.perf_counter() - start
+    elapsed = time.perf_counter() - start
+    stream = (summary or {}).get("stream", {})
+    lines = (summary or {}).get("lines", 0)
+    return {
+        "lines": lines,
+        "elapsed_s": elapsed,
+        "lines_per_s": lines / elapsed if elapsed else 0.0,
+        "updates": updates,
+        "update_reasons": reasons,
+        "errors": errors,
+        "first_update_s": first,
+        "forward_passes": stream.get("forward_passes"),
+        "inferences_per_sample": stream.get("inferences_per_sample"),
+    }
+
+def print_result(result):
+    print(f"  {result['lines']} lines in {result['elapsed_s']:.2f}s ({result['lines_per_s']:.0f} lines/s)")
+    print(f"  {result['updates']} updates {result['update_reasons']}, {result['errors']} errors, "
+          f"{result['forward_passes']} forward passes")
+    if result["inferences_per_sample"] is not None:
+        print(f"  re-inference rate: {result['inferences_per_sample']:.2%} of samples")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="write a synthetic telemetry recording")
+    rec.add_argument("path")
+    rec.add_argument("--patients", type=int, default=200)
+    rec.add_argument("--seconds", type=float, default=600)
+    rec.add_argument("--hz", type=float, default=1.0, help="samples per second per patient")
+    rec.add_argument("--seed", type=int, default=0)
+
+    rep = sub.add_parser("replay", help="stream a recording into /ingest")
+    rep.add_argument("path")
+    rep.add_argument("--url", default="http://127.0.0.1:5000")
+    rep.add_argument("--speed", type=float, default=0.0, help="playback speed (1 = real time, 0 = unpaced)")
+    rep.add_argument("--chunk-lines", type=int, default=CHUNK_LINES)
+    rep.add_argument("--bulk", action="store_true", help="upload unpaced with a Content-Length instead of chunked")
+    rep.add_argument("--local", action="store_true", help="ingest in-process instead of over HTTP")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        n = synthesize(args.path, args.patients, args.seconds, args.hz, args.seed)
+        print(f"✅ Wrote {n} lines to {args.path}")
+        sys.exit(0)
+
+    if args.local:
+        result = replay_local(args.path, args.speed, args.chunk_lines)
+    else:
+        result = replay_http(args.url, args.path, args.speed, args.chunk_lines, args.bulk)
+    print_result(result)
+    sys.exit(1 if result["errors"] else 0)
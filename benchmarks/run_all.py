@@ -0,0 +1,92 @@
+"""Run the benchmark suite and write one JSON result file.
+
+Runs offline against the artifacts in the repo; suites whose model or
+library is missing report "skipped" entries instead of failing. Results
+go to benchmarks/results/<timestamp>-<commit>.json together with machine
+and version metadata; compare two files with compare.py.
+
+    python benchmarks/run_all.py [--quick] [--only inference,feedback] [--backend numpy]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from common import RESULTS_DIR, environment
+
+import bench_feedback
+import bench_inference
+import bench_serving
+import bench_startup
+import bench_training
+import bench_wire
+
+# wire runs last: it turns the prediction cache off for this process and its children
+SUITES = ["startup", "inference", "serving", "training", "feedback", "wire"]
+
+# (full, quick) settings per suite
+SETTINGS = {
+    "startup": ({"repeat": 5}, {"repeat": 2}),
+    "inference": ({"single_row_runs": 500}, {"single_row_runs": 100}),
+    "serving": ({"levels": (1, 8, 32), "duration": 10.0}, {"levels": (1, 8), "duration": 3.0}),
+    "training": ({"epochs": 5}, {"epochs": 2, "data_prep_runs": 1}),
+    "feedback": ({"sizes": bench_feedback.SIZES}, {"sizes": [10_000]}),
+    "wire": ({"single_row_runs": 500}, {"single_row_runs": 100}),
+}
+
+def run_suite(name, quick=False, backend=None):
+    settings = SETTINGS[name][quick]
+    if name == "startup":
+        return bench_startup.run(scale=1.0, backend=backend, **settings)
+    if name == "inference":
+        return bench_inference.run(**settings)
+    if name == "serving":
+        return bench_serving.run(backend=backend, **settings)
+    if name == "training":
+        return bench_training.run(**settings)
+    if name == "wire":
+        return bench_wire.run(**settings)
+    return bench_feedback.run(**settings)
+
+def run(suites=SUITES, quick=False, backend=None, out=None):
+    results = {"environment": environment(), "quick": quick, "suites": {}}
+    if backend:
+        # bench_inference.predict_patient and the server follow TRIAGE_BACKEND
+        os.environ["TRIAGE_BACKEND"] = backend
+    for name in suites:
+        print(f"\n{'='*60}\n⏱️  {name}\n{'='*60}")
+        start = time.perf_counter()
+        try:
+            results["suites"][name] = run_suite(name, quick, backend)
+        except Exception as e:
+            results["suites"][name] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"❌ {name} failed: {e}")
+        print(f"({time.perf_counter() - start:.1f}s)")
+
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = results["environment"]["created"][:19].replace(":", "").replace("-", "")
+        out = os.path.join(RESULTS_DIR, f"{stamp}-{results['environment']['commit'] or 'nogit'}.json")
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✅ Results written to {out}")
+    return results, out
+
+def failed_suites(results):
+    """Suites that raised or report ok=False (e.g. startup over budget or eager heavy imports)"""
+    return [name for name, r in results["suites"].items() if "error" in r or r.get("ok") is False]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", default=",".join(SUITES), help="comma-separated suites to run")
+    parser.add_argument("--quick", action="store_true", help="fewer repeats and 10k feedback records only")
+    parser.add_argument("--backend", help="TRIAGE_BACKEND for predict_patient, serving and first-prediction probes")
+    parser.add_argument("--out", help="result path (default: benchmarks/results/<timestamp>-<commit>.json)")
+    args = parser.parse_args()
+
+    results, _ = run(args.only.split(","), args.quick, args.backend, args.out)
+    failed = failed_suites(results)
+    if failed:
+        print(f"❌ Failed suites: {', '.join(failed)}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,215 @@
+import os
+import glob
+
+import numpy as np
+
+from triage_rules import FEATURES
+
+# =========================
+# Configuration
+# =========================
+
+CHUNK_ROWS = int(os.environ.get("TRIAGE_CHUNK_ROWS", "50000"))
+SHUFFLE_BUFFER = int(os.environ.get("TRIAGE_SHUFFLE_BUFFER", "20000"))
+TEST_FRACTION = 0.2
+VALIDATION_FRACTION = 0.16  # 20% of the remaining 80%, as in train_model
+
+TRAIN, VALIDATION, TEST = 0, 1, 2
+
+# =========================
+# Labels & Splits
+# =========================
+
+def feedback_labels(clinician_decisions):
+    """Binary labels from clinician decisions (CRITICAL / HIGH RISK -> 1)"""
+    return np.array([1 if d in ['CRITICAL', 'HIGH RISK'] else 0 for d in clinician_decisions],
+                    dtype=np.float32)
+
+def assign_splits(source_index, row_offset, n, test_fraction=TEST_FRACTION,
+                  validation_fraction=VALIDATION_FRACTION):
+    """Deterministic train/validation/test split from a stable row hash.
+
+    Rows are identified by (source, offset), so every pass over the data
+    puts each row in the same split without materializing an index.
+    """
+    ids = np.arange(row_offset, row_offset + n, dtype=np.uint64) + np.uint64(source_index * 1_000_003)
+    # Knuth multiplicative hash into [0, 1)
+    u = ((ids * np.uint64(2654435761)) % np.uint64(2 ** 32)).astype(np.float64) / 2 ** 32
+    splits = np.full(n, TRAIN, dtype=np.int8)
+    splits[u < test_fraction + validation_fraction] = VALIDATION
+    splits[u < test_fraction] = TEST
+    return splits
+
+# =========================
+# Chunked Sources
+# =========================
+
+class CsvSource:
+    """Labelled CSV shard(s) read in fixed-size chunks"""
+
+    def __init__(self, pattern, chunksize=CHUNK_ROWS):
+        self.paths = sorted(glob.glob(pattern)) or [pattern]
+        self.chunksize = chunksize
+
+    def __repr__(self):
+        return f"CsvSource({', '.join(self.paths)})"
+
+    def chunks(self):
+        import pandas as pd
+        for path in self.paths:
+            for chunk in pd.read_csv(path, usecols=FEATURES + ["label"], chunksize=self.chunksize):
+                yield chunk[FEATURES].to_numpy(np.float32), chunk["label"].to_numpy(np.float32)
+
+class ParquetSource:
+    """Labelled Parquet shard(s) (same columns as the CSV) read in batches"""
+
+    def __init__(self, pattern, chunksize=CHUNK_ROWS):
+        self.paths = sorted(glob.glob(pattern)) or [pattern]
+        self.chunksize = chunksize
+
+    def __repr__(self):
+        return f"ParquetSource({', '.join(self.paths)})"
+
+    def chunks(self):
+        import pyarrow.parquet as pq
+        columns = FEATURES + ["label"]
+        for path in self.paths:
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=self.chunksize, columns=columns):
+                X = np.column_stack([batch.column(k).to_numpy() for k in FEATURES]).astype(np.float32)
+                yield X, batch.column("label").to_numpy().astype(np.float32)
+
+class FeedbackSource:
+    """Feedback store streamed through iter_feature_chunks()"""
+
+    def __init__(self, store, chunksize=CHUNK_ROWS):
+        self.store = store
+        self.chunksize = chunksize
+
+    def __repr__(self):
+        return f"FeedbackSource({self.store.name})"
+
+    def chunks(self):
+        for X, decisions in self.store.iter_feature_chunks(self.chunksize):
+            yield X.astype(np.float32), feedback_labels(decisions)
+
+def split_chunks(source, source_index, split):
+    """Chunks of `source` restricted to one split"""
+    offset = 0
+    for X, y in source.chunks():
+        mask = assign_splits(source_index, offset, len(X)) == split
+        offset += len(X)
+        if mask.any():
+            yield X[mask], y[mask]
+
+def reservoir_sample(chunks, k, seed=42):
+    """Uniform sample of k rows from a chunk stream in O(k) memory"""
+    rng = np.random.default_rng(seed)
+    X_res, y_res, seen = None, None, 0
+    for X, y in chunks:
+        if X_res is None:
+            X_res = np.empty((k, X.shape[1]), dtype=X.dtype)
+            y_res = np.empty(k, dtype=y.dtype)
+        # Fill the reservoir first
+        fill = min(len(X), max(0, k - seen))
+        X_res[seen:seen + fill] = X[:fill]
+        y_res[seen:seen + fill] = y[:fill]
+        # Then row i (0-based global index) replaces slot j ~ U[0, i] if j < k
+        idx = np.arange(seen + fill, seen + len(X))
+        if len(idx):
+            slots = (rng.random(len(idx)) * (idx + 1)).astype(np.int64)
+            keep = slots < k
+            X_res[slots[keep]] = X[fill:][keep]
+            y_res[slots[keep]] = y[fill:][keep]
+        seen += len(X)
+    if X_res is None:
+        return np.empty((0, len(FEATURES)), dtype=np.float32), np.empty(0, dtype=np.float32)
+    n = min(k, seen)
+    return X_res[:n], y_res[:n]
+
+# =========================
+# Single-Pass Statistics
+# =========================
+
+def scan_sources(sources):
+    """One streaming pass: fit the scaler on the training split and count rows.
+
+    Returns (scaler, stats) where stats holds per-split row counts and the
+    training class counts used for balanced sampling.
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    rows = {TRAIN: 0, VALIDATION: 0, TEST: 0}
+    class_counts = np.zeros(2, dtype=np.int64)
+    for i, source in enumerate(sources):
+        offset = 0
+        for X, y in source.chunks():
+            splits = assign_splits(i, offset, len(X))
+            offset += len(X)
+            train = splits == TRAIN
+            if train.any():
+                scaler.partial_fit(X[train])
+                class_counts += np.bincount(y[train].astype(np.int64), minlength=2)[:2]
+            for split in rows:
+                rows[split] += int(np.count_nonzero(splits == split))
+
+    if rows[TRAIN] == 0:
+        raise ValueError("No training rows found in the data sources")
+    stats = {
+        "train_rows": rows[TRAIN],
+        "validation_rows": rows[VALIDATION],
+        "test_rows": rows[TEST],
+        "class_counts": class_counts.tolist(),
+    }
+    print(f"📊 Streamed {sum(rows.values())} rows: {stats}")
+    return scaler, stats
+
+# =========================
+# tf.data Pipeline
+# =========================
+
+def make_dataset(sources, split, scaler, batch_size=32, balance=False, shuffle=False):
+    """Bounded-memory tf.data pipeline over chunked sources.
+
+    Sources are parsed in parallel via interleave, scaled on the fly and
+    prefetched. With `balance`, the two classes are drawn with equal
+    probability from separate infinite streams (weighted sampling) rather
+    than by duplicating minority rows, so callers must pass steps_per_epoch.
+    """
+    import tensorflow as tf
+
+    mean = tf.constant(scaler.mean_, dtype=tf.float32)
+    scale = tf.constant(scaler.scale_, dtype=tf.float32)
+    signature = (
+        tf.TensorSpec(shape=(None, len(FEATURES)), dtype=tf.float32),
+        tf.TensorSpec(shape=(None,), dtype=tf.float32),
+    )
+
+    def source_dataset(index):
+        def generator(i):
+            yield from split_chunks(sources[int(i)], int(i), split)
+        return tf.data.Dataset.from_generator(generator, args=(index,), output_signature=signature)
+
+    ds = tf.data.Dataset.range(len(sources)).interleave(
+        source_dataset,
+        cycle_length=max(1, len(sources)),
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=not shuffle,
+    )
+    ds = ds.unbatch().map(lambda x, y: ((x - mean) / scale, y), num_parallel_calls=tf.data.AUTOTUNE)
+
+    if balance:
+        negatives = ds.filter(lambda x, y: y < 0.5).repeat()
+        positives = ds.filter(lambda x, y: y >= 0.5).repeat()
+        ds = tf.data.Dataset.sample_from_datasets([negatives, positives], weights=[0.5, 0.5], seed=42)
+    if shuffle:
+        ds = ds.shuffle(SHUFFLE_BUFFER, seed=42)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+def default_sources(dataset_path, feedback_store=None, chunksize=CHUNK_ROWS):
+    """CSV or Parquet shard(s) plus, optionally, the feedback store"""
+    source = ParquetSource if dataset_path.endswith(".parquet") else CsvSource
+    sources = [source(dataset_path, chunksize)]
+    if feedback_store is not None:
+        sources.append(FeedbackSource(feedback_store, chunksize))
+    return sources
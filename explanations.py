@@ -0,0 +1,379 @@
+import os
+import json
+import math
+import time
+import heapq
+import sqlite3
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# =========================
+# Configuration
+# =========================
+
+EXPLAIN_WORKERS = int(os.environ.get("TRIAGE_EXPLAIN_WORKERS", "4"))
+EXPLAIN_TIMEOUT_S = float(os.environ.get("TRIAGE_EXPLAIN_TIMEOUT_S", "10"))
+EXPLAIN_MAX_PENDING = int(os.environ.get("TRIAGE_EXPLAIN_MAX_PENDING", "256"))
+EXPLAIN_MAX_RESULTS = int(os.environ.get("TRIAGE_EXPLAIN_MAX_RESULTS", "10000"))
+
+EXPLAIN_CACHE_SIZE = int(os.environ.get("TRIAGE_EXPLAIN_CACHE_SIZE", "1024"))
+EXPLAIN_CACHE_TTL_S = float(os.environ.get("TRIAGE_EXPLAIN_CACHE_TTL_S", "3600"))
+EXPLAIN_CACHE_PROB_BUCKET = float(os.environ.get("TRIAGE_EXPLAIN_CACHE_PROB_BUCKET", "0.05"))
+# Path of the optional on-disk tier; empty disables it
+EXPLAIN_CACHE_DB = os.environ.get("TRIAGE_EXPLAIN_CACHE_DB", "")
+
+# =========================
+# Explanation Cache
+# =========================
+
+def profile_key(patient_data, risk_prob, decision, signals, prob_bucket=EXPLAIN_CACHE_PROB_BUCKET):
+    """Canonical cache key for a patient profile.
+
+    Patients with the same decision, signal set, complaint and probability
+    bucket share one explanation, so exact vitals quoted in a cached
+    explanation may differ slightly from the current patient's.
+    """
+    bucket = math.floor(float(risk_prob) / prob_bucket) if prob_bucket > 0 else float(risk_prob)
+    complaint = int(float(patient_data.get("complaint_encoded", 0)))
+    return json.dumps([decision, sorted(signals), complaint, bucket], ensure_ascii=False)
+
+class ExplanationCache:
+    """Bounded LRU with TTL, plus an optional SQLite tier shared across processes.
+
+    `namespace` should identify everything that changes explanation content
+    (MODEL_VERSION and GEMINI_MODEL); entries from another namespace are
+    never served. The SQLite tier may be shared by processes on different
+    versions (rolling deploys), so other namespaces are only removed once
+    their entries pass the TTL.
+    """
+
+    def __init__(self, namespace, max_entries=EXPLAIN_CACHE_SIZE, ttl_s=EXPLAIN_CACHE_TTL_S,
+                 db_path=EXPLAIN_CACHE_DB, prob_bucket=EXPLAIN_CACHE_PROB_BUCKET):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.prob_bucket = prob_bucket
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS explanation_cache ("
+                "key TEXT PRIMARY KEY, namespace TEXT, explanation TEXT, created REAL)"
+            )
+            with self._db:
+                self._db.execute("DELETE FROM explanation_cache WHERE created < ?", (time.time() - ttl_s,))
+
+    def key(self, patient_data, risk_prob, decision, signals):
+        return profile_key(patient_data, risk_prob, decision, signals, self.prob_bucket)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                explanation, created = entry
+                if now - created <= self.ttl_s:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return explanation
+                del self._entries[key]
+                self.counters["expirations"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT explanation, created FROM explanation_cache WHERE key = ? AND namespace = ?",
+                    (key, self.namespace)).fetchone()
+                if row is not None and now - row[1] <= self.ttl_s:
+                    self._store_locked(key, row[0], row[1])
+                    self.counters["disk_hits"] += 1
+                    return row[0]
+
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, key, explanation):
+        now = time.time()
+        with self._lock:
+            self._store_locked(key, explanation, now)
+            if self._db is not None:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO explanation_cache VALUES (?, ?, ?, ?)",
+                        (key, self.namespace, explanation, now))
+
+    def _store_locked(self, key, explanation, created):
+        self._entries[key] = (explanation, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def invalidate(self, namespace=None):
+        """Drop this namespace's entries, or switch to a new namespace.
+
+        Switching leaves the old namespace's SQLite rows to other processes
+        still serving it; they expire by TTL.
+        """
+        with self._lock:
+            self._entries.clear()
+            if namespace is not None:
+                self.namespace = namespace
+            elif self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM explanation_cache WHERE namespace = ?", (self.namespace,))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hit_ratio = (self.counters["hits"] + self.counters["disk_hits"]) / lookups if lookups else 0.0
+            return dict(self.counters, entries=len(self._entries), hit_ratio=hit_ratio, namespace=self.namespace)
+
+# =========================
+# Asynchronous Explanation Pipeline
+# =========================
+
+class ExplanationJob:
+    """One explanation request; completed exactly once (first writer wins)"""
+
+    def __init__(self, job_id, args, callback):
+        self.id = job_id
+        self.args = args
+        self.callback = callback
+        self.submitted = time.monotonic()
+        self.cache_key = None
+        self.done = threading.Event()
+        self.result = {"explanation_id": job_id, "status": "pending"}
+        self._finish_lock = threading.Lock()
+
+    def finish(self, explanation, source, error=None):
+        """Record the result; returns False if the job was already finished"""
+        with self._finish_lock:
+            if self.done.is_set():
+                return False
+            self.result = {
+                "explanation_id": self.id,
+                "status": "done",
+                "explanation": explanation,
+                "source": source,
+                "error": error,
+                "latency_ms": (time.monotonic() - self.submitted) * 1000.0,
+            }
+            self.done.set()
+            return True
+
+class ExplanationPipeline:
+    """Generate explanations on a bounded worker pool without blocking callers.
+
+    `explain_fn(patient_data, risk_prob, decision, signals)` returns text or
+    raises; `fallback_fn` takes the same arguments and must not fail. A job
+    falls back when explain_fn raises, when it misses its deadline, or
+    immediately when more than `max_pending` jobs are in flight. A job that
+    timed out keeps its slot until its explain_fn call actually returns, so
+    at most `max_pending` calls are ever outstanding. Results are
+    delivered to an optional callback and kept for polling by ID. With a
+    `cache`, hits complete immediately and successful explanations are
+    stored, and a miss on a profile whose explanation is already being
+    generated attaches to that call instead of starting another. Attached
+    jobs hold a slot too, so coalescing cannot grow the backlog past
+    `max_pending`.
+    """
+
+    def __init__(self, explain_fn, fallback_fn, max_workers=EXPLAIN_WORKERS,
+                 timeout_s=EXPLAIN_TIMEOUT_S, max_pending=EXPLAIN_MAX_PENDING,
+                 max_results=EXPLAIN_MAX_RESULTS, cache=None):
+        self.explain_fn = explain_fn
+        self.fallback_fn = fallback_fn
+        self.cache = cache
+        self.timeout_s = timeout_s
+        self.max_pending = max_pending
+        self.max_results = max_results
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="explain")
+        self._ids = itertools.count(1)
+        self._jobs = OrderedDict()
+        self._pending = 0
+        # cache key -> [leader job, attached jobs...] while its explain_fn call runs
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._deadlines = []
+        self._cond = threading.Condition(self._lock)
+        self._closed = False
+        self.counters = {"submitted": 0, "cache": 0, "gemini": 0, "fallback": 0, "timeout": 0, "overloaded": 0,
+                         "coalesced": 0}
+        self._watcher = threading.Thread(target=self._watch_deadlines, name="explain-deadlines", daemon=True)
+        self._watcher.start()
+
+    def submit(self, patient_data, risk_prob, decision, signals, callback=None, timeout_s=None):
+        """Queue an explanation; returns its ID immediately"""
+        cache_key = cached = None
+        if self.cache is not None:
+            cache_key = self.cache.key(patient_data, risk_prob, decision, signals)
+            cached = self.cache.get(cache_key)
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ExplanationPipeline is closed")
+            job = ExplanationJob(f"exp-{next(self._ids)}", (patient_data, risk_prob, decision, signals), callback)
+            job.cache_key = cache_key
+            self._jobs[job.id] = job
+            self._evict_locked()
+            self.counters["submitted"] += 1
+            overloaded = cached is None and self._pending >= self.max_pending
+            attached = cached is None and not overloaded and cache_key in self._inflight
+            if cached is None and not overloaded:
+                self._pending += 1
+                if attached:
+                    self._inflight[cache_key].append(job)
+                else:
+                    if cache_key is not None:
+                        self._inflight[cache_key] = [job]
+                deadline = job.submitted + (self.timeout_s if timeout_s is None else timeout_s)
+                heapq.heappush(self._deadlines, (deadline, job.id))
+                self._cond.notify()
+
+        if cached is not None:
+            self._complete(job, cached, "cache")
+        elif overloaded:
+            self._complete(job, self._fallback(job), "overloaded")
+        elif not attached:
+            # Attached jobs complete with the leader's call (or their own deadline)
+            self._executor.submit(self._run, job)
+        return job.id
+
+    def get(self, job_id):
+        """Current result dict for `job_id` (status "pending" or "done"), or None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return None if job is None else job.result
+
+    def wait(self, job_id, timeout=None):
+        """Block until `job_id` is done (or `timeout` elapses); returns its result"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job.done.wait(timeout)
+        return job.result
+
+    def explain(self, patient_data, risk_prob, decision, signals):
+        """Synchronous convenience wrapper bounded by the pipeline timeout"""
+        job_id = self.submit(patient_data, risk_prob, decision, signals)
+        return self.wait(job_id)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters, pending=self._pending, retained=len(self._jobs))
+        if self.cache is not None:
+            stats["cache_stats"] = self.cache.stats()
+        return stats
+
+    def close(self, wait=True):
+        with self._lock:
+            self._closed = True
+            self._cond.notify()
+        self._executor.shutdown(wait=wait)
+
+    def _fallback(self, job):
+        return self.fallback_fn(*job.args)
+
+    def _run(self, job):
+        text = error = None
+        try:
+            if job.done.is_set():
+                # Deadline already passed while queued
+                error = "explanation timed out"
+            else:
+                try:
+                    text = self.explain_fn(*job.args)
+                    if self.cache is not None:
+                        self.cache.put(job.cache_key, text)
+                except Exception as e:
+                    error = str(e)
+        finally:
+            # Slots (the leader's and its attached jobs') are held until the
+            # call returns, even past their deadlines
+            with self._lock:
+                jobs = self._inflight.pop(job.cache_key, [job]) if job.cache_key is not None else [job]
+                self._pending -= len(jobs)
+
+        for j in jobs:
+            if text is not None:
+                self._complete(j, text, "gemini" if j is job else "coalesced")
+            elif error == "explanation timed out":
+                self._complete(j, self._fallback(j), "timeout", error=error)
+            else:
+                self._complete(j, self._fallback(j), "fallback", error=error)
+
+    def _complete(self, job, explanation, source, error=None):
+        if not job.finish(explanation, source, error):
+            return
+        with self._lock:
+            self.counters[source] += 1
+        if job.callback is not None:
+            try:
+                job.callback(job.result)
+            except Exception as e:
+                print(f"⚠️  Explanation callback failed: {e}")
+
+    def _watch_deadlines(self):
+        while True:
+            with self._lock:
+                while not self._deadlines and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._deadlines:
+                    return
+                deadline, job_id = self._deadlines[0]
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                heapq.heappop(self._deadlines)
+                job = self._jobs.get(job_id)
+            if job is not None and not job.done.is_set():
+                self._complete(job, self._fallback(job), "timeout", error="explanation timed out")
+
+    def _evict_locked(self):
+        # Drop the oldest finished jobs once the retention limit is reached
+        excess = len(self._jobs) - self.max_results
+        if excess <= 0:
+            return
+        for job_id in [j for j, job in self._jobs.items() if job.done.is_set()][:excess]:
+            del self._jobs[job_id]
+
+# =========================
+# Local Gemini Stub
+# =========================
+
+class StubGeminiClient:
+    """Offline stand-in for genai.Client with configurable latency and failures.
+
+    Mirrors `client.models.generate_content(model=..., contents=...)` and
+    returns an object with a `.text` attribute.
+    """
+
+    class _Response:
+        def __init__(self, text):
+            self.text = text
+
+    def __init__(self, latency_s=0.0, fail_every=0, text="Stub explanation."):
+        self.latency_s = latency_s
+        self.fail_every = fail_every
+        self.text = text
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.models = self
+
+    def generate_content(self, model, contents):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if self.fail_every and call % self.fail_every == 0:
+            raise RuntimeError("stub Gemini failure")
+        return self._Response(f"{self.text} ({model}, {len(contents)} prompt chars)")
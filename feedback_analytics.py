@@ -0,0 +1,198 @@
+import os
+import json
+import tempfile
+import threading
+from collections import Counter
+
+from feedback_store import open_feedback_store
+from triage_rules import complaint_category, decision_band
+
+# =========================
+# Configuration
+# =========================
+
+ANALYTICS_CHECKPOINT_PATH = "feedback_analytics.json"
+BANDS = ["HIGH", "MODERATE", "LOW", "OTHER"]
+
+# =========================
+# Running Aggregates
+# =========================
+
+def _empty_bucket():
+    return {"records": 0, "reviewed": 0, "agreements": 0, "overrides": 0}
+
+def _fold_bucket(bucket, agreement):
+    bucket["records"] += 1
+    if agreement is not None:
+        bucket["reviewed"] += 1
+        if agreement:
+            bucket["agreements"] += 1
+        else:
+            bucket["overrides"] += 1
+
+def _with_rate(bucket):
+    rate = bucket["agreements"] / bucket["reviewed"] if bucket["reviewed"] else None
+    return dict(bucket, agreement_rate=rate)
+
+class FeedbackAggregates:
+    """Mergeable counters for agreement, decisions and per-group windows"""
+
+    def __init__(self):
+        self.totals = _empty_bucket()
+        self.decision_counts = Counter()
+        # confusion[ai_band][clinician_band]
+        self.confusion = {ai: {c: 0 for c in BANDS} for ai in BANDS}
+        self.by_hour = {}
+        self.by_day = {}
+        self.by_model_version = {}
+        self.by_complaint = {}
+
+    def add(self, record):
+        agreement = record.get("agreement")
+        _fold_bucket(self.totals, agreement)
+        self.decision_counts[record.get("ai_decision")] += 1
+
+        ai_band = decision_band(record.get("ai_decision"))
+        clinician_band = decision_band(record.get("clinician_decision"))
+        if ai_band and clinician_band:
+            self.confusion[ai_band][clinician_band] += 1
+
+        timestamp = record.get("timestamp") or ""
+        patient = record.get("patient_data") or {}
+        groups = (
+            (self.by_hour, timestamp[:13] or "unknown"),
+            (self.by_day, timestamp[:10] or "unknown"),
+            (self.by_model_version, record.get("model_version") or "unknown"),
+            (self.by_complaint, complaint_category(patient.get("complaint_encoded"))),
+        )
+        for table, key in groups:
+            _fold_bucket(table.setdefault(key, _empty_bucket()), agreement)
+
+    def to_dict(self):
+        return {
+            "totals": self.totals,
+            "decision_counts": dict(self.decision_counts),
+            "confusion": self.confusion,
+            "by_hour": self.by_hour,
+            "by_day": self.by_day,
+            "by_model_version": self.by_model_version,
+            "by_complaint": self.by_complaint,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregates = cls()
+        aggregates.totals = data["totals"]
+        aggregates.decision_counts = Counter(data["decision_counts"])
+        aggregates.confusion = data["confusion"]
+        aggregates.by_hour = data["by_hour"]
+        aggregates.by_day = data["by_day"]
+        aggregates.by_model_version = data["by_model_version"]
+        aggregates.by_complaint = data["by_complaint"]
+        return aggregates
+
+    def summary(self):
+        """JSON-ready view with agreement rates filled in"""
+        data = self.to_dict()
+        data["totals"] = _with_rate(self.totals)
+        for key in ("by_hour", "by_day", "by_model_version", "by_complaint"):
+            data[key] = {k: _with_rate(v) for k, v in sorted(data[key].items())}
+        return data
+
+# =========================
+# Incremental Analytics Engine
+# =========================
+
+class FeedbackAnalytics:
+    """Fold new feedback records into persisted aggregates.
+
+    The checkpoint stores the store cursor (byte offset, row id or row
+    count, depending on the backend) next to the aggregates, so each
+    update() only reads records appended since the last one.
+    """
+
+    def __init__(self, store=None, checkpoint_path=ANALYTICS_CHECKPOINT_PATH):
+        self.store = store if store is not None else open_feedback_store()
+        self.checkpoint_path = checkpoint_path
+        self._lock = threading.Lock()
+        self.cursor = 0
+        self.aggregates = FeedbackAggregates()
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("store") != self._store_id():
+            # Checkpoint belongs to a different store; rebuild from scratch
+            return
+        self.cursor = data["cursor"]
+        self.aggregates = FeedbackAggregates.from_dict(data["aggregates"])
+
+    def _save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        data = {"store": self._store_id(), "cursor": self.cursor, "aggregates": self.aggregates.to_dict()}
+        # Unique temp file: pre-fork workers checkpoint the same path concurrently
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.checkpoint_path)),
+                                        prefix=os.path.basename(self.checkpoint_path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.checkpoint_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _store_id(self):
+        location = getattr(self.store, "path", None) or getattr(self.store, "directory", None)
+        return f"{self.store.name}:{os.path.abspath(location)}"
+
+    def update(self):
+        """Fold in records added since the last call; returns how many were new"""
+        with self._lock:
+            try:
+                records, cursor = self.store.read_since(self.cursor)
+            except ValueError:
+                # The store was truncated or replaced; start over
+                self.aggregates = FeedbackAggregates()
+                records, cursor = self.store.read_since(0)
+            for record in records:
+                self.aggregates.add(record)
+            if records or cursor != self.cursor:
+                self.cursor = cursor
+                self._save_checkpoint()
+            return len(records)
+
+    def summary(self):
+        with self._lock:
+            return self.aggregates.summary()
+
+def print_report(summary):
+    """Pretty print an analytics summary"""
+    totals = summary["totals"]
+    print(f"\n{'='*60}")
+    print(f"📊 Feedback Analysis ({totals['records']} records)")
+    print(f"{'='*60}\n")
+
+    if totals["reviewed"]:
+        print(f"Clinician-AI Agreement Rate: {totals['agreement_rate']:.1%}")
+        print(f"Total Overrides: {totals['overrides']}")
+
+    print(f"\nDecision Distribution:")
+    for decision, count in Counter(summary["decision_counts"]).most_common():
+        print(f"  {decision}: {count} ({count/totals['records']:.1%})")
+
+    print(f"\nConfusion Matrix (rows = AI, columns = clinician):")
+    print("  " + " " * 10 + "".join(f"{band:>10}" for band in BANDS))
+    for ai_band in BANDS:
+        row = summary["confusion"][ai_band]
+        print(f"  {ai_band:<10}" + "".join(f"{row[band]:>10}" for band in BANDS))
+
+    for title, key in (("Model Version", "by_model_version"), ("Complaint", "by_complaint"), ("Day", "by_day")):
+        print(f"\nBy {title}:")
+        for group, bucket in summary[key].items():
+            rate = bucket["agreement_rate"]
+            rate_text = f"{rate:.1%}" if rate is not None else "n/a"
+            print(f"  {group}: {bucket['records']} records, agreement {rate_text}, overrides {bucket['overrides']}")
@@ -0,0 +1,667 @@
+import os
+import re
+import json
+import glob
+import gzip
+import time
+import shutil
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within one process
+    fcntl = None
+
+import numpy as np
+
+from triage_rules import FEATURES
+
+# =========================
+# Configuration
+# =========================
+
+FEEDBACK_LOG_PATH = "feedback_log.jsonl"
+FEEDBACK_DB_PATH = "feedback.db"
+FEEDBACK_SEGMENTS_DIR = "feedback_segments"
+
+# The JSONL log is sealed into a gzip segment once the active file passes
+# this size, or has been appended to for this long by one process (0 disables)
+FEEDBACK_ROTATE_MB = float(os.environ.get("TRIAGE_FEEDBACK_ROTATE_MB", "64"))
+FEEDBACK_ROTATE_S = float(os.environ.get("TRIAGE_FEEDBACK_ROTATE_S", "86400"))
+
+# "jsonl", "sqlite" or "parquet", optionally with a path: "sqlite:/data/feedback.db"
+DEFAULT_FEEDBACK_STORE = os.environ.get("TRIAGE_FEEDBACK_STORE", "jsonl")
+
+RECORD_FIELDS = [
+    "timestamp",
+    "model_version",
+    "patient_data",
+    "ai_risk_probability",
+    "ai_decision",
+    "ai_signals",
+    "ai_explanation",
+    "clinician_decision",
+    "clinician_notes",
+    "agreement",
+]
+
+# =========================
+# Record Normalization
+# =========================
+
+def normalize_record(record):
+    """Bring a feedback record to the current schema.
+
+    Early logs stored the signal list under `explanation` and had no
+    model_version, ai_explanation, clinician_notes or agreement fields.
+    """
+    record = dict(record)
+    if "ai_signals" not in record and "explanation" in record:
+        record["ai_signals"] = record.pop("explanation")
+    for field in RECORD_FIELDS:
+        record.setdefault(field, None)
+    return record
+
+def _as_timestamp(value):
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+def _matches(record, start, end, model_version, clinician_decision):
+    ts = record["timestamp"]
+    if start is not None and (ts is None or ts < start):
+        return False
+    if end is not None and (ts is None or ts >= end):
+        return False
+    if model_version is not None and record["model_version"] != model_version:
+        return False
+    if clinician_decision is not None and record["clinician_decision"] != clinician_decision:
+        return False
+    return True
+
+# =========================
+# JSONL Store (legacy format)
+# =========================
+
+# Sealed segment suffix: <path>.<start>-<end>[.gz], offsets in the logical log
+_SEGMENT_RE = re.compile(r"^(\d{20})-(\d{20})(\.gz)?$")
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+class JsonlFeedbackStore:
+    """Append-only JSON lines log with rotation into compressed segments.
+
+    New records go to the active file at `path`. Past `rotate_mb` (or
+    `rotate_s` of appends by one process) it is sealed as
+    `<path>.<start>-<end>` and gzipped, where start/end are offsets in the
+    logical log: every sealed segment uncompressed, then the active file.
+    Readers walk that sequence and read_since cursors are logical offsets,
+    so rotation is invisible to them and old byte-offset cursors stay valid.
+
+    Every batch is one O_APPEND write under an flock on `<path>.lock`, so
+    threads and processes can share the log without interleaving lines.
+    """
+    name = "jsonl"
+
+    def __init__(self, path=FEEDBACK_LOG_PATH, rotate_mb=FEEDBACK_ROTATE_MB, rotate_s=FEEDBACK_ROTATE_S):
+        self.path = path
+        self.rotate_bytes = int(rotate_mb * 1024 * 1024)
+        self.rotate_s = rotate_s
+        self._lock = threading.Lock()
+        self._active_since = None
+
+    @contextmanager
+    def _locked(self, shared=False):
+        """Exclusive (append/rotate) or shared (open for reading) log lock"""
+        if fcntl is None:
+            with self._lock:
+                yield
+            return
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def sealed_segments(self):
+        """[(start, end, path)] in log order; a gzipped copy wins over a raw one"""
+        segments = {}
+        prefix = self.path + "."
+        for path in glob.glob(glob.escape(prefix) + "*-*"):
+            match = _SEGMENT_RE.match(path[len(prefix):])
+            if match:
+                key = (int(match.group(1)), int(match.group(2)))
+                if match.group(3) or key not in segments:
+                    segments[key] = path
+        return [(start, end, path) for (start, end), path in sorted(segments.items())]
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records, fsync=False):
+        if not records:
+            return
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+        sealed = None
+        with self._locked():
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                _write_all(fd, data)
+                if fsync:
+                    os.fsync(fd)
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            if self._active_since is None:
+                self._active_since = time.monotonic()
+            if self._should_rotate(size):
+                sealed = self._seal_locked()
+        if sealed:
+            self._compress(sealed)
+
+    def _should_rotate(self, size):
+        if self.rotate_bytes > 0 and size >= self.rotate_bytes:
+            return True
+        return self.rotate_s > 0 and time.monotonic() - self._active_since >= self.rotate_s
+
+    def rotate(self):
+        """Seal the active file now and compress any raw sealed segments"""
+        with self._locked():
+            self._seal_locked()
+        for _, _, path in self.sealed_segments():
+            if not path.endswith(".gz"):
+                self._compress(path)
+
+    def _seal_locked(self):
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return None
+        self._active_since = None
+        if size == 0:
+            return None
+        segments = self.sealed_segments()
+        start = segments[-1][1] if segments else 0
+        sealed = f"{self.path}.{start:020d}-{start + size:020d}"
+        os.replace(self.path, sealed)
+        return sealed
+
+    def _compress(self, sealed):
+        # Compress outside the lock; only the swap to .gz excludes readers
+        tmp = f"{sealed}.gz.{os.getpid()}.tmp"
+        try:
+            with open(sealed, "rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        except FileNotFoundError:
+            # Another process compressed it first
+            return
+        with self._locked():
+            if not os.path.exists(sealed):
+                os.remove(tmp)
+                return
+            os.replace(tmp, sealed + ".gz")
+            os.remove(sealed)
+
+    def _open_parts(self, cursor=0):
+        """[(start, file)] for every part of the log holding data past `cursor`.
+
+        Files are opened under the shared lock, so a concurrent rotation or
+        compression cannot remove one before it is read.
+        """
+        parts = []
+        try:
+            with self._locked(shared=True):
+                segments = self.sealed_segments()
+                for start, end, path in segments:
+                    if end > cursor:
+                        parts.append((start, gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")))
+                base = segments[-1][1] if segments else 0
+                if os.path.exists(self.path):
+                    parts.append((base, open(self.path, "rb")))
+        except BaseException:
+            for _, f in parts:
+                f.close()
+            raise
+        return parts, base
+
+    def iter_records(self):
+        parts, _ = self._open_parts()
+        try:
+            for _, f in parts:
+                for line in f:
+                    # A line without its newline is still being written
+                    if line.endswith(b"\n") and line.strip():
+                        yield normalize_record(json.loads(line))
+        finally:
+            for _, f in parts:
+                f.close()
+
+    def read_since(self, cursor=0):
+        """Records appended after logical offset `cursor`; returns (records, new_cursor).
+
+        A trailing line without a newline is still being written and is left
+        for the next call.
+        """
+        cursor = cursor or 0
+        parts, end = self._open_parts(cursor)
+        chunks = []
+        try:
+            for start, f in parts:
+                offset = max(0, cursor - start)
+                f.seek(offset)
+                chunk = f.read()
+                chunks.append(chunk)
+                end = start + offset + len(chunk)
+        finally:
+            for _, f in parts:
+                f.close()
+        if cursor > end:
+            raise ValueError("cursor is past the end of the feedback log")
+        data = b"".join(chunks)
+        complete = data[:data.rfind(b"\n") + 1]
+        records = [normalize_record(json.loads(line)) for line in complete.splitlines() if line.strip()]
+        return records, cursor + len(complete)
+
+    def query(self, start=None, end=None, model_version=None, clinician_decision=None):
+        """Records with start <= timestamp < end, optionally filtered"""
+        start, end = _as_timestamp(start), _as_timestamp(end)
+        return [r for r in self.iter_records()
+                if _matches(r, start, end, model_version, clinician_decision)]
+
+    def count(self):
+        return sum(1 for _ in self.iter_records())
+
+    def latest_timestamp(self):
+        """Newest record timestamp, or None for an empty log"""
+        return max((r["timestamp"] for r in self.iter_records() if r["timestamp"]), default=None)
+
+    def feature_rows(self, start=None, end=None):
+        """(n, 7) feature matrix and matching clinician decisions"""
+        records = self.query(start, end)
+        X = np.array([[float(r["patient_data"][k]) for k in FEATURES] for r in records],
+                     dtype=np.float64).reshape(len(records), len(FEATURES))
+        return X, [r["clinician_decision"] for r in records]
+
+    def iter_feature_chunks(self, chunksize=50000):
+        """Stream (X, clinician_decisions) chunks without loading the whole log"""
+        rows, decisions = [], []
+        for r in self.iter_records():
+            rows.append([float(r["patient_data"][k]) for k in FEATURES])
+            decisions.append(r["clinician_decision"])
+            if len(rows) >= chunksize:
+                yield np.array(rows, dtype=np.float64), decisions
+                rows, decisions = [], []
+        if rows:
+            yield np.array(rows, dtype=np.float64), decisions
+
+    def close(self):
+        pass
+
+# =========================
+# SQLite Store
+# =========================
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    model_version TEXT,
+    ai_risk_probability REAL,
+    ai_decision TEXT,
+    clinician_decision TEXT,
+    agreement INTEGER,
+    {feature_columns},
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_timestamp ON feedback (timestamp);
+CREATE INDEX IF NOT EXISTS idx_feedback_model_version ON feedback (model_version, timestamp);
+CREATE INDEX IF NOT EXISTS idx_feedback_clinician_decision ON feedback (clinician_decision);
+""".format(feature_columns=",\n    ".join(f"{k} REAL" for k in FEATURES))
+
+class SQLiteFeedbackStore:
+    """SQLite in WAL mode with indexed timestamp/model_version/decision columns.
+
+    Features are stored as real columns so retraining reads a matrix
+    without parsing JSON; the full record is kept as a JSON blob.
+    """
+    name = "sqlite"
+
+    def __init__(self, path=FEEDBACK_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SQLITE_SCHEMA)
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records, fsync=False):
+        rows = []
+        for r in records:
+            r = normalize_record(r)
+            patient = r["patient_data"] or {}
+            agreement = None if r["agreement"] is None else int(bool(r["agreement"]))
+            rows.append((
+                r["timestamp"], r["model_version"], r["ai_risk_probability"], r["ai_decision"],
+                r["clinician_decision"], agreement,
+                *[patient.get(k) for k in FEATURES],
+                json.dumps(r, ensure_ascii=False),
+            ))
+        columns = ["timestamp", "model_version", "ai_risk_probability", "ai_decision",
+                   "clinician_decision", "agreement", *FEATURES, "record"]
+        sql = f"INSERT INTO feedback ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        with self._lock:
+            if fsync:
+                # WAL + synchronous=FULL syncs the log on this commit
+                self._conn.execute("PRAGMA synchronous=FULL")
+            try:
+                with self._conn:
+                    self._conn.executemany(sql, rows)
+            finally:
+                if fsync:
+                    self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def _where(self, start, end, model_version, clinician_decision):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(_as_timestamp(start))
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(_as_timestamp(end))
+        if model_version is not None:
+            clauses.append("model_version = ?")
+            params.append(model_version)
+        if clinician_decision is not None:
+            clauses.append("clinician_decision = ?")
+            params.append(clinician_decision)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def iter_records(self):
+        return iter(self.query())
+
+    def read_since(self, cursor=0):
+        """Records with id > `cursor`; returns (records, new_cursor)"""
+        cursor = cursor or 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, record FROM feedback WHERE id > ? ORDER BY id", (cursor,)).fetchall()
+        if not rows:
+            return [], cursor
+        return [json.loads(row[1]) for row in rows], rows[-1][0]
+
+    def query(self, start=None, end=None, model_version=None, clinician_decision=None):
+        """Records with start <= timestamp < end, optionally filtered"""
+        where, params = self._where(start, end, model_version, clinician_decision)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT record FROM feedback{where} ORDER BY id", params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM feedback").fetchone()[0]
+
+    def latest_timestamp(self):
+        """Newest record timestamp, or None for an empty store"""
+        with self._lock:
+            return self._conn.execute("SELECT MAX(timestamp) FROM feedback").fetchone()[0]
+
+    def feature_rows(self, start=None, end=None):
+        """(n, 7) feature matrix and matching clinician decisions"""
+        where, params = self._where(start, end, None, None)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(FEATURES)}, clinician_decision FROM feedback{where} ORDER BY id",
+                params).fetchall()
+        X = np.array([row[:-1] for row in rows], dtype=np.float64).reshape(len(rows), len(FEATURES))
+        return X, [row[-1] for row in rows]
+
+    def iter_feature_chunks(self, chunksize=50000):
+        """Stream (X, clinician_decisions) chunks on a separate read connection"""
+        conn = sqlite3.connect(self.path)
+        try:
+            cursor = conn.execute(f"SELECT {', '.join(FEATURES)}, clinician_decision FROM feedback ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                yield np.array([row[:-1] for row in rows], dtype=np.float64), [row[-1] for row in rows]
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# =========================
+# Parquet Segment Store
+# =========================
+
+class ParquetFeedbackStore:
+    """Directory of immutable Parquet segments, one per append batch.
+
+    Requires pyarrow. Queries push timestamp/model_version filters down to
+    the segment scan; `compact()` merges small segments.
+    """
+    name = "parquet"
+
+    def __init__(self, directory=FEEDBACK_SEGMENTS_DIR):
+        try:
+            import pyarrow as pa
+            import pyarrow.dataset as ds
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("The parquet feedback store requires pyarrow (pip install pyarrow)") from e
+        self.pa, self.ds, self.pq = pa, ds, pq
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.schema = pa.schema(
+            [
+                ("timestamp", pa.string()),
+                ("model_version", pa.string()),
+                ("ai_risk_probability", pa.float64()),
+                ("ai_decision", pa.string()),
+                ("ai_signals", pa.list_(pa.string())),
+                ("ai_explanation", pa.string()),
+                ("clinician_decision", pa.string()),
+                ("clinician_notes", pa.string()),
+                ("agreement", pa.bool_()),
+            ]
+            + [(k, pa.float64()) for k in FEATURES]
+        )
+
+    def _segment_path(self):
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        return os.path.join(self.directory, f"segment-{stamp}-{os.getpid()}.parquet")
+
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, "segment-*.parquet")))
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records, fsync=False):
+        records = [normalize_record(r) for r in records]
+        if not records:
+            return
+        columns = {name: [] for name in self.schema.names}
+        for r in records:
+            patient = r["patient_data"] or {}
+            for name in self.schema.names:
+                columns[name].append(patient.get(name) if name in FEATURES else r[name])
+        table = self.pa.Table.from_pydict(columns, schema=self.schema)
+        with self._lock:
+            path = self._segment_path()
+            # Write then rename so readers never see a partial segment
+            self.pq.write_table(table, path + ".tmp")
+            if fsync:
+                with open(path + ".tmp", "rb") as f:
+                    os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+
+    def _table(self, start=None, end=None, model_version=None, clinician_decision=None, columns=None):
+        segments = self._segments()
+        if not segments:
+            return self.schema.empty_table().select(columns or self.schema.names)
+        field = self.ds.field
+        expr = None
+        for cond in (
+            None if start is None else field("timestamp") >= _as_timestamp(start),
+            None if end is None else field("timestamp") < _as_timestamp(end),
+            None if model_version is None else field("model_version") == model_version,
+            None if clinician_decision is None else field("clinician_decision") == clinician_decision,
+        ):
+            if cond is not None:
+                expr = cond if expr is None else expr & cond
+        dataset = self.ds.dataset(segments, schema=self.schema, format="parquet")
+        return dataset.to_table(columns=columns, filter=expr)
+
+    def iter_records(self):
+        return iter(self.query())
+
+    def _to_records(self, table):
+        records = []
+        for row in table.to_pylist():
+            row["patient_data"] = {k: row.pop(k) for k in FEATURES}
+            records.append({field: row[field] for field in RECORD_FIELDS})
+        return records
+
+    def read_since(self, cursor=0):
+        """Records after the first `cursor` rows (segments in name order).
+
+        Returns (records, new_cursor). compact() keeps row order, so cursors
+        stay valid across compaction.
+        """
+        cursor = cursor or 0
+        records, seen = [], 0
+        for path in self._segments():
+            rows = self.pq.ParquetFile(path).metadata.num_rows
+            if seen + rows > cursor:
+                table = self.pq.read_table(path, schema=self.schema)
+                records.extend(self._to_records(table.slice(max(0, cursor - seen))))
+            seen += rows
+        if cursor > seen:
+            raise ValueError("cursor is past the end of the feedback segments")
+        return records, seen
+
+    def query(self, start=None, end=None, model_version=None, clinician_decision=None):
+        """Records with start <= timestamp < end, optionally filtered"""
+        return self._to_records(self._table(start, end, model_version, clinician_decision))
+
+    def count(self):
+        return sum(self.pq.ParquetFile(p).metadata.num_rows for p in self._segments())
+
+    def latest_timestamp(self):
+        """Newest record timestamp, or None for an empty store"""
+        import pyarrow.compute as pc
+        column = self._table(columns=["timestamp"]).column("timestamp")
+        return pc.max(column).as_py() if len(column) else None
+
+    def feature_rows(self, start=None, end=None):
+        """(n, 7) feature matrix and matching clinician decisions"""
+        table = self._table(start, end, columns=FEATURES + ["clinician_decision"])
+        X = np.column_stack([table.column(k).to_numpy(zero_copy_only=False) for k in FEATURES]) \
+            if table.num_rows else np.empty((0, len(FEATURES)))
+        return X.astype(np.float64), table.column("clinician_decision").to_pylist()
+
+    def iter_feature_chunks(self, chunksize=50000):
+        """Stream (X, clinician_decisions) record batches from the segments"""
+        segments = self._segments()
+        if not segments:
+            return
+        dataset = self.ds.dataset(segments, schema=self.schema, format="parquet")
+        for batch in dataset.to_batches(columns=FEATURES + ["clinician_decision"], batch_size=chunksize):
+            if batch.num_rows:
+                X = np.column_stack([batch.column(k).to_numpy(zero_copy_only=False) for k in FEATURES])
+                yield X.astype(np.float64), batch.column("clinician_decision").to_pylist()
+
+    def compact(self):
+        """Merge all segments into one, preserving row order.
+
+        The merged segment takes the name of the newest input so it sorts
+        before any segment appended afterwards.
+        """
+        with self._lock:
+            segments = self._segments()
+            if len(segments) < 2:
+                return
+            table = self.pa.concat_tables(self.pq.read_table(p, schema=self.schema) for p in segments)
+            path = segments[-1]
+            self.pq.write_table(table, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            for segment in segments[:-1]:
+                os.remove(segment)
+
+    def close(self):
+        pass
+
+# =========================
+# Store Factory & Migration
+# =========================
+
+STORES = {
+    "jsonl": (JsonlFeedbackStore, FEEDBACK_LOG_PATH),
+    "sqlite": (SQLiteFeedbackStore, FEEDBACK_DB_PATH),
+    "parquet": (ParquetFeedbackStore, FEEDBACK_SEGMENTS_DIR),
+}
+
+def open_feedback_store(spec=None):
+    """Open a store from a spec like "sqlite" or "parquet:/data/segments" """
+    spec = spec or DEFAULT_FEEDBACK_STORE
+    kind, _, path = spec.partition(":")
+    if kind not in STORES:
+        raise ValueError(f"Unknown feedback store '{kind}'. Choose from: {', '.join(STORES)}")
+    cls, default_path = STORES[kind]
+    return cls(path or default_path)
+
+def migrate(source, target, batch_size=10000):
+    """Copy every record from one store to another in batches"""
+    src, dst = open_feedback_store(source), open_feedback_store(target)
+    moved, batch = 0, []
+    for record in src.iter_records():
+        batch.append(normalize_record(record))
+        if len(batch) >= batch_size:
+            dst.append_many(batch)
+            moved += len(batch)
+            batch = []
+    if batch:
+        dst.append_many(batch)
+        moved += len(batch)
+    src.close()
+    dst.close()
+    print(f"✅ Migrated {moved} feedback records from {source} to {target}")
+    return moved
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Feedback store tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    m = sub.add_parser("migrate", help="copy records between stores")
+    m.add_argument("--source", default=f"jsonl:{FEEDBACK_LOG_PATH}")
+    m.add_argument("--target", default=f"sqlite:{FEEDBACK_DB_PATH}")
+    m.add_argument("--batch-size", type=int, default=10000)
+    c = sub.add_parser("count", help="count records in a store")
+    c.add_argument("store", nargs="?", default=None)
+    r = sub.add_parser("rotate", help="seal and compress the active JSONL log")
+    r.add_argument("path", nargs="?", default=FEEDBACK_LOG_PATH)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate(args.source, args.target, args.batch_size)
+    elif args.command == "count":
+        print(open_feedback_store(args.store).count())
+    elif args.command == "rotate":
+        store = JsonlFeedbackStore(args.path)
+        store.rotate()
+        print(f"✅ {len(store.sealed_segments())} sealed segments next to {args.path}")
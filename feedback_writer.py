@@ -0,0 +1,182 @@
+import os
+import time
+import threading
+
+# =========================
+# Configuration
+# =========================
+
+# Records the ring buffer holds before append() blocks (backpressure)
+FEEDBACK_BUFFER_SIZE = int(os.environ.get("TRIAGE_FEEDBACK_BUFFER_SIZE", "8192"))
+# A batch is written once this many records are pending...
+FEEDBACK_FLUSH_RECORDS = int(os.environ.get("TRIAGE_FEEDBACK_FLUSH_RECORDS", "256"))
+# ...or the oldest pending record has waited this long
+FEEDBACK_FLUSH_INTERVAL_MS = float(os.environ.get("TRIAGE_FEEDBACK_FLUSH_INTERVAL_MS", "50"))
+
+# none:  append() returns at once; a crash loses up to one flush interval
+# flush: append() returns once its batch is written to the OS (survives a process crash)
+# fsync: append() returns once its batch is fsynced (survives power loss)
+FEEDBACK_DURABILITY = os.environ.get("TRIAGE_FEEDBACK_DURABILITY", "flush")
+DURABILITY_LEVELS = ("none", "flush", "fsync")
+
+# How long a durable append() waits before raising (the record stays queued)
+FEEDBACK_COMMIT_TIMEOUT_S = float(os.environ.get("TRIAGE_FEEDBACK_COMMIT_TIMEOUT_S", "10"))
+RETRY_BACKOFF_S = 1.0
+
+# =========================
+# Group-Commit Writer
+# =========================
+
+class FeedbackWriter:
+    """Buffers feedback records and writes them to a store in batches.
+
+    Records go into a fixed-size ring buffer; one writer thread drains it
+    with a single store.append_many call per batch (one write, and one
+    fsync at "fsync" durability, shared by every record in it). A batch
+    is written when FEEDBACK_FLUSH_RECORDS are pending, when the oldest
+    has waited FEEDBACK_FLUSH_INTERVAL_MS, or right away if a caller is
+    blocked on durability; records that arrive during a write form the
+    next batch. Each process needs its own writer; the stores serialize
+    writers across processes.
+    """
+
+    def __init__(self, store, durability=FEEDBACK_DURABILITY, capacity=FEEDBACK_BUFFER_SIZE,
+                 flush_records=FEEDBACK_FLUSH_RECORDS, flush_interval_ms=FEEDBACK_FLUSH_INTERVAL_MS,
+                 commit_timeout_s=FEEDBACK_COMMIT_TIMEOUT_S):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability '{durability}'. Choose from: {', '.join(DURABILITY_LEVELS)}")
+        self.store = store
+        self.durability = durability
+        self.capacity = max(1, capacity)
+        self.flush_records = max(1, min(flush_records, self.capacity))
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.commit_timeout_s = commit_timeout_s
+        self.pid = os.getpid()
+
+        # Sequence numbers: records [committed, appended) are pending and
+        # live at ring[seq % capacity]
+        self._ring = [None] * self.capacity
+        self._appended = 0
+        self._committed = 0
+        self._oldest = None
+        self._waiters = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self.counters = {"batches": 0, "fsyncs": 0, "errors": 0, "blocked": 0}
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+        self._thread.start()
+
+    def append(self, record, wait=None):
+        """Queue one record; returns its sequence number.
+
+        Blocks until the batch holding it is committed when `wait` is set
+        (default: durability is "flush" or "fsync").
+        """
+        wait = self.durability != "none" if wait is None else wait
+        with self._cond:
+            if self._appended - self._committed >= self.capacity:
+                self.counters["blocked"] += 1
+                self._cond.notify_all()
+                while self._appended - self._committed >= self.capacity and not self._closed:
+                    self._cond.wait()
+            if self._closed:
+                raise RuntimeError("FeedbackWriter is closed")
+            self._ring[self._appended % self.capacity] = record
+            self._appended += 1
+            seq = self._appended
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if wait:
+                self._wait_committed(seq)
+            elif self._appended - self._committed >= self.flush_records:
+                self._cond.notify_all()
+        return seq
+
+    def flush(self):
+        """Block until everything appended so far is committed"""
+        with self._cond:
+            self._flush_requested = True
+            self._wait_committed(self._appended)
+
+    def _wait_committed(self, seq):
+        deadline = time.monotonic() + self.commit_timeout_s
+        self._waiters += 1
+        self._cond.notify_all()
+        try:
+            while self._committed < seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"feedback not committed after {self.commit_timeout_s:.0f}s "
+                                       f"(last error: {self.last_error}); it stays queued")
+                self._cond.wait(remaining)
+        finally:
+            self._waiters -= 1
+
+    def close(self):
+        """Write everything still buffered and stop the writer thread"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def stats(self):
+        with self._cond:
+            batches = self.counters["batches"]
+            return dict(
+                self.counters,
+                durability=self.durability,
+                appended=self._appended,
+                committed=self._committed,
+                pending=self._appended - self._committed,
+                mean_batch_size=self._committed / batches if batches else 0.0,
+                last_error=self.last_error,
+            )
+
+    def _ready_locked(self):
+        pending = self._appended - self._committed
+        if not pending:
+            return False
+        if pending >= self.flush_records or self._waiters or self._flush_requested or self._closed:
+            return True
+        return time.monotonic() - self._oldest >= self.flush_interval
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._ready_locked():
+                    if self._closed:
+                        return
+                    timeout = None
+                    if self._oldest is not None:
+                        timeout = max(0.0, self._oldest + self.flush_interval - time.monotonic())
+                    self._cond.wait(timeout)
+                start, end = self._committed, self._appended
+                batch = [self._ring[seq % self.capacity] for seq in range(start, end)]
+                self._flush_requested = False
+
+            fsync = self.durability == "fsync"
+            try:
+                self.store.append_many(batch, fsync=fsync)
+            except Exception as e:
+                # Keep the batch buffered and retry; durable callers time out meanwhile
+                with self._cond:
+                    self.counters["errors"] += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+                print(f"⚠️  Feedback write failed ({len(batch)} records queued): {self.last_error}")
+                if self._closed and self.counters["errors"] >= 3:
+                    return
+                time.sleep(RETRY_BACKOFF_S)
+                continue
+
+            with self._cond:
+                for seq in range(start, end):
+                    self._ring[seq % self.capacity] = None
+                self._committed = end
+                self._oldest = time.monotonic() if self._appended > end else None
+                self.counters["batches"] += 1
+                self.counters["fsyncs"] += int(fsync)
+                self._cond.notify_all()
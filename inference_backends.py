@@ -0,0 +1,431 @@
+import os
+import threading
+
+import numpy as np
+
+from instrumentation import stage
+from model_bundle import BUNDLE_ROOT, current_bundle, load_bundle
+from triage_rules import FEATURES, CRITICAL_THRESHOLD, MODERATE_THRESHOLD
+
+# =========================
+# Configuration
+# =========================
+
+MODEL_PATH = "triage_model.keras"
+SCALER_PATH = "scaler.pkl"
+TFLITE_MODEL_PATH = "mobile/flutter/assets/model.tflite"
+NUMPY_WEIGHTS_PATH = "triage_model_weights.npz"
+RF_MODEL_PATH = "triage_model_rf.pkl"
+HGB_MODEL_PATH = "triage_model_hgb.pkl"
+
+# Written by `python model_registry.py benchmark`; TRIAGE_BACKEND=auto
+# serves the model it selected
+MODEL_BENCHMARK_PATH = "model_benchmark.json"
+
+# Unset: the published model bundle when there is one, else keras
+DEFAULT_BACKEND = os.environ.get("TRIAGE_BACKEND", "")
+
+# Per-process thread pools (0 = library default). BLAS threads for the
+# numpy/sklearn backends follow OMP_NUM_THREADS, which serve.py sets.
+INTRA_OP_THREADS = int(os.environ.get("TRIAGE_INTRA_OP_THREADS", "0"))
+INTER_OP_THREADS = int(os.environ.get("TRIAGE_INTER_OP_THREADS", "0"))
+
+# Max |p_backend - p_keras| tolerated by the parity check. TFLite uses
+# dynamic-range quantized weights, so it gets a looser budget.
+PARITY_TOLERANCE = {
+    "numpy": 1e-4,
+    "bundle": 1e-4,
+    "tflite": 2e-2,
+}
+
+# =========================
+# Backends
+# =========================
+# Every backend takes raw (unscaled) features in FEATURES order and
+# returns a 1-D array of risk probabilities.
+
+class KerasBackend:
+    """Full Keras model + pickled StandardScaler (needs TensorFlow)"""
+    name = "keras"
+
+    def __init__(self, model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+        _require(model_path, scaler_path)
+        import joblib
+        import tensorflow as tf
+        _configure_tf_threads(tf)
+        self.model = tf.keras.models.load_model(model_path)
+        self.scaler = joblib.load(scaler_path)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        # Unscaled features would score silently wrong; let the error surface
+        with stage("scaler_transform"):
+            Xs = self.scaler.transform(X)
+        with stage("model_predict"):
+            return self.model.predict(Xs, verbose=0).ravel()
+
+class TFLiteBackend:
+    """TFLite interpreter; prefers tflite_runtime over full TensorFlow"""
+    name = "tflite"
+
+    def __init__(self, tflite_path=TFLITE_MODEL_PATH, scaler_path=SCALER_PATH):
+        _require(tflite_path, scaler_path)
+        import joblib
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.scaler = joblib.load(scaler_path)
+        self.interpreter = Interpreter(model_path=tflite_path, num_threads=INTRA_OP_THREADS or None)
+        self.interpreter.allocate_tensors()
+        input_details = self.interpreter.get_input_details()[0]
+        output_details = self.interpreter.get_output_details()[0]
+        self._input = input_details["index"]
+        self._output = output_details["index"]
+        # Full-integer models take and return int8 tensors
+        self._input_dtype = input_details["dtype"]
+        self._input_quant = input_details["quantization"]
+        self._output_dtype = output_details["dtype"]
+        self._output_quant = output_details["quantization"]
+        self._batch = None
+        # The interpreter holds mutable tensors and is not thread-safe
+        self._lock = threading.Lock()
+
+    def predict(self, X):
+        with stage("scaler_transform"):
+            Xs = self.scaler.transform(np.asarray(X, dtype=np.float32))
+        with stage("model_predict"):
+            return self.predict_scaled(Xs)
+
+    def predict_scaled(self, Xs):
+        """Run the interpreter on already-scaled rows"""
+        Xs = _quantize(np.asarray(Xs, dtype=np.float32), self._input_dtype, self._input_quant)
+        with self._lock:
+            if self._batch != len(Xs):
+                self.interpreter.resize_tensor_input(self._input, list(Xs.shape))
+                self.interpreter.allocate_tensors()
+                self._batch = len(Xs)
+            self.interpreter.set_tensor(self._input, Xs)
+            self.interpreter.invoke()
+            out = self.interpreter.get_tensor(self._output).ravel().copy()
+        return _dequantize(out, self._output_dtype, self._output_quant)
+
+class NumpyBackend:
+    """Pure-NumPy forward pass over folded weights (no TensorFlow, no pickle)"""
+    name = "numpy"
+    # Plain arrays: safe to load before fork and share copy-on-write
+    fork_safe = True
+
+    def __init__(self, weights_path=NUMPY_WEIGHTS_PATH):
+        _require(weights_path)
+        with np.load(weights_path, allow_pickle=False) as data:
+            n_layers = int(data["n_layers"])
+            self.layers = [
+                (data[f"W{i}"].astype(np.float32), data[f"b{i}"].astype(np.float32), str(data[f"act{i}"]))
+                for i in range(n_layers)
+            ]
+
+    def predict(self, X):
+        # The scaler is folded into the first layer, so this is all model_predict
+        with stage("model_predict"):
+            return _forward(self.layers, np.asarray(X, dtype=np.float32))
+
+class BundleBackend:
+    """Versioned model bundle: memory-mapped .npy arrays + manifest (no TensorFlow, no pickle)"""
+    name = "bundle"
+    # Read-only file mappings: workers share the page cache, and forking is safe
+    fork_safe = True
+
+    def __init__(self, bundle_dir=BUNDLE_ROOT):
+        self.manifest, arrays = load_bundle(bundle_dir)
+        # Served under the bundle's own id rather than main.MODEL_VERSION
+        self.version = self.manifest["artifact_id"]
+        self.mean = arrays[self.manifest["scaler"]["mean"]]
+        self.scale = arrays[self.manifest["scaler"]["scale"]]
+        self.layers = [(arrays[layer["W"]], arrays[layer["b"]], layer["activation"])
+                       for layer in self.manifest["layers"]]
+        thresholds = {"moderate": MODERATE_THRESHOLD, "critical": CRITICAL_THRESHOLD}
+        if self.manifest["thresholds"] != thresholds:
+            print(f"⚠️  Bundle {self.version} was trained with thresholds {self.manifest['thresholds']}; "
+                  f"serving {thresholds}")
+
+    def predict(self, X):
+        with stage("scaler_transform"):
+            Xs = np.asarray(X, dtype=np.float32) - self.mean
+            Xs /= self.scale
+        with stage("model_predict"):
+            return _forward(self.layers, Xs)
+
+class SklearnBackend:
+    """Pickled scikit-learn classifier on scaled features (no TensorFlow).
+
+    model_registry saves {"estimator", "scaler"} bundles. A bare estimator
+    (the original triage_model_rf.pkl) expects inputs scaled by scaler.pkl.
+    """
+    name = "sklearn"
+
+    def __init__(self, model_path, scaler_path=SCALER_PATH):
+        _require(model_path)
+        import joblib
+        bundle = joblib.load(model_path)
+        if isinstance(bundle, dict):
+            self.estimator, self.scaler = bundle["estimator"], bundle["scaler"]
+        else:
+            _require(scaler_path)
+            self.estimator, self.scaler = bundle, joblib.load(scaler_path)
+        self._positive = list(self.estimator.classes_).index(1)
+
+    def predict(self, X):
+        with stage("scaler_transform"):
+            Xs = self.scaler.transform(np.asarray(X, dtype=np.float32))
+        with stage("model_predict"):
+            return self.estimator.predict_proba(Xs)[:, self._positive]
+
+class RandomForestBackend(SklearnBackend):
+    name = "rf"
+
+    def __init__(self, model_path=RF_MODEL_PATH, scaler_path=SCALER_PATH):
+        super().__init__(model_path, scaler_path)
+
+class HistGradientBoostingBackend(SklearnBackend):
+    name = "hgb"
+
+    def __init__(self, model_path=HGB_MODEL_PATH, scaler_path=SCALER_PATH):
+        super().__init__(model_path, scaler_path)
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "numpy": NumpyBackend,
+    "bundle": BundleBackend,
+    "rf": RandomForestBackend,
+    "hgb": HistGradientBoostingBackend,
+}
+
+def backend_artifacts(name, directory=None):
+    """load_backend keyword arguments naming `name`'s artifact files.
+
+    With `directory`, the same file names are looked up inside it (a
+    versioned artifact directory, e.g. for a canary model).
+    """
+    paths = {
+        "keras": {"model_path": MODEL_PATH, "scaler_path": SCALER_PATH},
+        "tflite": {"tflite_path": TFLITE_MODEL_PATH, "scaler_path": SCALER_PATH},
+        "numpy": {"weights_path": NUMPY_WEIGHTS_PATH},
+        "bundle": {"bundle_dir": BUNDLE_ROOT},
+        "rf": {"model_path": RF_MODEL_PATH, "scaler_path": SCALER_PATH},
+        "hgb": {"model_path": HGB_MODEL_PATH, "scaler_path": SCALER_PATH},
+    }[name]
+    if directory:
+        paths = {k: os.path.join(directory, os.path.basename(v)) for k, v in paths.items()}
+    return paths
+
+def selected_backend(report_path=MODEL_BENCHMARK_PATH, default="keras"):
+    """Backend picked by the last model benchmark, or `default`"""
+    import json
+    if not os.path.exists(report_path):
+        return default
+    with open(report_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("selected") or default
+
+def resolve_backend(name=None, directory=None):
+    """Backend to serve: `name`, else TRIAGE_BACKEND, else bundle if one is published (keras otherwise)"""
+    name = (name or DEFAULT_BACKEND).lower()
+    if name == "auto":
+        name = selected_backend()
+    if not name:
+        name = "bundle" if current_bundle(backend_artifacts("bundle", directory)["bundle_dir"]) else "keras"
+    return name
+
+def load_backend(name=None, **kwargs):
+    """Instantiate an inference backend by name (keras, tflite, numpy, bundle, rf, hgb or auto)"""
+    name = resolve_backend(name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
+
+def _require(*paths):
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        raise RuntimeError(f"Missing model artifacts: {', '.join(missing)}. Run main.py train to create them.")
+
+def _configure_tf_threads(tf):
+    try:
+        if INTRA_OP_THREADS:
+            tf.config.threading.set_intra_op_parallelism_threads(INTRA_OP_THREADS)
+        if INTER_OP_THREADS:
+            tf.config.threading.set_inter_op_parallelism_threads(INTER_OP_THREADS)
+    except RuntimeError:
+        # TensorFlow was already initialized in this process
+        pass
+
+def _quantize(X, dtype, quantization):
+    if dtype == np.float32:
+        return X
+    scale, zero_point = quantization
+    info = np.iinfo(dtype)
+    return np.clip(np.round(X / scale + zero_point), info.min, info.max).astype(dtype)
+
+def _dequantize(out, dtype, quantization):
+    if dtype == np.float32:
+        return out
+    scale, zero_point = quantization
+    return (out.astype(np.float32) - zero_point) * scale
+
+def _relu(h):
+    return np.maximum(h, 0.0, out=h)
+
+def _sigmoid(h):
+    return 1.0 / (1.0 + np.exp(-np.clip(h, -80.0, 80.0)))
+
+def _linear(h):
+    return h
+
+def _forward(layers, h):
+    """Run (W, b, activation) affine layers over a float32 batch"""
+    for W, b, activation in layers:
+        h = h @ W
+        h += b
+        h = _ACTIVATIONS[activation](h)
+    return h.ravel()
+
+_ACTIVATIONS = {
+    "relu": _relu,
+    "sigmoid": _sigmoid,
+    "linear": _linear,
+}
+
+# =========================
+# Weight Folding (Keras -> NumPy)
+# =========================
+
+def fold_keras_model(model, scaler=None):
+    """Collapse a Dense/BatchNorm/Dropout stack into plain affine layers.
+
+    BatchNormalization sits after each ReLU, so its affine transform is
+    folded into the *next* Dense layer. The scaler's mean/scale are folded
+    into the first Dense layer, so the result takes raw features.
+    Returns a list of (W, b, activation) tuples.
+    """
+    layers = []
+    pending_scale, pending_shift = None, None
+
+    if scaler is not None:
+        pending_scale = 1.0 / np.asarray(scaler.scale_, dtype=np.float64)
+        pending_shift = -np.asarray(scaler.mean_, dtype=np.float64) * pending_scale
+
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind == "Dense":
+            W, b = (np.asarray(w, dtype=np.float64) for w in layer.get_weights())
+            if pending_scale is not None:
+                # Dense(x * s + t) == Dense'(x) with W' = diag(s) W, b' = b + t W
+                b = b + pending_shift @ W
+                W = pending_scale[:, None] * W
+                pending_scale, pending_shift = None, None
+            activation = layer.get_config().get("activation", "linear")
+            if activation not in _ACTIVATIONS:
+                raise ValueError(f"Cannot fold activation '{activation}'")
+            layers.append((W, b, activation))
+        elif kind == "BatchNormalization":
+            gamma, beta, mean, var = (np.asarray(w, dtype=np.float64) for w in layer.get_weights())
+            scale = gamma / np.sqrt(var + layer.epsilon)
+            shift = beta - mean * scale
+            if pending_scale is not None:
+                shift = pending_shift * scale + shift
+                scale = pending_scale * scale
+            pending_scale, pending_shift = scale, shift
+        elif kind in ("Dropout", "InputLayer"):
+            continue
+        else:
+            raise ValueError(f"Cannot fold layer type '{kind}'")
+
+    if pending_scale is not None:
+        raise ValueError("Model ends with an unfolded BatchNormalization layer")
+    return layers
+
+def export_numpy_weights(model, scaler, path=NUMPY_WEIGHTS_PATH):
+    """Write folded weights for NumpyBackend as an uncompressed .npz"""
+    layers = fold_keras_model(model, scaler)
+    arrays = {"n_layers": np.array(len(layers)), "features": np.array(FEATURES)}
+    for i, (W, b, activation) in enumerate(layers):
+        arrays[f"W{i}"] = W.astype(np.float32)
+        arrays[f"b{i}"] = b.astype(np.float32)
+        arrays[f"act{i}"] = np.array(activation)
+    np.savez(path, **arrays)
+    print(f"✅ NumPy weights exported to {path}")
+    return path
+
+# =========================
+# Backend Parity Check
+# =========================
+
+def sample_rows(n=512, dataset_path="triage_synthetic_dataset.csv", seed=0):
+    """Draw feature rows from the training CSV for parity checks"""
+    data = np.genfromtxt(dataset_path, delimiter=",", names=True)
+    X = np.column_stack([data[f] for f in FEATURES]).astype(np.float32)
+    idx = np.random.default_rng(seed).choice(len(X), size=min(n, len(X)), replace=False)
+    return X[idx]
+
+def check_parity(X=None, backends=("numpy", "bundle", "tflite")):
+    """Compare each backend with Keras; returns {name: max_abs_diff}"""
+    X = sample_rows() if X is None else X
+    reference = KerasBackend().predict(X)
+    results = {}
+    for name in backends:
+        try:
+            backend = load_backend(name)
+        except (RuntimeError, ImportError) as e:
+            print(f"⚠️  Skipping {name}: {e}")
+            continue
+        diff = float(np.max(np.abs(backend.predict(X) - reference)))
+        results[name] = diff
+        status = "✅" if diff <= PARITY_TOLERANCE[name] else "❌"
+        print(f"{status} {name}: max |Δp| = {diff:.2e} (tolerance {PARITY_TOLERANCE[name]:.0e})")
+    return results
+
+def check_folding(n=256, seed=0):
+    """Fold a small random model and compare it with Keras; needs TensorFlow, no artifacts.
+
+    BatchNorm statistics and the scaler are randomized so every folding
+    step changes the weights. Raises AssertionError beyond the numpy
+    tolerance and returns the max |Δp|.
+    """
+    from sklearn.preprocessing import StandardScaler
+    from main import build_enhanced_model
+
+    rng = np.random.default_rng(seed)
+    X = rng.normal(50.0, 20.0, size=(n, len(FEATURES))).astype(np.float32)
+    scaler = StandardScaler().fit(X)
+    model = build_enhanced_model(len(FEATURES), units=(16, 8, 4))
+    for layer in model.layers:
+        if type(layer).__name__ == "BatchNormalization":
+            width = layer.get_weights()[0].shape[0]
+            layer.set_weights([
+                rng.uniform(0.5, 1.5, width), rng.normal(0.0, 0.5, width),
+                rng.normal(0.0, 0.5, width), rng.uniform(0.5, 2.0, width),
+            ])
+
+    reference = model.predict(scaler.transform(X), verbose=0).ravel()
+    folded = _forward(fold_keras_model(model, scaler), X)
+    diff = float(np.max(np.abs(folded - reference)))
+    assert np.allclose(folded, reference, atol=PARITY_TOLERANCE["numpy"]), f"folded model differs by {diff:.2e}"
+    print(f"✅ folding: max |Δp| = {diff:.2e} on a random {len(model.layers)}-layer model")
+    return diff
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check that the serving backends agree with Keras")
+    parser.add_argument("--fold-only", action="store_true",
+                        help="only check weight folding on a small in-process model (no trained artifacts)")
+    args = parser.parse_args()
+
+    check_folding()
+    if args.fold_only:
+        sys.exit(0)
+    results = check_parity()
+    failed = [n for n, d in results.items() if d > PARITY_TOLERANCE[n]]
+    sys.exit(1 if failed else 0)
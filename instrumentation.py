@@ -0,0 +1,251 @@
+"""Per-stage latency histograms and an opt-in sampling profiler.
+
+    with stage("scaler_transform"):
+        Xs = scaler.transform(X)
+
+    @timed("save_feedback")
+    def save_feedback(...): ...
+
+With TRIAGE_METRICS=0, stage() returns a shared no-op context manager and
+timed() wrappers call straight through, so the disabled cost is one global
+lookup per call. Histograms are per process; render_prometheus() emits
+them in the Prometheus text format for /metrics.
+
+The profiler samples every thread's stack from a background thread and
+writes folded stacks ("frame;frame;frame count"), which flamegraph.pl,
+speedscope and inferno read directly.
+"""
+import os
+import sys
+import time
+import bisect
+import threading
+from collections import Counter
+from contextlib import nullcontext
+from functools import wraps
+
+# =========================
+# Configuration
+# =========================
+
+METRICS_ENABLED = os.environ.get("TRIAGE_METRICS", "1") == "1"
+# /debug/profile is only served when this is set
+PROFILER_ENABLED = os.environ.get("TRIAGE_PROFILER", "0") == "1"
+PROFILE_MAX_SECONDS = float(os.environ.get("TRIAGE_PROFILE_MAX_SECONDS", "60"))
+PROFILE_DEFAULT_HZ = 100
+
+# Histogram bucket upper bounds (seconds), Prometheus style
+STAGE_BUCKETS_S = [
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+]
+
+# Stages timed on the hot path (registered up front so /metrics lists them all)
+STAGES = (
+    "json_parse",
+    "feature_assembly",
+    "scaler_transform",
+    "model_predict",
+    "extract_signals",
+    "gemini_explain",
+    "save_feedback",
+)
+
+# =========================
+# Stage Histograms
+# =========================
+
+class StageHistogram:
+    """Thread-safe latency histogram for one stage"""
+
+    def __init__(self, name, bounds=STAGE_BUCKETS_S):
+        self.name = name
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total_s += seconds
+            if seconds > self.max_s:
+                self.max_s = seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum_s": self.total_s,
+                "mean_ms": self.total_s / self.count * 1e3 if self.count else 0.0,
+                "max_ms": self.max_s * 1e3,
+                "counts": list(self.counts),
+            }
+
+class _StageTimer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+_histograms = {name: StageHistogram(name) for name in STAGES}
+_histograms_lock = threading.Lock()
+_NULL_TIMER = nullcontext()
+
+def enable_metrics(enabled=True):
+    global METRICS_ENABLED
+    METRICS_ENABLED = enabled
+
+def histogram(name):
+    hist = _histograms.get(name)
+    if hist is None:
+        with _histograms_lock:
+            hist = _histograms.setdefault(name, StageHistogram(name))
+    return hist
+
+def stage(name):
+    """Context manager timing one stage (no-op while metrics are disabled)"""
+    if not METRICS_ENABLED:
+        return _NULL_TIMER
+    return _StageTimer(histogram(name))
+
+def timed(name):
+    """Decorator form of stage()"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not METRICS_ENABLED:
+                return fn(*args, **kwargs)
+            with _StageTimer(histogram(name)):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def stage_stats():
+    """{stage: snapshot} for /stats"""
+    return {name: {k: v for k, v in hist.snapshot().items() if k != "counts"}
+            for name, hist in list(_histograms.items())}
+
+def reset_metrics():
+    with _histograms_lock:
+        for name in list(_histograms):
+            _histograms[name] = StageHistogram(name)
+
+# =========================
+# Prometheus Exposition
+# =========================
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render_prometheus(gauges=None, labels=None, counters=None):
+    """Stage histograms (plus optional {name: (help, value)} gauges and counters) as text/plain 0.0.4.
+
+    `labels` are added to every sample, e.g. {"pid": 123} so the series of
+    each pre-fork worker stay apart. Counter names end in _total and must
+    only ever grow within a process, so rate() can detect worker restarts.
+    """
+    common = "".join(f',{k}="{_label_value(v)}"' for k, v in (labels or {}).items())
+    lines = [
+        "# HELP triage_stage_seconds Latency of hot-path stages",
+        "# TYPE triage_stage_seconds histogram",
+    ]
+    for name, hist in list(_histograms.items()):
+        snap = hist.snapshot()
+        cumulative = 0
+        for bound, count in zip(hist.bounds, snap["counts"]):
+            cumulative += count
+            lines.append(f'triage_stage_seconds_bucket{{stage="{name}"{common},le="{bound}"}} {cumulative}')
+        lines.append(f'triage_stage_seconds_bucket{{stage="{name}"{common},le="+Inf"}} {snap["count"]}')
+        lines.append(f'triage_stage_seconds_sum{{stage="{name}"{common}}} {snap["sum_s"]!r}')
+        lines.append(f'triage_stage_seconds_count{{stage="{name}"{common}}} {snap["count"]}')
+
+    sample_labels = f"{{{common.lstrip(',')}}}" if common else ""
+    for kind, series in (("counter", counters), ("gauge", gauges)):
+        for name, (help_text, value) in (series or {}).items():
+            if value is None:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name}{sample_labels} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+# =========================
+# Sampling Profiler
+# =========================
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    """Samples all thread stacks at `hz` and counts folded stacks.
+
+    Only the sampler thread does work; profiled requests just share the
+    GIL with it while a profile is running.
+    """
+
+    def __init__(self, hz=PROFILE_DEFAULT_HZ):
+        self.interval = 1.0 / max(1.0, float(hz))
+        self.stacks = Counter()
+        self.samples = 0
+
+    def sample(self):
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(_frame_label(frame))
+                frame = frame.f_back
+            frames.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(frames))] += 1
+        self.samples += 1
+
+    def run(self, seconds):
+        """Sample for `seconds` on the calling thread"""
+        deadline = time.perf_counter() + seconds
+        next_sample = time.perf_counter()
+        while next_sample < deadline:
+            self.sample()
+            next_sample += self.interval
+            delay = next_sample - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return self
+
+    def folded(self):
+        """Folded stacks, one "a;b;c count" line per unique stack"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+_profile_lock = threading.Lock()
+
+def profile(seconds, hz=PROFILE_DEFAULT_HZ):
+    """Profile this process for a window; one profile at a time.
+
+    Returns the folded stacks, or None if another profile is running.
+    """
+    seconds = min(max(float(seconds), 0.0), PROFILE_MAX_SECONDS)
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        return SamplingProfiler(hz).run(seconds).folded()
+    finally:
+        _profile_lock.release()
@@ -1,16 +1,43 @@
 import os
-import json
-import joblib
+import glob
+import atexit
 import numpy as np
-import pandas as pd
-import tensorflow as tf
 from datetime import datetime
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import classification_report, roc_auc_score, confusion_matrix
-from sklearn.utils.class_weight import compute_class_weight
 
-from google import genai
+# TensorFlow, pandas, scikit-learn and google-genai are imported inside the
+# functions that need them so that light commands (analyze, predict with the
+# numpy backend) start without loading the training stack.
+
+from data_pipeline import (
+    TRAIN,
+    VALIDATION,
+    TEST,
+    default_sources,
+    feedback_labels,
+    make_dataset,
+    reservoir_sample,
+    scan_sources,
+    split_chunks,
+)
+from explanations import ExplanationCache, ExplanationPipeline
+from feedback_analytics import FeedbackAnalytics, print_report
+from feedback_store import FEEDBACK_LOG_PATH, open_feedback_store
+from feedback_writer import FeedbackWriter
+from inference_backends import load_backend, export_numpy_weights
+from instrumentation import stage, timed
+from model_bundle import export_bundle
+from model_manifest import load_manifest, next_artifact_id, record_training_run
+from prediction_cache import open_prediction_cache
+from triage_rules import (
+    FEATURES,
+    CRITICAL_THRESHOLD,
+    MODERATE_THRESHOLD,
+    features_matrix,
+    risk_level,
+    risk_levels,
+    extract_signals,
+    extract_signals_batch,
+)
 
 # =========================
 # Configuration
@@ -20,55 +47,64 @@ MODEL_VERSION = "v2.0"
 MODEL_PATH = "triage_model.keras"
 TFLITE_MODEL_PATH = "mobile/flutter/assets/model.tflite"
 SCALER_PATH = "scaler.pkl"
-DATASET_PATH = "triage_synthetic_dataset.csv"
-FEEDBACK_LOG_PATH = "feedback_log.jsonl"
+# CSV or Parquet; a glob selects shards, e.g. from synthetic_patients.py
+DATASET_PATH = os.environ.get("TRIAGE_DATASET", "triage_synthetic_dataset.csv")
+NUMPY_WEIGHTS_PATH = "triage_model_weights.npz"
+
+# Warm-start retraining
+WARM_START_EPOCHS = 5
+WARM_START_LEARNING_RATE = 1e-4
+WARM_START_REPLAY_RATIO = 2.0   # replayed base rows per new feedback row
+WARM_START_MIN_REPLAY = 256
 
 # =========================
 # Google AI Studio Setup
 # =========================
 
 _GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
-if _GOOGLE_API_KEY:
-    client = genai.Client(api_key=_GOOGLE_API_KEY)
-else:
-    client = None
-    print("⚠️  Warning: GOOGLE_API_KEY not set — Gemini explanations will be disabled.")
+_client = None
+_client_checked = False
 
 GEMINI_MODEL = "gemini-2.5-flash"
 
+def set_gemini_client(client):
+    """Swap in a Gemini client (e.g. explanations.StubGeminiClient for offline tests)"""
+    global _client, _client_checked
+    _client, _client_checked = client, True
+
+def get_gemini_client():
+    """Create the Gemini client on first use (None when no API key is set)"""
+    global _client, _client_checked
+    if not _client_checked:
+        _client_checked = True
+        if _GOOGLE_API_KEY:
+            from google import genai
+            _client = genai.Client(api_key=_GOOGLE_API_KEY)
+        else:
+            print("⚠️  Warning: GOOGLE_API_KEY not set — Gemini explanations will be disabled.")
+    return _client
+
 # =========================
 # Feature Engineering & Data Processing
 # =========================
 
-FEATURES = [
-    "age",
-    "heart_rate",
-    "oxygen",
-    "temperature",
-    "pain_scale",
-    "waiting_time",
-    "complaint_encoded"
-]
-
 def load_and_prepare_data(include_feedback=True):
     """Load dataset and optionally merge with feedback logs for retraining"""
-    # Load main dataset
-    df = pd.read_csv(DATASET_PATH)
+    import pandas as pd
+    
+    # Load main dataset; a glob is expanded like the streaming sources do
+    read = pd.read_parquet if DATASET_PATH.endswith(".parquet") else pd.read_csv
+    paths = sorted(glob.glob(DATASET_PATH)) or [DATASET_PATH]
+    df = pd.concat([read(path) for path in paths], ignore_index=True)
     
     # Optionally load feedback data for continuous learning
-    if include_feedback and os.path.exists(FEEDBACK_LOG_PATH):
-        feedback_records = []
-        with open(FEEDBACK_LOG_PATH, 'r') as f:
-            for line in f:
-                record = json.loads(line)
-                patient = record['patient_data']
-                # Use clinician decision if available, else AI decision
-                label = 1 if record.get('clinician_decision') in ['CRITICAL', 'HIGH RISK'] else 0
-                patient['label'] = label
-                feedback_records.append(patient)
+    if include_feedback:
+        X, clinician_decisions = get_feedback_store().feature_rows()
         
-        if feedback_records:
-            feedback_df = pd.DataFrame(feedback_records)
+        if len(X):
+            feedback_df = pd.DataFrame(X, columns=FEATURES)
+            # Use clinician decision if available, else AI decision
+            feedback_df['label'] = feedback_labels(clinician_decisions).astype(int)
             print(f"📊 Loaded {len(feedback_df)} feedback records for retraining")
             df = pd.concat([df, feedback_df], ignore_index=True)
     
@@ -76,6 +112,9 @@ def load_and_prepare_data(include_feedback=True):
 
 def create_balanced_dataset(df):
     """Balance dataset to prevent model bias toward majority class"""
+    import pandas as pd
+    from sklearn.utils import resample
+    
     class_counts = df['label'].value_counts()
     print(f"Original distribution: {dict(class_counts)}")
     
@@ -83,7 +122,6 @@ def create_balanced_dataset(df):
     df_majority = df[df['label'] == class_counts.idxmax()]
     df_minority = df[df['label'] == class_counts.idxmin()]
     
-    from sklearn.utils import resample
     df_minority_upsampled = resample(
         df_minority,
         replace=True,
@@ -100,33 +138,36 @@ def create_balanced_dataset(df):
 # Enhanced Model Architecture
 # =========================
 
-def build_enhanced_model(input_dim):
-    """Build improved neural network with dropout and batch normalization"""
-    model = tf.keras.Sequential([
-        tf.keras.layers.Input(shape=(input_dim,)),
-        
-        # First hidden layer with batch normalization
-        tf.keras.layers.Dense(128, activation='relu', 
-                             kernel_regularizer=tf.keras.regularizers.l2(0.001)),
-        tf.keras.layers.BatchNormalization(),
-        tf.keras.layers.Dropout(0.3),
-        
-        # Second hidden layer
-        tf.keras.layers.Dense(64, activation='relu',
-                             kernel_regularizer=tf.keras.regularizers.l2(0.001)),
-        tf.keras.layers.BatchNormalization(),
-        tf.keras.layers.Dropout(0.2),
-        
-        # Third hidden layer
-        tf.keras.layers.Dense(32, activation='relu'),
-        tf.keras.layers.Dropout(0.2),
-        
-        # Output layer
-        tf.keras.layers.Dense(1, activation='sigmoid')
-    ])
+def build_enhanced_model(input_dim, units=(128, 64, 32), dropouts=(0.3, 0.2, 0.2),
+                         l2=0.001, learning_rate=0.001):
+    """Build improved neural network with dropout and batch normalization.
+
+    Every hidden layer but the last is L2-regularized and followed by
+    batch normalization; the defaults are the production architecture
+    and `main.py sweep` searches over the keyword arguments.
+    """
+    import tensorflow as tf
+    
+    layers = [tf.keras.layers.Input(shape=(input_dim,))]
+    for i, (width, dropout) in enumerate(zip(units, dropouts)):
+        if i < len(units) - 1:
+            # Regularized hidden layer with batch normalization
+            layers += [
+                tf.keras.layers.Dense(width, activation='relu',
+                                      kernel_regularizer=tf.keras.regularizers.l2(l2)),
+                tf.keras.layers.BatchNormalization(),
+            ]
+        else:
+            # Last hidden layer
+            layers.append(tf.keras.layers.Dense(width, activation='relu'))
+        layers.append(tf.keras.layers.Dropout(dropout))
+    
+    # Output layer
+    layers.append(tf.keras.layers.Dense(1, activation='sigmoid'))
+    model = tf.keras.Sequential(layers)
     
     # Use Adam optimizer with learning rate scheduling
-    optimizer = tf.keras.optimizers.Adam(learning_rate=0.001)
+    optimizer = tf.keras.optimizers.Adam(learning_rate=learning_rate)
     
     model.compile(
         optimizer=optimizer,
@@ -145,39 +186,70 @@ def build_enhanced_model(input_dim):
 # Training Pipeline
 # =========================
 
-def train_model(retrain=False):
-    """Train or retrain the triage risk prediction model"""
-    print(f"\n{'='*60}")
-    print(f"🚀 Training Triage AI Model {MODEL_VERSION}")
-    print(f"{'='*60}\n")
+def prepare_training_arrays(retrain=False, validation_size=0.0):
+    """Stratified 80/20 split, then a balanced train part and a scaler fitted on it.
+
+    The split comes first, so upsampled copies of training rows never land
+    in the test part; the test part keeps the original class distribution.
+    Returns (X_train_scaled, X_test_scaled, y_train, y_test, scaler). With
+    `validation_size`, that fraction of the train part is held out (before
+    balancing) for model selection, and the result is (X_train_scaled,
+    X_val_scaled, X_test_scaled, y_train, y_val, y_test, scaler).
+    """
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
     
     # Load data
     df = load_and_prepare_data(include_feedback=retrain)
     
-    # Balance dataset
-    df = create_balanced_dataset(df)
-    
-    # Prepare features and labels
-    X = df[FEATURES].values
-    y = df['label'].values
-    
     # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
+    df_train, df_test = train_test_split(
+        df, test_size=0.2, random_state=42, stratify=df['label']
     )
     
+    df_val = None
+    if validation_size:
+        df_train, df_val = train_test_split(
+            df_train, test_size=validation_size, random_state=42, stratify=df_train['label']
+        )
+    
+    # Balance the training part only
+    df_train = create_balanced_dataset(df_train)
+    
+    # Prepare features and labels
+    X_train, y_train = df_train[FEATURES].values, df_train['label'].values
+    X_test, y_test = df_test[FEATURES].values, df_test['label'].values
+    
     # Scale features
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train)
     X_test_scaled = scaler.transform(X_test)
     
+    if df_val is not None:
+        X_val_scaled = scaler.transform(df_val[FEATURES].values)
+        return X_train_scaled, X_val_scaled, X_test_scaled, y_train, df_val['label'].values, y_test, scaler
+    return X_train_scaled, X_test_scaled, y_train, y_test, scaler
+
+def balanced_class_weights(y):
+    """{class: weight} inversely proportional to class frequency"""
+    from sklearn.utils.class_weight import compute_class_weight
+    
+    classes = np.unique(y)
+    class_weights = compute_class_weight('balanced', classes=classes, y=y)
+    return {int(c): w for c, w in zip(classes, class_weights)}
+
+def train_model(retrain=False):
+    """Train or retrain the triage risk prediction model"""
+    from sklearn.metrics import classification_report, roc_auc_score, confusion_matrix
+    
+    print(f"\n{'='*60}")
+    print(f"🚀 Training Triage AI Model {MODEL_VERSION}")
+    print(f"{'='*60}\n")
+    
+    X_train_scaled, X_test_scaled, y_train, y_test, scaler = prepare_training_arrays(retrain)
+    
     # Compute class weights for imbalanced data handling
-    class_weights = compute_class_weight(
-        'balanced',
-        classes=np.unique(y_train),
-        y=y_train
-    )
-    class_weight_dict = {i: weight for i, weight in enumerate(class_weights)}
+    class_weight_dict = balanced_class_weights(y_train)
     print(f"Class weights: {class_weight_dict}\n")
     
     # Build model
@@ -188,28 +260,7 @@ def train_model(retrain=False):
     print()
     
     # Callbacks
-    callbacks = [
-        tf.keras.callbacks.EarlyStopping(
-            monitor='val_loss',
-            patience=15,
-            restore_best_weights=True,
-            verbose=1
-        ),
-        tf.keras.callbacks.ReduceLROnPlateau(
-            monitor='val_loss',
-            factor=0.5,
-            patience=5,
-            min_lr=1e-6,
-            verbose=1
-        ),
-        tf.keras.callbacks.ModelCheckpoint(
-            MODEL_PATH,
-            monitor='val_auc',
-            save_best_only=True,
-            mode='max',
-            verbose=1
-        )
-    ]
+    callbacks = training_callbacks()
     
     # Train
     print("🎯 Training model...\n")
@@ -240,150 +291,273 @@ def train_model(retrain=False):
     print("\nConfusion Matrix:")
     print(confusion_matrix(y_test, y_pred))
     
+    bundle = save_model_artifacts(model, scaler)
+    record_training_run(
+        MODEL_VERSION, "full",
+        get_feedback_store().latest_timestamp() if retrain else None,
+        bundle=bundle,
+        training_rows=int(len(X_train_scaled) + len(X_test_scaled)),
+        test_auc=float(roc_auc_score(y_test, y_pred_prob))
+    )
+    
+    return model, scaler, history
+
+def training_callbacks(checkpoint_path=MODEL_PATH):
+    """Early stopping, LR schedule and best-checkpoint callbacks"""
+    import tensorflow as tf
+    
+    return [
+        tf.keras.callbacks.EarlyStopping(
+            monitor='val_loss',
+            patience=15,
+            restore_best_weights=True,
+            verbose=1
+        ),
+        tf.keras.callbacks.ReduceLROnPlateau(
+            monitor='val_loss',
+            factor=0.5,
+            patience=5,
+            min_lr=1e-6,
+            verbose=1
+        ),
+        tf.keras.callbacks.ModelCheckpoint(
+            checkpoint_path,
+            monitor='val_auc',
+            save_best_only=True,
+            mode='max',
+            verbose=1
+        )
+    ]
+
+def save_model_artifacts(model, scaler):
+    """Persist model, scaler, model bundle, NumPy weights and the TFLite export.
+
+    Returns the bundle path. The bundle is named after the artifact_id the
+    following record_training_run call assigns, so servers report the same id.
+    """
+    import joblib
+    
     # Save model and scaler
     model.save(MODEL_PATH)
     joblib.dump(scaler, SCALER_PATH)
     print(f"\n✅ Model saved to {MODEL_PATH}")
     print(f"✅ Scaler saved to {SCALER_PATH}")
     
-    # Export to TFLite
-    export_to_tflite(model)
+    # Versioned, memory-mapped bundle for serving (no pickle, no TensorFlow)
+    bundle = export_bundle(model, scaler, next_artifact_id(MODEL_VERSION), MODEL_VERSION)
     
-    return model, scaler, history
+    # Folded weights for the TensorFlow-free NumPy backend
+    export_numpy_weights(model, scaler, NUMPY_WEIGHTS_PATH)
+    
+    # Export TFLite variants (dynamic, float16, int8) with the drift/latency report
+    from tflite_export import export_variants
+    export_variants(model, scaler)
 
-def export_to_tflite(model):
-    """Convert Keras model to TFLite for mobile deployment"""
+    # Scores cached under MODEL_VERSION came from the previous weights
+    if _prediction_cache is not None:
+        _prediction_cache.invalidate()
+    return bundle
+
+def train_model_streaming(retrain=False, batch_size=32, epochs=100):
+    """Out-of-core variant of train_model with bounded peak memory.
+
+    The CSV shard(s) at DATASET_PATH (a glob is allowed) and, for retraining,
+    the feedback store are streamed in chunks. One pass fits the scaler with
+    partial_fit; tf.data then scales on the fly and balances classes by
+    weighted sampling instead of upsampling rows.
+    """
+    import math
+    
     print(f"\n{'='*60}")
-    print("📱 Exporting to TensorFlow Lite")
+    print(f"🚀 Streaming Training Triage AI Model {MODEL_VERSION}")
     print(f"{'='*60}\n")
     
-    # Create converter
-    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    sources = default_sources(DATASET_PATH, get_feedback_store() if retrain else None)
+    scaler, stats = scan_sources(sources)
+    balance = min(stats["class_counts"]) > 0
     
-    # Optimizations for mobile
-    converter.optimizations = [tf.lite.Optimize.DEFAULT]
-    converter.target_spec.supported_types = [tf.float32]
+    train_ds = make_dataset(sources, TRAIN, scaler, batch_size, balance=balance, shuffle=True)
+    val_ds = make_dataset(sources, VALIDATION, scaler, batch_size)
+    test_ds = make_dataset(sources, TEST, scaler, batch_size)
     
-    # Convert
-    tflite_model = converter.convert()
+    model = build_enhanced_model(input_dim=len(FEATURES))
     
-    # Save
-    os.makedirs(os.path.dirname(TFLITE_MODEL_PATH), exist_ok=True)
-    with open(TFLITE_MODEL_PATH, 'wb') as f:
-        f.write(tflite_model)
+    print("🎯 Training model...\n")
+    history = model.fit(
+        train_ds,
+        validation_data=val_ds,
+        epochs=epochs,
+        steps_per_epoch=math.ceil(stats["train_rows"] / batch_size) if balance else None,
+        callbacks=training_callbacks(),
+        verbose=1
+    )
     
-    file_size = os.path.getsize(TFLITE_MODEL_PATH) / 1024
-    print(f"✅ TFLite model exported to {TFLITE_MODEL_PATH}")
-    print(f"📏 Model size: {file_size:.2f} KB")
+    # Evaluate with the compiled streaming metrics (no test set in memory)
+    print(f"\n{'='*60}")
+    print("📊 Model Evaluation")
+    print(f"{'='*60}\n")
+    results = model.evaluate(test_ds, return_dict=True, verbose=0)
+    for name, value in results.items():
+        print(f"{name}: {value:.4f}")
+    
+    bundle = save_model_artifacts(model, scaler)
+    record_training_run(
+        MODEL_VERSION, "full_streaming",
+        get_feedback_store().latest_timestamp() if retrain else None,
+        bundle=bundle,
+        training_rows=stats["train_rows"],
+        test_auc=float(results.get("auc", float("nan")))
+    )
     
-    return TFLITE_MODEL_PATH
+    return model, scaler, history
 
-# =========================
-# Inference Pipeline (Load Trained Model)
-# =========================
+def retrain_warm_start(epochs=WARM_START_EPOCHS, learning_rate=WARM_START_LEARNING_RATE,
+                       replay_ratio=WARM_START_REPLAY_RATIO, batch_size=32):
+    """Fine-tune the current model on feedback newer than the manifest watermark.
 
-def load_model_for_inference():
-    """Load trained model and scaler for predictions"""
+    Loads triage_model.keras and scaler.pkl, updates the scaler statistics
+    with partial_fit on the new rows, and trains a few epochs at a low
+    learning rate on the new feedback plus a replay sample of the base
+    dataset (to avoid forgetting). Falls back to a full retrain when no
+    model exists yet.
+    """
+    import joblib
+    import tensorflow as tf
+    from sklearn.metrics import roc_auc_score
+    
     if not os.path.exists(MODEL_PATH) or not os.path.exists(SCALER_PATH):
-        print("⚠️  Model not found. Training new model...")
-        model, scaler, _ = train_model()
-        return model, scaler
+        print("⚠️  No existing model to warm-start from. Running full retrain...")
+        return train_model(retrain=True)
     
-    model = tf.keras.models.load_model(MODEL_PATH)
+    print(f"\n{'='*60}")
+    print(f"🔥 Warm-start Retraining {MODEL_VERSION}")
+    print(f"{'='*60}\n")
+    
+    watermark = load_manifest().get("feedback_watermark")
+    records = [
+        r for r in get_feedback_store().query(start=watermark)
+        if r["timestamp"] and (watermark is None or r["timestamp"] > watermark)
+    ]
+    if not records:
+        print(f"No new feedback since watermark {watermark}; model unchanged")
+        return None
+    
+    X_new = features_matrix([r["patient_data"] for r in records]).astype(np.float32)
+    y_new = feedback_labels([r["clinician_decision"] for r in records])
+    new_watermark = max(r["timestamp"] for r in records)
+    print(f"📊 {len(records)} new feedback records since {watermark}")
+    
+    # Replay a uniform sample of the base training split to avoid forgetting
+    base = default_sources(DATASET_PATH)[0]
+    n_replay = max(WARM_START_MIN_REPLAY, int(replay_ratio * len(X_new)))
+    X_replay, y_replay = reservoir_sample(split_chunks(base, 0, TRAIN), n_replay)
+    X_eval, y_eval = reservoir_sample(split_chunks(base, 0, TEST), 2048, seed=7)
+    print(f"🔁 Replaying {len(X_replay)} base rows")
+    
+    # Incrementally update scaler statistics with the new rows only
     scaler = joblib.load(SCALER_PATH)
-    return model, scaler
+    scaler.partial_fit(X_new)
+    
+    X = np.vstack([X_new, X_replay])
+    y = np.concatenate([y_new, y_replay])
+    class_weight_dict = balanced_class_weights(y)
+    
+    model = tf.keras.models.load_model(MODEL_PATH)
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss='binary_crossentropy',
+        metrics=[
+            'accuracy',
+            tf.keras.metrics.AUC(name='auc'),
+            tf.keras.metrics.Precision(name='precision'),
+            tf.keras.metrics.Recall(name='recall')
+        ]
+    )
+    history = model.fit(
+        scaler.transform(X), y,
+        epochs=epochs,
+        batch_size=batch_size,
+        class_weight=class_weight_dict,
+        shuffle=True,
+        verbose=1
+    )
+    
+    test_auc = None
+    if len(np.unique(y_eval)) == 2:
+        test_auc = float(roc_auc_score(y_eval, model.predict(scaler.transform(X_eval), verbose=0).ravel()))
+        print(f"\nROC-AUC on base test sample: {test_auc:.4f}")
+    
+    bundle = save_model_artifacts(model, scaler)
+    record_training_run(
+        MODEL_VERSION, "warm_start", new_watermark,
+        bundle=bundle,
+        feedback_rows=int(len(X_new)),
+        replay_rows=int(len(X_replay)),
+        epochs=epochs,
+        test_auc=test_auc
+    )
+    
+    return model, scaler, history
 
-# Initialize model and scaler
-model, scaler = load_model_for_inference()
+def export_to_tflite(model, path=TFLITE_MODEL_PATH):
+    """Convert Keras model to TFLite for mobile deployment"""
+    from tflite_export import convert_tflite
+    
+    print(f"\n{'='*60}")
+    print("📱 Exporting to TensorFlow Lite")
+    print(f"{'='*60}\n")
+    
+    # Dynamic-range quantization for mobile
+    tflite_model = convert_tflite(model, "dynamic")
+    
+    # Save
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(tflite_model)
+    
+    file_size = os.path.getsize(path) / 1024
+    print(f"✅ TFLite model exported to {path}")
+    print(f"📏 Model size: {file_size:.2f} KB")
+    
+    return path
 
 # =========================
-# Risk Classification Logic
+# Inference Pipeline (Load Trained Model)
 # =========================
 
-CRITICAL_THRESHOLD = 0.8
-MODERATE_THRESHOLD = 0.4
+_backend = None
+_prediction_cache = None
 
-def risk_level(prob):
-    """Classify risk based on probability thresholds"""
-    if prob >= CRITICAL_THRESHOLD:
-        return "HIGH RISK - Immediate attention"
-    elif prob >= MODERATE_THRESHOLD:
-        return "MODERATE RISK - Monitor closely"
-    else:
-        return "LOW RISK - Routine"
+def get_prediction_cache():
+    """Shared prediction cache (None when TRIAGE_PREDICT_CACHE_SIZE=0)"""
+    global _prediction_cache
+    if _prediction_cache is None:
+        _prediction_cache = open_prediction_cache()
+    return _prediction_cache
 
-# =========================
-# Enhanced Rule-Based Clinical Signals
-# =========================
+def load_model_for_inference(train_if_missing=False):
+    """Load the inference backend (TRIAGE_BACKEND) on first use.
 
-def extract_signals(data):
-    """Extract clinically significant signals from patient data"""
-    signals = []
-    critical_count = 0
-
-    # Oxygen saturation (SpO2)
-    if data["oxygen"] < 85:
-        signals.append("⚠️  CRITICAL: Severe hypoxemia (SpO2 < 85%)")
-        critical_count += 1
-    elif data["oxygen"] < 90:
-        signals.append("⚠️  Low oxygen saturation (SpO2 < 90%)")
-    elif data["oxygen"] < 93:
-        signals.append("Borderline oxygen level (SpO2 < 93%)")
-
-    # Heart rate (tachycardia/bradycardia)
-    if data["heart_rate"] > 140:
-        signals.append("⚠️  CRITICAL: Severe tachycardia (HR > 140)")
-        critical_count += 1
-    elif data["heart_rate"] > 120:
-        signals.append("⚠️  Elevated heart rate (HR > 120)")
-    elif data["heart_rate"] < 50:
-        signals.append("⚠️  Bradycardia detected (HR < 50)")
-    
-    # Temperature (fever/hypothermia)
-    if data["temperature"] >= 39.5:
-        signals.append("⚠️  CRITICAL: High fever (≥ 39.5°C)")
-        critical_count += 1
-    elif data["temperature"] >= 38.5:
-        signals.append("⚠️  Moderate fever (≥ 38.5°C)")
-    elif data["temperature"] < 36.0:
-        signals.append("⚠️  Hypothermia (< 36°C)")
-    
-    # Pain scale
-    if data["pain_scale"] >= 9:
-        signals.append("⚠️  CRITICAL: Severe pain (9-10/10)")
-        critical_count += 1
-    elif data["pain_scale"] >= 7:
-        signals.append("⚠️  Significant pain (7-8/10)")
-    elif data["pain_scale"] >= 4:
-        signals.append("Moderate pain (4-6/10)")
-    
-    # Waiting time
-    if data["waiting_time"] > 60:
-        signals.append("⚠️  Prolonged waiting time (> 1 hour)")
-    elif data["waiting_time"] > 30:
-        signals.append("Extended waiting time (> 30 minutes)")
-    
-    # Age considerations
-    if data["age"] >= 75:
-        signals.append("👴 Elderly patient (≥ 75 years) - increased risk")
-    elif data["age"] >= 65:
-        signals.append("Older adult (65-74 years)")
-    
-    # Complaint category interpretation
-    complaint_map = {
-        0: "General complaint",
-        1: "Respiratory issue",
-        2: "Chest pain/cardiac",
-        3: "Trauma/injury"
-    }
-    complaint = complaint_map.get(int(data.get("complaint_encoded", 0)), "Unknown")
-    signals.append(f"Chief complaint: {complaint}")
-    
-    # Summary
-    if critical_count >= 2:
-        signals.insert(0, "🚨 MULTIPLE CRITICAL INDICATORS PRESENT")
+    Nothing is loaded at import time. Missing artifacts raise RuntimeError
+    unless `train_if_missing` is set, in which case a model is trained first.
+    """
+    global _backend
+    if _backend is not None:
+        return _backend
     
-    return signals if signals else ["All vital signs within normal range"]
+    try:
+        _backend = load_backend()
+    except RuntimeError:
+        if not train_if_missing:
+            raise
+        print("⚠️  Model not found. Training new model...")
+        train_model()
+        _backend = load_backend()
+    return _backend
+
+def served_version(backend):
+    """Version reported for a backend's scores: the bundle's artifact_id, else MODEL_VERSION"""
+    return getattr(backend, "version", None) or MODEL_VERSION
 
 # =========================
 # Gemini Explanation Agent
@@ -393,11 +567,12 @@ def extract_signals(data):
 # Enhanced Gemini Explanation Agent
 # =========================
 
-def gemini_explain(patient_data, risk_prob, decision, signals):
-    """Generate clinical explanation using Gemini AI"""
-    
-    # Build comprehensive prompt
-    prompt = f"""You are an experienced emergency medicine physician reviewing an AI triage decision.
+class GeminiUnavailable(RuntimeError):
+    """Raised when no Gemini client is configured"""
+
+def build_explanation_prompt(patient_data, risk_prob, decision, signals):
+    """Build the clinician-facing prompt for Gemini"""
+    return f"""You are an experienced emergency medicine physician reviewing an AI triage decision.
 
 PATIENT PROFILE:
 • Age: {patient_data['age']} years
@@ -423,16 +598,46 @@ As a senior clinician, provide a concise 3-part explanation (max 150 words total
 
 Use professional medical terminology but keep it concise and actionable for an emergency department."""
 
-    # Fallback if Gemini unavailable
+@timed("gemini_explain")
+def gemini_generate(patient_data, risk_prob, decision, signals):
+    """Call Gemini for an explanation; raises on any failure"""
+    client = get_gemini_client()
     if client is None:
-        return _generate_fallback_explanation(patient_data, risk_prob, decision, signals)
+        raise GeminiUnavailable("GOOGLE_API_KEY not set")
+
+    response = client.models.generate_content(
+        model=GEMINI_MODEL,
+        contents=build_explanation_prompt(patient_data, risk_prob, decision, signals)
+    )
+    return response.text.strip()
 
+_explanation_cache = None
+
+def get_explanation_cache():
+    """Shared explanation cache, invalidated when MODEL_VERSION or GEMINI_MODEL changes"""
+    global _explanation_cache
+    namespace = f"{MODEL_VERSION}|{GEMINI_MODEL}"
+    if _explanation_cache is None:
+        _explanation_cache = ExplanationCache(namespace)
+    elif _explanation_cache.namespace != namespace:
+        _explanation_cache.invalidate(namespace)
+    return _explanation_cache
+
+def gemini_explain(patient_data, risk_prob, decision, signals):
+    """Generate clinical explanation using Gemini AI"""
+    cache = get_explanation_cache()
+    key = cache.key(patient_data, risk_prob, decision, signals)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    
     try:
-        response = client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=prompt
-        )
-        return response.text.strip()
+        explanation = gemini_generate(patient_data, risk_prob, decision, signals)
+        cache.put(key, explanation)
+        return explanation
+    
+    except GeminiUnavailable:
+        return _generate_fallback_explanation(patient_data, risk_prob, decision, signals)
     
     except Exception as e:
         print(f"⚠️  Gemini API error: {e}")
@@ -466,43 +671,160 @@ def _generate_fallback_explanation(patient_data, risk_prob, decision, signals):
 # Enhanced Prediction Pipeline
 # =========================
 
-def predict_patient(patient_data):
-    """Complete prediction pipeline with AI + Gemini explanation"""
-    # Prepare features
-    df = pd.DataFrame([patient_data], columns=FEATURES)
-    scaled = scaler.transform(df)
+_explanation_pipeline = None
 
-    # AI Prediction
-    prob = float(model.predict(scaled, verbose=0)[0][0])
+def get_explanation_pipeline():
+    """Shared asynchronous explanation pipeline (bounded workers + timeouts)"""
+    global _explanation_pipeline
+    cache = get_explanation_cache()
+    if _explanation_pipeline is None:
+        _explanation_pipeline = ExplanationPipeline(
+            gemini_generate, _generate_fallback_explanation, cache=cache
+        )
+    return _explanation_pipeline
+
+def close_explanation_pipeline(wait=True):
+    """Drain and stop the explanation workers (graceful server shutdown)"""
+    global _explanation_pipeline
+    if _explanation_pipeline is not None:
+        _explanation_pipeline.close(wait=wait)
+        _explanation_pipeline = None
+
+def _explanation_text(job, patient_data, prob, decision, signals):
+    """Text of a finished explanation job, or the rule-based one if it was dropped or never finished"""
+    text = job.get("explanation") if job else None
+    return text if text is not None else _generate_fallback_explanation(patient_data, prob, decision, signals)
+
+def predict_patient(patient_data, explanation="sync", on_explanation=None):
+    """Complete prediction pipeline with AI + Gemini explanation.
+
+    explanation="sync" waits for the explanation (bounded by the pipeline
+    timeout), "async" returns immediately with an `explanation_id` that can
+    be polled via get_explanation_pipeline() and passes the result to
+    `on_explanation` when ready, and "none" skips it.
+    """
+    # AI Prediction (backend applies the scaler)
+    backend = load_model_for_inference()
+    with stage("feature_assembly"):
+        x = features_matrix([patient_data])
+    cache = get_prediction_cache()
+    if cache is not None:
+        prob = cache.predict(x[0], served_version(backend), lambda row: backend.predict(row[None])[0])
+    else:
+        prob = float(backend.predict(x)[0])
     decision = risk_level(prob)
-    signals = extract_signals(patient_data)
+    with stage("extract_signals"):
+        signals = extract_signals(patient_data)
 
-    # Gemini Explanation (agentic layer)
-    explanation = gemini_explain(
-        patient_data,
-        prob,
-        decision,
-        signals
-    )
-
-    return {
+    result = {
         "risk_probability": prob,
         "decision": decision,
         "signals": signals,
-        "gemini_explanation": explanation,
-        "model_version": MODEL_VERSION,
+        "gemini_explanation": None,
+        "model_version": served_version(backend),
         "timestamp": datetime.utcnow().isoformat()
     }
 
+    # Gemini Explanation (agentic layer)
+    if explanation in ("sync", "async"):
+        pipeline = get_explanation_pipeline()
+        explanation_id = pipeline.submit(patient_data, prob, decision, signals, callback=on_explanation)
+        result["explanation_id"] = explanation_id
+        if explanation == "sync":
+            result["gemini_explanation"] = _explanation_text(
+                pipeline.wait(explanation_id), patient_data, prob, decision, signals)
+
+    return result
+
+def predict_patients(patients, explain=False):
+    """Vectorized prediction pipeline for a list of patient feature dicts.
+
+    Scaling, inference, risk levels and signals run once over the whole
+    batch. Gemini explanations are only generated when `explain` is set,
+    since they cost one LLM call per patient; they run concurrently on the
+    explanation pipeline.
+    """
+    if len(patients) == 0:
+        return []
+
+    with stage("feature_assembly"):
+        X = features_matrix(patients)
+    backend = load_model_for_inference()
+    version = served_version(backend)
+    cache = get_prediction_cache()
+    if cache is not None:
+        probs = cache.predict_many(X, version, backend.predict)
+    else:
+        probs = backend.predict(X).astype(float)
+    decisions = risk_levels(probs)
+    with stage("extract_signals"):
+        signals = extract_signals_batch(X)
+    timestamp = datetime.utcnow().isoformat()
+
+    results = []
+    for patient, prob, decision, patient_signals in zip(patients, probs, decisions, signals):
+        results.append({
+            "risk_probability": float(prob),
+            "decision": decision,
+            "signals": patient_signals,
+            "gemini_explanation": None,
+            "model_version": version,
+            "timestamp": timestamp
+        })
+
+    if explain:
+        pipeline = get_explanation_pipeline()
+        # Windows of max_pending keep large batches from tripping overload
+        # fallbacks or outliving the pipeline's result retention
+        window = max(1, pipeline.max_pending)
+        for start in range(0, len(results), window):
+            chunk = list(zip(patients[start:start + window], results[start:start + window]))
+            job_ids = [
+                pipeline.submit(patient, r["risk_probability"], r["decision"], r["signals"])
+                for patient, r in chunk
+            ]
+            for (patient, r), job_id in zip(chunk, job_ids):
+                r["gemini_explanation"] = _explanation_text(
+                    pipeline.wait(job_id), patient, r["risk_probability"], r["decision"], r["signals"])
+    return results
+
 # =========================
 # Human-in-the-Loop Feedback System
 # =========================
 
+_feedback_store = None
+
+def get_feedback_store():
+    """Feedback store selected by TRIAGE_FEEDBACK_STORE (jsonl, sqlite, parquet)"""
+    global _feedback_store
+    if _feedback_store is None:
+        _feedback_store = open_feedback_store()
+    return _feedback_store
+
+_feedback_writer = None
+
+def get_feedback_writer():
+    """Group-commit writer for this process (TRIAGE_FEEDBACK_DURABILITY)"""
+    global _feedback_writer
+    if _feedback_writer is None or _feedback_writer.pid != os.getpid():
+        # A writer inherited through fork has no thread; its buffer belongs to the parent
+        _feedback_writer = FeedbackWriter(get_feedback_store())
+        atexit.register(close_feedback_writer)
+    return _feedback_writer
+
+def close_feedback_writer():
+    """Write buffered feedback and stop the writer (graceful shutdown)"""
+    global _feedback_writer
+    if _feedback_writer is not None and _feedback_writer.pid == os.getpid():
+        _feedback_writer.close()
+    _feedback_writer = None
+
+@timed("save_feedback")
 def save_feedback(patient_data, ai_result, clinician_decision=None, clinician_notes=None):
     """Log patient records and clinician feedback for model retraining"""
     log = {
         "timestamp": datetime.utcnow().isoformat(),
-        "model_version": MODEL_VERSION,
+        "model_version": ai_result.get("model_version", MODEL_VERSION),
         "patient_data": patient_data,
         "ai_risk_probability": ai_result["risk_probability"],
         "ai_decision": ai_result["decision"],
@@ -513,39 +835,23 @@ def save_feedback(patient_data, ai_result, clinician_decision=None, clinician_no
         "agreement": clinician_decision == ai_result["decision"] if clinician_decision else None
     }
 
-    with open(FEEDBACK_LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(json.dumps(log, ensure_ascii=False) + "\n")
+    get_feedback_writer().append(log)
     
     print(f"✅ Feedback logged for {ai_result['decision']}")
 
 def analyze_feedback():
-    """Analyze model performance from feedback logs"""
-    if not os.path.exists(FEEDBACK_LOG_PATH):
+    """Analyze model performance from feedback logs (incremental)"""
+    if _feedback_writer is not None:
+        _feedback_writer.flush()
+    analytics = FeedbackAnalytics(get_feedback_store())
+    analytics.update()
+    summary = analytics.summary()
+    if not summary["totals"]["records"]:
         print("No feedback data available")
         return
     
-    records = []
-    with open(FEEDBACK_LOG_PATH, 'r', encoding='utf-8') as f:
-        for line in f:
-            records.append(json.loads(line))
-    
-    print(f"\n{'='*60}")
-    print(f"📊 Feedback Analysis ({len(records)} records)")
-    print(f"{'='*60}\n")
-    
-    agreements = [r for r in records if r.get('agreement') is not None]
-    if agreements:
-        agree_rate = sum(1 for r in agreements if r['agreement']) / len(agreements)
-        print(f"Clinician-AI Agreement Rate: {agree_rate:.1%}")
-        print(f"Total Overrides: {sum(1 for r in agreements if not r['agreement'])}")
-    
-    # Distribution by risk category
-    decisions = [r['ai_decision'] for r in records]
-    from collections import Counter
-    decision_counts = Counter(decisions)
-    print(f"\nDecision Distribution:")
-    for decision, count in decision_counts.most_common():
-        print(f"  {decision}: {count} ({count/len(records):.1%})")
+    print_report(summary)
+    return summary
 
 # =========================
 # CLI Interface & Testing
@@ -558,17 +864,28 @@ def main():
     if len(sys.argv) > 1:
         command = sys.argv[1]
         
+        # --streaming trains out-of-core via the tf.data pipeline
+        trainer = train_model_streaming if "--streaming" in sys.argv[2:] else train_model
+        
         if command == "train":
             print("🎯 Starting fresh training...")
-            train_model(retrain=False)
+            trainer(retrain=False)
         
         elif command == "retrain":
-            print("🔄 Retraining with feedback data...")
-            train_model(retrain=True)
+            if "--warm-start" in sys.argv[2:]:
+                print("🔥 Warm-start retraining on new feedback...")
+                retrain_warm_start()
+            else:
+                print("🔄 Retraining with feedback data...")
+                trainer(retrain=True)
         
         elif command == "analyze":
             analyze_feedback()
         
+        elif command == "sweep":
+            from sweep import run_sweep, parse_sweep_args
+            run_sweep(**parse_sweep_args(sys.argv[2:]))
+        
         elif command == "predict":
             # Interactive prediction mode
             print("\n=== Interactive Triage Prediction ===\n")
@@ -582,6 +899,7 @@ def main():
                 "complaint_encoded": float(input("Complaint (0=General, 1=Respiratory, 2=Cardiac, 3=Trauma): "))
             }
             
+            load_model_for_inference(train_if_missing=True)
             result = predict_patient(patient)
             print_prediction_result(result)
             
@@ -591,7 +909,7 @@ def main():
         
         else:
             print(f"Unknown command: {command}")
-            print("Available commands: train, retrain, analyze, predict")
+            print("Available commands: train, retrain, analyze, predict, sweep")
     
     else:
         # Run demo prediction
@@ -629,6 +947,7 @@ def run_demo():
         "complaint_encoded": 2
     }
 
+    load_model_for_inference(train_if_missing=True)
     ai_result = predict_patient(sample_patient)
     print_prediction_result(ai_result)
 
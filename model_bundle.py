@@ -0,0 +1,216 @@
+import os
+import json
+import shutil
+import hashlib
+from datetime import datetime
+
+import numpy as np
+
+from triage_rules import FEATURES, CRITICAL_THRESHOLD, MODERATE_THRESHOLD
+
+# =========================
+# Configuration
+# =========================
+
+# One immutable subdirectory per artifact_id; CURRENT names the live one
+BUNDLE_ROOT = os.environ.get("TRIAGE_BUNDLE_DIR", "model_bundles")
+CURRENT_POINTER = "CURRENT"
+BUNDLE_MANIFEST = "manifest.json"
+BUNDLE_FORMAT = 1
+
+# Published bundles kept on disk (the current one is never pruned)
+KEEP_BUNDLES = int(os.environ.get("TRIAGE_BUNDLE_KEEP", "5"))
+
+# Check every array's sha256 against the manifest on load
+VERIFY_CHECKSUMS = os.environ.get("TRIAGE_BUNDLE_VERIFY", "1") != "0"
+
+# =========================
+# Bundle Layout
+# =========================
+# model_bundles/
+#   CURRENT                 artifact_id of the live bundle (replaced atomically)
+#   v2.0-r7/
+#     manifest.json         version, feature order, thresholds, layers, checksums
+#     scaler_mean.npy       float32 (7,)
+#     scaler_scale.npy      float32 (7,)
+#     W0.npy, b0.npy, ...   folded Dense layers (BatchNorm folded in), float32
+#
+# Arrays are plain .npy files opened with np.load(mmap_mode="r"): every
+# worker maps the same page-cache pages, loading is a few small reads and
+# nothing is unpickled. Bundles are never rewritten in place, so a worker
+# still mapping an older bundle keeps valid pages while a new one goes live.
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def current_bundle(root=BUNDLE_ROOT):
+    """Path of the live bundle, or None if none has been published"""
+    try:
+        with open(os.path.join(root, CURRENT_POINTER), "r", encoding="utf-8") as f:
+            artifact_id = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(root, artifact_id) if artifact_id else None
+
+def write_bundle(layers, mean, scale, artifact_id, model_version, root=BUNDLE_ROOT, publish=True, **details):
+    """Write a bundle for (W, b, activation) layers over scaled features.
+
+    `mean` / `scale` are the StandardScaler statistics applied before the
+    first layer. The bundle is assembled in a temporary directory and
+    renamed into place; with `publish`, CURRENT is then switched to it.
+    Returns the bundle path.
+    """
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, artifact_id)
+    tmp_path = os.path.join(root, f".{artifact_id}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    arrays = {}
+
+    def save(name, array):
+        array = np.ascontiguousarray(array, dtype=np.float32)
+        np.save(os.path.join(tmp_path, name), array, allow_pickle=False)
+        arrays[name] = {
+            "shape": list(array.shape),
+            "dtype": array.dtype.str,
+            "sha256": _sha256(os.path.join(tmp_path, name)),
+        }
+        return name
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "artifact_id": artifact_id,
+        "model_version": model_version,
+        "created": datetime.utcnow().isoformat(),
+        "features": list(FEATURES),
+        "thresholds": {"moderate": MODERATE_THRESHOLD, "critical": CRITICAL_THRESHOLD},
+        "scaler": {"mean": save("scaler_mean.npy", mean), "scale": save("scaler_scale.npy", scale)},
+        "layers": [
+            {"W": save(f"W{i}.npy", W), "b": save(f"b{i}.npy", b), "activation": activation}
+            for i, (W, b, activation) in enumerate(layers)
+        ],
+        "arrays": arrays,
+        **details,
+    }
+    with open(os.path.join(tmp_path, BUNDLE_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Replacing a bundle with the same id (an interrupted run) unlinks its
+    # files; live mappings of them stay valid until their workers reload
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    print(f"✅ Model bundle written to {path}")
+    if publish:
+        publish_bundle(artifact_id, root)
+    return path
+
+def publish_bundle(artifact_id, root=BUNDLE_ROOT):
+    """Atomically point CURRENT at `artifact_id` and prune old bundles"""
+    if not os.path.isfile(os.path.join(root, artifact_id, BUNDLE_MANIFEST)):
+        raise RuntimeError(f"No bundle '{artifact_id}' in {root}")
+    tmp_path = os.path.join(root, CURRENT_POINTER + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(artifact_id + "\n")
+    os.replace(tmp_path, os.path.join(root, CURRENT_POINTER))
+    prune_bundles(root)
+
+def prune_bundles(root=BUNDLE_ROOT, keep=KEEP_BUNDLES):
+    """Delete all but the newest `keep` bundles, never the current one"""
+    current = current_bundle(root)
+    bundles = sorted(
+        (os.path.join(root, name) for name in os.listdir(root) if not name.startswith(".")),
+        key=os.path.getmtime,
+    )
+    bundles = [p for p in bundles if os.path.isfile(os.path.join(p, BUNDLE_MANIFEST))]
+    for path in bundles[:max(len(bundles) - keep, 0)]:
+        if path != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+def load_bundle(root=BUNDLE_ROOT, path=None, verify=VERIFY_CHECKSUMS):
+    """(manifest, {file name: read-only memory-mapped array}) for a bundle.
+
+    Loads the current bundle under `root` unless `path` names one. Raises
+    RuntimeError if it is missing, for other features, or fails its checksums.
+    """
+    path = path or current_bundle(root)
+    if path is None or not os.path.isfile(os.path.join(path, BUNDLE_MANIFEST)):
+        raise RuntimeError(f"No model bundle published in {root}. Run main.py train to create one.")
+    with open(os.path.join(path, BUNDLE_MANIFEST), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise RuntimeError(f"{path}: unsupported bundle format {manifest.get('format')}")
+    if manifest.get("features") != list(FEATURES):
+        raise RuntimeError(f"{path}: bundle feature order {manifest.get('features')} != {list(FEATURES)}")
+
+    arrays = {}
+    for name, meta in manifest["arrays"].items():
+        file_path = os.path.join(path, name)
+        if verify and _sha256(file_path) != meta["sha256"]:
+            raise RuntimeError(f"{file_path}: checksum mismatch")
+        array = np.load(file_path, mmap_mode="r", allow_pickle=False)
+        if list(array.shape) != meta["shape"] or array.dtype.str != meta["dtype"]:
+            raise RuntimeError(f"{file_path}: expected {meta['dtype']} {meta['shape']}, found {array.dtype.str} {list(array.shape)}")
+        # Plain ndarray view over the mapping (memmap results would otherwise stay memmaps)
+        arrays[name] = np.asarray(array)
+    return manifest, arrays
+
+def export_bundle(model, scaler, artifact_id, model_version, root=BUNDLE_ROOT, **details):
+    """Fold a trained Keras model and write it with its scaler as a bundle"""
+    from inference_backends import fold_keras_model
+    layers = fold_keras_model(model)
+    return write_bundle(layers, scaler.mean_, scaler.scale_, artifact_id, model_version, root, **details)
+
+# =========================
+# CLI
+# =========================
+
+def _print_bundle(manifest, path):
+    print(f"📦 {manifest['artifact_id']} ({manifest['model_version']}) at {path}")
+    print(f"   created    {manifest['created']}")
+    print(f"   thresholds moderate {manifest['thresholds']['moderate']}, critical {manifest['thresholds']['critical']}")
+    shapes = " → ".join(str(manifest["arrays"][layer["W"]]["shape"][1]) + f" {layer['activation']}"
+                        for layer in manifest["layers"])
+    print(f"   layers     {len(FEATURES)} → {shapes}")
+    size = sum(os.path.getsize(os.path.join(path, name)) for name in manifest["arrays"])
+    print(f"   arrays     {len(manifest['arrays'])} files, {size / 1024:.1f} KiB")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect, verify or build model bundles")
+    parser.add_argument("--root", default=BUNDLE_ROOT)
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("info", "verify"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("path", nargs="?", help="bundle directory (default: current)")
+    build = sub.add_parser("build", help="bundle existing triage_model.keras + scaler.pkl (needs TensorFlow)")
+    build.add_argument("--model", default="triage_model.keras")
+    build.add_argument("--scaler", default="scaler.pkl")
+    publish = sub.add_parser("publish", help="make an existing bundle current (rollback)")
+    publish.add_argument("artifact_id")
+    args = parser.parse_args()
+
+    if args.command in ("info", "verify"):
+        manifest, _ = load_bundle(args.root, args.path, verify=args.command == "verify")
+        _print_bundle(manifest, args.path or current_bundle(args.root))
+        if args.command == "verify":
+            print("✅ Checksums match")
+    elif args.command == "publish":
+        publish_bundle(args.artifact_id, args.root)
+        print(f"✅ {args.artifact_id} is now current")
+    else:
+        import joblib
+        import tensorflow as tf
+        from model_manifest import load_manifest
+
+        manifest = load_manifest()
+        artifact_id = manifest.get("artifact_id") or "legacy"
+        export_bundle(tf.keras.models.load_model(args.model), joblib.load(args.scaler), artifact_id,
+                      manifest.get("model_version", "unknown"), args.root, source="build")
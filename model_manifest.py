@@ -0,0 +1,57 @@
+import os
+import json
+from datetime import datetime
+
+# =========================
+# Configuration
+# =========================
+
+MANIFEST_PATH = "model_manifest.json"
+
+# Number of past training runs kept in the manifest lineage
+MAX_LINEAGE = 50
+
+# =========================
+# Model Manifest
+# =========================
+
+def load_manifest(path=MANIFEST_PATH):
+    """Current manifest dict, or an empty one if no model has been recorded"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def next_artifact_id(model_version, path=MANIFEST_PATH):
+    """artifact_id the next record_training_run will assign"""
+    return f"{model_version}-r{load_manifest(path).get('revision', 0) + 1}"
+
+def record_training_run(model_version, mode, feedback_watermark, path=MANIFEST_PATH, **details):
+    """Append a training run to the manifest lineage and make it current.
+
+    `feedback_watermark` is the newest feedback timestamp the model has
+    seen; warm-start retraining only fine-tunes on records after it.
+    """
+    manifest = load_manifest(path)
+    previous = {k: v for k, v in manifest.items() if k != "lineage"}
+    revision = manifest.get("revision", 0) + 1
+
+    run = {
+        "model_version": model_version,
+        "revision": revision,
+        "artifact_id": f"{model_version}-r{revision}",
+        "mode": mode,
+        "parent": previous.get("artifact_id"),
+        "created": datetime.utcnow().isoformat(),
+        "feedback_watermark": feedback_watermark,
+        **details,
+    }
+    lineage = (manifest.get("lineage", []) + [previous])[-MAX_LINEAGE:] if previous else []
+    manifest = dict(run, lineage=lineage)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    print(f"✅ Manifest updated: {run['artifact_id']} ({mode})")
+    return manifest
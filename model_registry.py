@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing as mp
+from datetime import datetime
+
+import numpy as np
+
+from inference_backends import (
+    BACKENDS,
+    HGB_MODEL_PATH,
+    MODEL_BENCHMARK_PATH,
+    RF_MODEL_PATH,
+    load_backend,
+)
+from triage_rules import CRITICAL_THRESHOLD
+
+# =========================
+# Configuration
+# =========================
+
+# Minimum recall on high-risk patients (p >= CRITICAL_THRESHOLD) a model
+# must reach before it can be selected for serving
+RECALL_TARGET = float(os.environ.get("TRIAGE_RECALL_TARGET", "0.95"))
+
+LATENCY_RUNS = 300
+THROUGHPUT_BATCH = 1024
+
+# =========================
+# Registered Models
+# =========================
+# Every model trains on the scaled split from main.prepare_training_arrays
+# and is served through the inference backend of the same name.
+
+class KerasMlpModel:
+    """The production MLP (build_enhanced_model); also served by numpy/tflite"""
+    name = "keras"
+    serving_backends = ("keras", "numpy", "tflite")
+
+    def train(self, X_train, y_train, scaler):
+        from main import balanced_class_weights, build_enhanced_model, save_model_artifacts, training_callbacks
+
+        model = build_enhanced_model(input_dim=X_train.shape[1])
+        model.fit(
+            X_train, y_train,
+            validation_split=0.2,
+            epochs=100,
+            batch_size=32,
+            class_weight=balanced_class_weights(y_train),
+            callbacks=training_callbacks(),
+            verbose=0
+        )
+        save_model_artifacts(model, scaler)
+
+class SklearnModel:
+    """Scikit-learn classifier persisted as an {"estimator", "scaler"} bundle"""
+
+    def __init__(self, name, path, factory):
+        self.name = name
+        self.path = path
+        self.factory = factory
+        self.serving_backends = (name,)
+
+    def train(self, X_train, y_train, scaler):
+        import joblib
+
+        estimator = self.factory()
+        estimator.fit(X_train, y_train.astype(int))
+        if hasattr(estimator, "n_jobs"):
+            # Single-row serving is faster without joblib dispatch
+            estimator.n_jobs = None
+        joblib.dump({"estimator": estimator, "scaler": scaler}, self.path)
+        print(f"✅ {self.name} model saved to {self.path}")
+
+def _random_forest():
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(n_estimators=100, min_samples_leaf=2, n_jobs=-1, random_state=42)
+
+def _hist_gradient_boosting():
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    return HistGradientBoostingClassifier(max_iter=200, learning_rate=0.1, early_stopping=True, random_state=42)
+
+MODELS = {
+    "keras": KerasMlpModel(),
+    "rf": SklearnModel("rf", RF_MODEL_PATH, _random_forest),
+    "hgb": SklearnModel("hgb", HGB_MODEL_PATH, _hist_gradient_boosting),
+}
+
+def train_models(names=tuple(MODELS), retrain=False):
+    """Train the named models on one shared split"""
+    from main import prepare_training_arrays
+
+    X_train, _, y_train, _, scaler = prepare_training_arrays(retrain)
+    for name in names:
+        print(f"\n🎯 Training {name}...")
+        start = time.perf_counter()
+        MODELS[name].train(X_train, y_train, scaler)
+        print(f"⏱️  {name} trained in {time.perf_counter() - start:.1f}s")
+
+# =========================
+# Head-to-Head Benchmark
+# =========================
+
+def _rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def benchmark_backend(name, X, y):
+    """Metrics for one serving backend; run in a fresh process for clean memory"""
+    from sklearn.metrics import roc_auc_score
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    try:
+        backend = load_backend(name)
+    except (RuntimeError, ImportError) as e:
+        return {"backend": name, "error": str(e)}
+    load_s = time.perf_counter() - start
+
+    probs = np.asarray(backend.predict(X), dtype=np.float64)
+    positives = y >= 0.5
+
+    timings = np.empty(LATENCY_RUNS)
+    for i in range(LATENCY_RUNS):
+        row = X[i % len(X):i % len(X) + 1]
+        start = time.perf_counter()
+        backend.predict(row)
+        timings[i] = time.perf_counter() - start
+
+    X_batch = np.resize(X, (THROUGHPUT_BATCH, X.shape[1]))
+    backend.predict(X_batch)
+    repeats = 10
+    start = time.perf_counter()
+    for _ in range(repeats):
+        backend.predict(X_batch)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "backend": name,
+        "auc": float(roc_auc_score(y, probs)) if len(np.unique(y)) == 2 else None,
+        "recall_at_critical": float(np.mean(probs[positives] >= CRITICAL_THRESHOLD)) if positives.any() else None,
+        "latency_p50_ms": round(float(np.percentile(timings, 50)) * 1e3, 4),
+        "latency_p99_ms": round(float(np.percentile(timings, 99)) * 1e3, 4),
+        "throughput_rows_per_s": round(repeats * THROUGHPUT_BATCH / elapsed, 1),
+        "load_s": round(load_s, 3),
+        "memory_mb": round(_rss_mb() - rss_before, 1),
+    }
+
+def select_backend(results, recall_target=RECALL_TARGET):
+    """Cheapest backend (p50 latency, then memory) meeting the recall target"""
+    eligible = [
+        r for r in results
+        if "error" not in r and r["recall_at_critical"] is not None and r["recall_at_critical"] >= recall_target
+    ]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda r: (r["latency_p50_ms"], r["memory_mb"]))["backend"]
+
+def _fmt(value, spec):
+    return "n/a" if value is None else format(value, spec)
+
+def benchmark_models(backends=None, recall_target=RECALL_TARGET, retrain=False,
+                     report_path=MODEL_BENCHMARK_PATH):
+    """Compare serving backends on the held-out split and record the winner.
+
+    Each backend is measured in its own spawned process so memory numbers
+    are not polluted by the others (TensorFlow in particular).
+    """
+    from main import prepare_training_arrays
+
+    backends = backends or [b for model in MODELS.values() for b in model.serving_backends]
+    _, X_test, _, y_test, scaler = prepare_training_arrays(retrain)
+    X = scaler.inverse_transform(X_test).astype(np.float32)
+    y = np.asarray(y_test, dtype=np.float32)
+
+    print(f"\n{'='*60}")
+    print(f"⚖️  Model Benchmark ({len(X)} held-out rows, recall target {recall_target:.0%})")
+    print(f"{'='*60}\n")
+
+    context = mp.get_context("spawn")
+    results = []
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for name in backends:
+            row = pool.apply(benchmark_backend, (name, X, y))
+            results.append(row)
+            if "error" in row:
+                print(f"  {name:<7} ⚠️  {row['error']}")
+                continue
+            # AUC / recall are None when the held-out split has a single class
+            print(f"  {name:<7} AUC {_fmt(row['auc'], '.4f')}  recall@crit {_fmt(row['recall_at_critical'], '.3f')}  "
+                  f"p50 {row['latency_p50_ms']:.3f} ms  {row['throughput_rows_per_s']:.0f} rows/s  "
+                  f"{row['memory_mb']:.1f} MB")
+
+    selected = select_backend(results, recall_target)
+    report = {
+        "created": datetime.utcnow().isoformat(),
+        "rows": int(len(X)),
+        "recall_target": recall_target,
+        "results": results,
+        "selected": selected,
+    }
+    tmp_path = report_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, report_path)
+
+    if selected:
+        print(f"\n✅ Selected backend: {selected} (serve with TRIAGE_BACKEND=auto)")
+    else:
+        print("\n⚠️  No backend meets the recall target; TRIAGE_BACKEND=auto falls back to keras")
+    print(f"✅ Benchmark written to {report_path}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and compare triage models")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train", help="train registered models")
+    train.add_argument("models", nargs="*", help=f"any of {', '.join(MODELS)} (default: all)")
+    train.add_argument("--retrain", action="store_true", help="include clinician feedback")
+    bench = sub.add_parser("benchmark", help="head-to-head benchmark of serving backends")
+    bench.add_argument("backends", nargs="*", help=f"any of {', '.join(BACKENDS)} (default: all)")
+    bench.add_argument("--recall-target", type=float, default=RECALL_TARGET)
+    bench.add_argument("--retrain", action="store_true", help="evaluate on the split with feedback")
+    args = parser.parse_args()
+
+    # nargs="*" with choices= rejects its own default, so names are checked here
+    names, known = (args.models, MODELS) if args.command == "train" else (args.backends, BACKENDS)
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        parser.error(f"unknown {args.command} target(s) {', '.join(unknown)}; choose from {', '.join(known)}")
+
+    if args.command == "train":
+        train_models(args.models or list(MODELS), args.retrain)
+    else:
+        benchmark_models(args.backends or None, args.recall_target, args.retrain)
@@ -1,38 +1,348 @@
-from flask import Flask, request, jsonify
-import joblib
+from flask import Flask, Response, request, jsonify
 import numpy as np
-import tensorflow as tf
+import json
 import os
+import threading
 
-MODEL_PATH = "triage_model.keras"
-SCALER_PATH = "scaler.pkl"
+from feedback_analytics import FeedbackAnalytics
+from instrumentation import PROFILE_DEFAULT_HZ, PROFILER_ENABLED, profile, render_prometheus, stage, stage_stats
+from main import close_explanation_pipeline, close_feedback_writer, get_explanation_pipeline
+from model_serving import ModelRouter
+from triage_rules import FEATURES, features_matrix, risk_level, risk_levels, extract_signals, extract_signals_batch
+from vitals_stream import VitalsState, body_lines, ingest_lines
+from wire_format import (BINARY_MIMETYPE, FEATURE_ORDER_HEADER, FEATURE_ORDER as WIRE_FEATURE_ORDER,
+                         check_feature_order, decode_rows, encode_probs)
+
+FEATURE_ORDER = FEATURES
+PREDICT_BATCH_MAX_ROWS = int(os.environ.get("TRIAGE_PREDICT_BATCH_MAX_ROWS", "10000"))
 
 app = Flask(__name__)
 
-# Load model and scaler
-print("Loading model and scaler...")
-if not os.path.exists(MODEL_PATH) or not os.path.exists(SCALER_PATH):
-    raise RuntimeError("Model or scaler not found. Run main.py train to create them.")
+# =========================
+# Per-Process Model State
+# =========================
+# The model router (primary slot, optional canary/shadow slot, each with
+# its own micro-batcher and a hot-reload watcher thread) is created on
+# first use in each process, so pre-fork launchers (serve.py, gunicorn,
+# uvicorn --workers) load the model after fork instead of sharing a TF
+# runtime or dead threads with the parent. Fork-safe backends (numpy)
+# loaded before fork are reused, sharing their weights copy-on-write.
+
+_worker = {"pid": None, "router": None, "vitals": None, "analytics": None}
+_worker_lock = threading.Lock()
+
+def init_worker():
+    """Load the models (TRIAGE_BACKEND, TRIAGE_CANARY_DIR) for this process"""
+    if _worker["pid"] == os.getpid():
+        return _worker
+    with _worker_lock:
+        if _worker["pid"] == os.getpid():
+            return _worker
+        router = _worker["router"]
+        router = router.respawn() if router is not None else ModelRouter.from_env().start()
+        # Incremental feedback analytics, opened per process (its store handle is not fork-safe)
+        _worker.update(pid=os.getpid(), router=router, vitals=None, analytics=FeedbackAnalytics())
+        return _worker
+
+def shutdown_worker():
+    """Drain the batchers, explanation pipeline and feedback writer (graceful shutdown)"""
+    with _worker_lock:
+        if _worker["pid"] == os.getpid():
+            _worker["router"].close()
+        _worker.update(pid=None, router=None, vitals=None, analytics=None)
+    close_explanation_pipeline()
+    close_feedback_writer()
+
+def get_router():
+    return init_worker()["router"]
+
+def get_vitals_state():
+    """Rolling telemetry state for /ingest, allocated on first use in this process"""
+    worker = init_worker()
+    if worker["vitals"] is None:
+        with _worker_lock:
+            if worker["vitals"] is None:
+                worker["vitals"] = VitalsState()
+    return worker["vitals"]
+
+def route_headers(req):
+    """Explicit slot (X-Model-Slot: primary|canary) and sticky routing key"""
+    return {'requested': req.headers.get('X-Model-Slot'), 'route_key': req.headers.get('X-Route-Key')}
+
+def predict_matrix(X, requested=None, route_key=None):
+    """One scaler pass and one forward pass for a whole batch of rows"""
+    return get_router().predict_matrix(X, requested, route_key)
+
+def versioned(response, version):
+    response.headers['X-Model-Version'] = version
+    return response
+
+def binary_response(probs, version=None):
+    """float32 probabilities for a binary request (see wire_format.py)"""
+    response = Response(encode_probs(probs), mimetype=BINARY_MIMETYPE)
+    response.headers[FEATURE_ORDER_HEADER] = WIRE_FEATURE_ORDER
+    return versioned(response, version) if version else response
 
-model = tf.keras.models.load_model(MODEL_PATH)
-scaler = joblib.load(SCALER_PATH)
-print("Model and scaler loaded.")
+def binary_rows(req):
+    """Feature matrix of a binary request body, without a JSON or per-key pass"""
+    with stage('json_parse'):
+        check_feature_order(req.headers.get(FEATURE_ORDER_HEADER))
+        return decode_rows(req.get_data())
+
+def feature_row(data):
+    """Feature vector from a /predict body ({"features": {...}})"""
+    with stage('feature_assembly'):
+        features = data.get('features') or {}
+        # Expected keys: age, heart_rate, oxygen, temperature, pain_scale, waiting_time, complaint_encoded
+        return [float(features.get(k, 0.0)) for k in FEATURE_ORDER]
+
+def prediction_payload(x, prob, version, explain=False):
+    """/predict response body (shared by the WSGI and ASGI apps)"""
+    if not explain:
+        return {'probability': prob, 'model_version': version}
+
+    # Score and signals now; the explanation is generated in the background
+    patient = dict(zip(FEATURE_ORDER, x))
+    decision = risk_level(prob)
+    with stage('extract_signals'):
+        signals = extract_signals(patient)
+    explanation_id = get_explanation_pipeline().submit(patient, prob, decision, signals)
+    return {
+        'probability': prob,
+        'decision': decision,
+        'signals': signals,
+        'explanation_id': explanation_id,
+        'model_version': version,
+    }
+
+@app.errorhandler(TimeoutError)
+def prediction_timeout(e):
+    # ModelSlot / ModelRouter.predict waited TRIAGE_PREDICT_TIMEOUT_S for the batcher
+    return jsonify({'error': 'prediction timed out'}), 503
 
 @app.route('/predict', methods=['POST'])
 def predict():
-    data = request.get_json(force=True)
-    features = data.get('features') or {}
-    # Expected keys: age, heart_rate, oxygen, temperature, pain_scale, waiting_time, complaint_encoded
-    order = ['age','heart_rate','oxygen','temperature','pain_scale','waiting_time','complaint_encoded']
-    x = [float(features.get(k, 0.0)) for k in order]
-    X = np.array([x])
+    if request.mimetype == BINARY_MIMETYPE:
+        try:
+            X = binary_rows(request)
+            if len(X) != 1:
+                raise ValueError("/predict takes exactly one row; use /predict_batch")
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        prob, version = get_router().predict(X[0], **route_headers(request))
+        return binary_response([prob], version)
+
+    with stage('json_parse'):
+        data = request.get_json(force=True)
+    x = feature_row(data)
+    prob, version = get_router().predict(x, **route_headers(request))
+    return versioned(jsonify(prediction_payload(x, prob, version, data.get('explain'))), version)
+
+@app.route('/explanations/<explanation_id>', methods=['GET'])
+def explanation(explanation_id):
+    # ?wait=<seconds> long-polls until the explanation is ready
+    try:
+        wait = min(float(request.args.get('wait', 0)), 30.0)
+    except ValueError:
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    pipeline = get_explanation_pipeline()
+    result = pipeline.wait(explanation_id, timeout=wait) if wait > 0 else pipeline.get(explanation_id)
+    if result is None:
+        return jsonify({'error': 'unknown explanation_id'}), 404
+    return jsonify(result)
+
+@app.route('/predict_stream', methods=['POST'])
+def predict_stream():
+    """NDJSON stream: the prediction line first, the explanation line when ready"""
+    with stage('json_parse'):
+        data = request.get_json(force=True)
+    x = feature_row(data)
+    prob, version = get_router().predict(x, **route_headers(request))
+    patient = dict(zip(FEATURE_ORDER, x))
+    decision = risk_level(prob)
+    with stage('extract_signals'):
+        signals = extract_signals(patient)
+    pipeline = get_explanation_pipeline()
+    explanation_id = pipeline.submit(patient, prob, decision, signals)
+
+    def generate():
+        yield json.dumps({
+            'probability': prob,
+            'decision': decision,
+            'signals': signals,
+            'explanation_id': explanation_id,
+            'model_version': version,
+        }, ensure_ascii=False) + "\n"
+        yield json.dumps(pipeline.wait(explanation_id), ensure_ascii=False) + "\n"
+
+    return versioned(Response(generate(), mimetype='application/x-ndjson'), version)
+
+def parse_batch_payload(req):
+    """Build the feature matrix for /predict_batch.
+
+    Accepts a JSON list of feature dicts (bare or under "patients"), a
+    columnar JSON object {"columns": {feature: [values...]}}, NDJSON
+    with one feature dict per line, or packed float32 rows
+    (wire_format.BINARY_MIMETYPE).
+    """
+    if req.mimetype == BINARY_MIMETYPE:
+        return binary_rows(req)
+    if req.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        lines = req.get_data(as_text=True).splitlines()
+        patients = [json.loads(line) for line in lines if line.strip()]
+        return features_matrix(check_patients(patients), default=0.0)
+
+    data = req.get_json(force=True)
+    if isinstance(data, dict) and 'columns' in data:
+        columns = data['columns']
+        if not isinstance(columns, dict):
+            raise ValueError("columns must be an object mapping feature names to lists")
+        missing = [k for k in FEATURE_ORDER if k not in columns]
+        if missing:
+            raise ValueError(f"missing feature columns: {', '.join(missing)}")
+        lengths = {len(columns[k]) for k in FEATURE_ORDER}
+        if len(lengths) > 1:
+            raise ValueError("columns must all have the same length")
+        n = lengths.pop() if lengths else 0
+        X = np.empty((n, len(FEATURE_ORDER)), dtype=np.float64)
+        for j, k in enumerate(FEATURE_ORDER):
+            X[:, j] = np.asarray(columns[k], dtype=np.float64)
+        return X
+
+    patients = data.get('patients') if isinstance(data, dict) else data
+    if not isinstance(patients, list):
+        raise ValueError("expected a list of feature dicts")
+    return features_matrix(check_patients(patients), default=0.0)
+
+def check_patients(patients):
+    """Reject batch items that are not feature dicts"""
+    for i, patient in enumerate(patients):
+        if not isinstance(patient, dict):
+            raise ValueError(f"item {i} is not a feature dict")
+    return patients
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    try:
+        # Parsing and matrix assembly are interleaved for NDJSON / lists
+        with stage('json_parse'):
+            X = parse_batch_payload(request)
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        return jsonify({'error': str(e)}), 400
+    if len(X) > PREDICT_BATCH_MAX_ROWS:
+        return jsonify({'error': f'batch exceeds {PREDICT_BATCH_MAX_ROWS} rows'}), 413
+    binary = request.mimetype == BINARY_MIMETYPE
+    if len(X) == 0:
+        return binary_response([]) if binary else jsonify({'probabilities': [], 'decisions': [], 'signals': []})
+
+    probs, version = predict_matrix(X, **route_headers(request))
+    if binary:
+        # Probabilities only; callers derive bands with triage_rules.risk_band_index
+        return binary_response(probs, version)
+    with stage('extract_signals'):
+        signals = extract_signals_batch(X)
+    return versioned(jsonify({
+        'probabilities': probs.astype(float).tolist(),
+        'decisions': risk_levels(probs),
+        'signals': signals,
+        'model_version': version,
+    }), version)
+
+@app.route('/ingest', methods=['POST'])
+def ingest():
+    """Chunked NDJSON telemetry in, NDJSON risk updates out as patients are re-scored.
+
+    Samples are buffered per chunk (TRIAGE_STREAM_BATCH_LINES /
+    TRIAGE_STREAM_FLUSH_MS, also on a timer for chunked bodies); the last
+    line is a summary. See vitals_stream.py.
+    """
+    state = get_vitals_state()
+    headers = route_headers(request)
+    # The body is read while the response streams
+    lines = body_lines(request.stream, request.content_length)
+    live = request.content_length is None
+    return Response(ingest_lines(state, lambda X: predict_matrix(X, **headers), lines, live),
+                    mimetype='application/x-ndjson')
+
+@app.route('/ingest/<patient_id>', methods=['GET'])
+def ingest_history(patient_id):
+    history = get_vitals_state().history(patient_id)
+    if history is None:
+        return jsonify({'error': 'unknown patient_id'}), 404
+    return jsonify(history)
+
+@app.route('/analytics', methods=['GET'])
+def feedback_analytics():
+    # Each poll only reads newly appended records
+    analytics = init_worker()["analytics"]
+    analytics.update()
+    return jsonify(analytics.summary())
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({'status': 'ok', 'pid': os.getpid(), 'model_loaded': _worker['pid'] == os.getpid()})
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    worker = init_worker()
+    models = worker['router'].stats()
+    primary = models['slots']['primary']
+    return jsonify({
+        'pid': worker['pid'],
+        'backend': primary['backend'],
+        'model_version': primary['version'],
+        'batcher': primary['batcher'],
+        'models': models,
+        'explanations': get_explanation_pipeline().stats(),
+        'stream': worker['vitals'].stats() if worker['vitals'] is not None else None,
+        'stages': stage_stats(),
+    })
+
+def metric_series(models):
+    """(counters, gauges) for the batcher, cache and reloads, exported next to the stage histograms"""
+    primary = models['slots']['primary']
+    batcher = primary['batcher'] or {}
+    cache = models.get('prediction_cache') or {}
+    counters = {
+        # Slot totals, not the current batcher's, which restart at 0 on every reload
+        'triage_batcher_requests_total': ('Rows scored by the primary micro-batchers', primary['requests_total']),
+        'triage_batcher_batches_total': ('Forward passes run by the primary micro-batchers', primary['batches_total']),
+        'triage_prediction_cache_hits_total': ('Prediction cache hits', cache.get('hits')),
+        'triage_prediction_cache_misses_total': ('Prediction cache misses', cache.get('misses')),
+        'triage_model_reloads_total': ('Primary model hot reloads', primary['reloads']),
+    }
+    gauges = {
+        'triage_batcher_pending': ('Rows waiting in the primary micro-batcher', batcher.get('pending')),
+        'triage_prediction_cache_entries': ('Prediction cache entries', cache.get('entries')),
+    }
+    return counters, gauges
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Per-process: each pre-fork worker reports its own series under its pid
+    worker = init_worker()
+    counters, gauges = metric_series(worker['router'].stats())
+    body = render_prometheus(gauges, labels={'pid': worker['pid']}, counters=counters)
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/profile', methods=['GET'])
+def debug_profile():
+    """Folded stacks for ?seconds=N (flamegraph.pl / speedscope); needs TRIAGE_PROFILER=1"""
+    if not PROFILER_ENABLED:
+        return jsonify({'error': 'profiler disabled (set TRIAGE_PROFILER=1)'}), 404
     try:
-        Xs = scaler.transform(X)
-    except Exception as e:
-        # fallback: try to reshape
-        Xs = X
-    prob = float(model.predict(Xs, verbose=0).ravel()[0])
-    return jsonify({'probability': prob})
+        seconds = float(request.args.get('seconds', 10))
+        hz = float(request.args.get('hz', PROFILE_DEFAULT_HZ))
+    except ValueError:
+        seconds = hz = float('nan')
+    if not (np.isfinite(seconds) and np.isfinite(hz)):
+        return jsonify({'error': 'seconds and hz must be numbers'}), 400
+    folded = profile(seconds, hz)
+    if folded is None:
+        return jsonify({'error': 'a profile is already running'}), 409
+    return Response(folded, mimetype='text/plain')
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    # Development server; use serve.py for multi-worker / ASGI serving
+    init_worker()
+    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
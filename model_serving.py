@@ -0,0 +1,422 @@
+import os
+import json
+import time
+import random
+import threading
+import zlib
+from concurrent.futures import Future
+
+import numpy as np
+
+from batcher import MicroBatcher
+from inference_backends import backend_artifacts, load_backend, resolve_backend
+from model_bundle import CURRENT_POINTER
+from model_manifest import MANIFEST_PATH
+from prediction_cache import open_prediction_cache
+from triage_rules import FEATURES, risk_band_index
+
+# =========================
+# Configuration
+# =========================
+
+# Longest a request waits for its row to be scored before failing
+PREDICT_TIMEOUT_S = float(os.environ.get("TRIAGE_PREDICT_TIMEOUT_S", "30"))
+
+# Seconds between artifact checks (0 disables hot reload)
+RELOAD_INTERVAL_S = float(os.environ.get("TRIAGE_RELOAD_INTERVAL_S", "5"))
+
+# Optional second model served side by side, from its own artifact directory
+CANARY_DIR = os.environ.get("TRIAGE_CANARY_DIR", "")
+CANARY_BACKEND = os.environ.get("TRIAGE_CANARY_BACKEND", "")
+CANARY_FRACTION = float(os.environ.get("TRIAGE_CANARY_FRACTION", "0.0"))
+# canary: that fraction of requests is answered by the canary
+# shadow: the primary answers; the canary scores the same rows off the response path
+CANARY_MODE = os.environ.get("TRIAGE_CANARY_MODE", "canary")
+
+PRIMARY, CANARY = "primary", "canary"
+
+# Backends whose artifacts main.py training writes before recording the
+# manifest. model_registry's rf/hgb models have no manifest run, so they
+# are watched (and versioned) through their own files; bundles through
+# their CURRENT pointer, which `model_bundle.py publish` also moves.
+MANIFEST_BACKENDS = ("keras", "tflite", "numpy")
+
+# =========================
+# Versioned Artifacts
+# =========================
+
+def watched_artifacts(backend_name, paths):
+    """Files whose change means a new version: a bundle's CURRENT pointer, else the artifacts"""
+    if backend_name == "bundle":
+        return {"current": os.path.join(paths["bundle_dir"], CURRENT_POINTER)}
+    return paths
+
+def artifact_fingerprint(paths, directory=None):
+    """(path, mtime, size) of every artifact plus the manifest"""
+    manifest = os.path.join(directory or "", os.path.basename(MANIFEST_PATH))
+    fingerprint = []
+    for path in sorted(paths.values()) + [manifest]:
+        try:
+            st = os.stat(path)
+            fingerprint.append((path, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            fingerprint.append((path, None, None))
+    return tuple(fingerprint)
+
+def reload_key(fingerprint, use_manifest=True):
+    """What must change to trigger a reload.
+
+    Training writes the manifest last, so when one exists (and the backend
+    is one main.py trains) it is the commit marker; otherwise any artifact
+    change counts.
+    """
+    manifest = fingerprint[-1]
+    if not use_manifest:
+        return fingerprint[:-1]
+    return manifest if manifest[1] is not None else fingerprint
+
+def artifact_version(fingerprint, directory=None, use_manifest=True):
+    """Manifest artifact_id when present and used, else a hash of the artifact stats"""
+    manifest = os.path.join(directory or "", os.path.basename(MANIFEST_PATH))
+    if not use_manifest:
+        return f"local-{zlib.crc32(repr(fingerprint[:-1]).encode()):08x}"
+    try:
+        with open(manifest, "r", encoding="utf-8") as f:
+            artifact_id = json.load(f).get("artifact_id")
+        if artifact_id:
+            return artifact_id
+    except (OSError, ValueError):
+        pass
+    return f"local-{zlib.crc32(repr(fingerprint).encode()):08x}"
+
+class ServedModel:
+    """One loaded model version: backend plus its own micro-batcher"""
+
+    def __init__(self, version, backend):
+        self.version = version
+        self.backend = backend
+        self.batcher = MicroBatcher(backend.predict, n_features=len(FEATURES))
+        self.loaded_at = time.time()
+
+    def close(self):
+        # Rejects new rows (submitters retry on the new version), then
+        # scores everything already queued on this one
+        self.batcher.close()
+
+# =========================
+# Hot-Swappable Model Slot
+# =========================
+
+class ModelSlot:
+    """A named deployment (primary or canary) whose model swaps in place.
+
+    Requests read `self.current` once, so a swap is a single reference
+    assignment, after which the old batcher is closed: rows it accepted
+    are still scored, and a request that raced with the swap onto the
+    closed batcher is rejected under its lock and retried on the new
+    version. A reload only happens when the
+    manifest (or, without one or for rf/hgb, any artifact) changed and then stayed
+    unchanged for one more check, so a half-written training run is
+    never loaded.
+    """
+
+    def __init__(self, name, backend_name=None, directory=None):
+        self.name = name
+        self.backend_name = resolve_backend(backend_name, directory)
+        self.directory = directory
+        self.paths = backend_artifacts(self.backend_name, directory)
+        self.watched = watched_artifacts(self.backend_name, self.paths)
+        self.use_manifest = self.backend_name in MANIFEST_BACKENDS
+        self.current = None
+        self._fingerprint = None
+        self._pending = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        # Rows / batches scored by retired versions, so the slot totals
+        # survive swaps; guarded by a lock that is never held across a load
+        self._totals_lock = threading.Lock()
+        self._retired_requests = 0
+        self._retired_batches = 0
+        self._retiring = None
+        # Called with the slot after a new version is swapped in
+        self.on_swap = None
+
+    def load(self, fingerprint=None):
+        """Load, warm up and swap in the current artifacts; returns the new version"""
+        with self._lock:
+            fingerprint = fingerprint or artifact_fingerprint(self.watched, self.directory)
+            version = artifact_version(fingerprint, self.directory, self.use_manifest)
+            print(f"[{os.getpid()}] Loading {self.name} model ({self.backend_name})...")
+            backend = load_backend(self.backend_name, **self.paths)
+            # Bundles carry their own artifact_id
+            version = getattr(backend, "version", None) or version
+            # Warm up: first call allocates tensors / traces the graph
+            backend.predict(np.zeros((1, len(FEATURES)), dtype=np.float32))
+            served = ServedModel(version, backend)
+            with self._totals_lock:
+                old, self.current = self.current, served
+                self._retiring = old
+            self._fingerprint = fingerprint
+            if old is not None:
+                self.reloads += 1
+                old.close()
+                # Closed batchers are drained, so their counts are final
+                retired = old.batcher.metrics.snapshot()
+                with self._totals_lock:
+                    self._retired_requests += retired["requests"]
+                    self._retired_batches += retired["batches"]
+                    self._retiring = None
+                if self.on_swap is not None:
+                    self.on_swap(self)
+            print(f"[{os.getpid()}] {self.name} model {version} ready.")
+            return self.current
+
+    def respawn(self):
+        """Fresh batcher in a forked child; fork-safe backends are reused"""
+        old = self.current
+        if old is not None and getattr(old.backend, "fork_safe", False):
+            self.current = ServedModel(old.version, old.backend)
+            self._lock = threading.Lock()
+            return self.current
+        self.current = None
+        self._lock = threading.Lock()
+        return self.load()
+
+    def reload_if_changed(self):
+        fingerprint = artifact_fingerprint(self.watched, self.directory)
+        if self._fingerprint is not None and (reload_key(fingerprint, self.use_manifest)
+                                              == reload_key(self._fingerprint, self.use_manifest)):
+            self._pending = None
+            return False
+        if fingerprint != self._pending:
+            # Changed since the last check; wait until it settles
+            self._pending = fingerprint
+            return False
+        self._pending = None
+        try:
+            self.load(fingerprint)
+        except Exception as e:
+            # Keep serving the old version; retry on the next change
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            self._fingerprint = fingerprint
+            print(f"⚠️  [{os.getpid()}] {self.name} reload failed: {self.last_error}")
+            return False
+        return True
+
+    def submit(self, row):
+        """(Future, version) for one row on the current version"""
+        for _ in range(3):
+            served = self.current
+            try:
+                return served.batcher.submit(row), served.version
+            except RuntimeError:
+                if served is self.current:
+                    raise
+        raise RuntimeError(f"{self.name} model is reloading; retry")
+
+    def predict(self, row):
+        future, version = self.submit(row)
+        return future.result(timeout=PREDICT_TIMEOUT_S), version
+
+    def predict_matrix(self, X):
+        served = self.current
+        return served.backend.predict(X), served.version
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+
+    def totals(self):
+        """(requests, batches) scored by this slot across every version it served"""
+        with self._totals_lock:
+            live = [s for s in (self.current, self._retiring) if s is not None]
+            requests, batches = self._retired_requests, self._retired_batches
+        for served in live:
+            snap = served.batcher.metrics.snapshot()
+            requests += snap["requests"]
+            batches += snap["batches"]
+        return requests, batches
+
+    def stats(self):
+        served = self.current
+        requests_total, batches_total = self.totals()
+        return {
+            "version": served.version if served else None,
+            "backend": self.backend_name,
+            "directory": self.directory or ".",
+            "loaded_at": served.loaded_at if served else None,
+            "reloads": self.reloads,
+            "reload_failures": self.failures,
+            "last_error": self.last_error,
+            "batcher": served.batcher.stats() if served else None,
+            "requests_total": requests_total,
+            "batches_total": batches_total,
+        }
+
+# =========================
+# Router (primary / canary / shadow)
+# =========================
+
+class ShadowStats:
+    """Running agreement between the primary and the shadow model"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compared = 0
+        self.abs_diff_total = 0.0
+        self.abs_diff_max = 0.0
+        self.band_disagreements = 0
+        self.errors = 0
+
+    def record(self, primary_prob, shadow_future):
+        try:
+            shadow_prob = shadow_future.result()
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            return
+        diff = abs(float(shadow_prob) - float(primary_prob))
+        disagree = risk_band_index(shadow_prob) != risk_band_index(primary_prob)
+        with self._lock:
+            self.compared += 1
+            self.abs_diff_total += diff
+            self.abs_diff_max = max(self.abs_diff_max, diff)
+            self.band_disagreements += int(disagree)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "compared": self.compared,
+                "mean_abs_diff": self.abs_diff_total / self.compared if self.compared else 0.0,
+                "max_abs_diff": self.abs_diff_max,
+                "band_disagreement_rate": self.band_disagreements / self.compared if self.compared else 0.0,
+                "errors": self.errors,
+            }
+
+class ModelRouter:
+    """Chooses the slot for each request and keeps every slot up to date"""
+
+    def __init__(self, slots, mode=CANARY_MODE, fraction=CANARY_FRACTION, reload_interval=RELOAD_INTERVAL_S,
+                 cache=None):
+        if mode not in ("canary", "shadow"):
+            raise ValueError(f"Unknown canary mode '{mode}'. Choose canary or shadow")
+        self.slots = slots
+        # Prediction cache shared by all slots (keys include the version)
+        self.cache = cache
+        for slot in slots.values():
+            slot.on_swap = self._on_swap
+        self.mode = mode
+        self.fraction = fraction
+        self.reload_interval = reload_interval
+        self.shadow_stats = ShadowStats()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    @classmethod
+    def from_env(cls):
+        slots = {PRIMARY: ModelSlot(PRIMARY)}
+        if CANARY_DIR:
+            slots[CANARY] = ModelSlot(CANARY, CANARY_BACKEND or None, CANARY_DIR)
+        return cls(slots, cache=open_prediction_cache())
+
+    def start(self):
+        for slot in self.slots.values():
+            if slot.current is None:
+                slot.load()
+        self._start_watcher()
+        return self
+
+    def respawn(self):
+        """Rebuild per-process state (batchers, watcher) after fork"""
+        for slot in self.slots.values():
+            slot.respawn()
+        self._stop = threading.Event()
+        self._start_watcher()
+        return self
+
+    def _start_watcher(self):
+        if self.reload_interval > 0:
+            self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            for slot in self.slots.values():
+                slot.reload_if_changed()
+
+    def choose(self, requested=None, route_key=None):
+        """Slot answering this request: explicit, sticky by key, or random"""
+        if requested in self.slots:
+            return self.slots[requested]
+        if CANARY not in self.slots or self.mode != "canary" or self.fraction <= 0:
+            return self.slots[PRIMARY]
+        if route_key:
+            u = zlib.crc32(str(route_key).encode()) / 2 ** 32
+        else:
+            u = random.random()
+        return self.slots[CANARY] if u < self.fraction else self.slots[PRIMARY]
+
+    def predict(self, row, requested=None, route_key=None):
+        """(probability, version) from the chosen slot; shadows the canary if configured"""
+        future, version = self.submit(row, requested, route_key)
+        return future.result(timeout=PREDICT_TIMEOUT_S), version
+
+    def submit(self, row, requested=None, route_key=None):
+        """(Future, version); cache hits resolve immediately"""
+        slot = self.choose(requested, route_key)
+        if self.cache is not None:
+            version = slot.current.version
+            prob = self.cache.get(row, version)
+            if prob is not None:
+                future = Future()
+                future.set_result(prob)
+                return future, version
+        future, version = slot.submit(row)
+        if self.cache is not None:
+            future.add_done_callback(lambda f: f.exception() or self.cache.put(row, version, f.result()))
+        if self._shadowing(slot):
+            future.add_done_callback(lambda f: f.exception() or self._shadow(slot, row, f.result()))
+        return future, version
+
+    def predict_matrix(self, X, requested=None, route_key=None):
+        slot = self.choose(requested, route_key)
+        if self.cache is None:
+            return slot.predict_matrix(X)
+        served = slot.current
+        return self.cache.predict_many(X, served.version, served.backend.predict), served.version
+
+    def _on_swap(self, slot):
+        if self.cache is not None:
+            self.cache.invalidate()
+
+    def _shadowing(self, slot):
+        return self.mode == "shadow" and slot.name == PRIMARY and CANARY in self.slots
+
+    def _shadow(self, slot, row, prob):
+        if not self._shadowing(slot):
+            return
+        try:
+            future, _ = self.slots[CANARY].submit(row)
+        except RuntimeError:
+            return
+        future.add_done_callback(lambda f: self.shadow_stats.record(prob, f))
+
+    def close(self):
+        self._stop.set()
+        for slot in self.slots.values():
+            slot.close()
+
+    def stats(self):
+        stats = {
+            "mode": self.mode if CANARY in self.slots else "single",
+            "canary_fraction": self.fraction,
+            "reload_interval_s": self.reload_interval,
+            "slots": {name: slot.stats() for name, slot in self.slots.items()},
+            "prediction_cache": self.cache.stats() if self.cache is not None else None,
+        }
+        if self.mode == "shadow" and CANARY in self.slots:
+            stats["shadow"] = self.shadow_stats.snapshot()
+        return stats
@@ -0,0 +1,136 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# =========================
+# Configuration
+# =========================
+
+# 0 disables the cache
+PREDICT_CACHE_SIZE = int(os.environ.get("TRIAGE_PREDICT_CACHE_SIZE", "4096"))
+PREDICT_CACHE_TTL_S = float(os.environ.get("TRIAGE_PREDICT_CACHE_TTL_S", "300"))
+# Round features to this many decimals before keying; empty keys on exact values
+_decimals = os.environ.get("TRIAGE_PREDICT_CACHE_DECIMALS", "")
+PREDICT_CACHE_DECIMALS = int(_decimals) if _decimals else None
+
+# =========================
+# Prediction Cache
+# =========================
+
+class PredictionCache:
+    """Bounded LRU with TTL for risk probabilities.
+
+    Keys are the float32 feature vector (optionally rounded) plus the model
+    version, so a reloaded model never serves another version's scores;
+    invalidate() also frees the old entries on reload. With rounding,
+    patients whose vitals differ below the rounding step share a score.
+    """
+
+    def __init__(self, max_entries=PREDICT_CACHE_SIZE, ttl_s=PREDICT_CACHE_TTL_S,
+                 decimals=PREDICT_CACHE_DECIMALS):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.decimals = decimals
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def key(self, row, version):
+        row = np.asarray(row, dtype=np.float32)
+        if self.decimals is not None:
+            row = np.round(row, self.decimals)
+        return version, row.tobytes()
+
+    def get(self, row, version):
+        """Cached probability or None"""
+        key = self.key(row, version)
+        now = time.monotonic()
+        with self._lock:
+            return self._get_locked(key, now)
+
+    def put(self, row, version, prob):
+        key = self.key(row, version)
+        now = time.monotonic()
+        with self._lock:
+            self._store_locked(key, float(prob), now)
+
+    def get_many(self, X, version):
+        """(probs with NaN for misses, miss mask) for a feature matrix"""
+        keys = [self.key(row, version) for row in np.asarray(X, dtype=np.float32)]
+        probs = np.full(len(keys), np.nan)
+        now = time.monotonic()
+        with self._lock:
+            for i, key in enumerate(keys):
+                prob = self._get_locked(key, now)
+                if prob is not None:
+                    probs[i] = prob
+        return probs, np.isnan(probs)
+
+    def put_many(self, X, version, probs):
+        now = time.monotonic()
+        entries = [(self.key(row, version), float(p)) for row, p in zip(np.asarray(X, dtype=np.float32), probs)]
+        with self._lock:
+            for key, prob in entries:
+                self._store_locked(key, prob, now)
+
+    def predict(self, row, version, predict_fn):
+        """Cached probability, else predict_fn(row) stored under `version`"""
+        prob = self.get(row, version)
+        if prob is None:
+            prob = float(predict_fn(row))
+            self.put(row, version, prob)
+        return prob
+
+    def predict_many(self, X, version, predict_fn):
+        """Probabilities for a matrix; predict_fn only sees the missing rows"""
+        X = np.asarray(X, dtype=np.float32)
+        probs, missing = self.get_many(X, version)
+        if missing.any():
+            probs[missing] = predict_fn(X[missing])
+            self.put_many(X[missing], version, probs[missing])
+        return probs
+
+    def _get_locked(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None:
+            prob, created = entry
+            if now - created <= self.ttl_s:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return prob
+            del self._entries[key]
+            self.counters["expirations"] += 1
+        self.counters["misses"] += 1
+        return None
+
+    def _store_locked(self, key, prob, created):
+        self._entries[key] = (prob, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def invalidate(self):
+        """Drop every entry (called when a model is reloaded)"""
+        with self._lock:
+            self._entries.clear()
+            self.counters["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(
+                self.counters,
+                entries=len(self._entries),
+                max_entries=self.max_entries,
+                ttl_s=self.ttl_s,
+                decimals=self.decimals,
+                hit_ratio=self.counters["hits"] / lookups if lookups else 0.0,
+            )
+
+def open_prediction_cache(max_entries=PREDICT_CACHE_SIZE, **kwargs):
+    """PredictionCache, or None when disabled (size 0)"""
+    return PredictionCache(max_entries, **kwargs) if max_entries > 0 else None
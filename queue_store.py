@@ -0,0 +1,167 @@
+import os
+import copy
+import threading
+
+# =========================
+# Configuration
+# =========================
+
+# "memory" (local stand-in) or "firestore" / "firestore:<project>" (needs google-cloud-firestore)
+QUEUE_DB = os.environ.get("TRIAGE_QUEUE_DB", "memory")
+QUEUE_COLLECTION = "queue"
+
+# Firestore rejects write batches above 500 operations
+MAX_BATCH_WRITES = 500
+
+# =========================
+# In-Memory Firestore Stand-In
+# =========================
+# Implements the subset of the google-cloud-firestore client the queue
+# service uses (collection/document refs, set/update/delete, write
+# batches, stream and on_snapshot listeners), so the service and the
+# Flutter-facing document layout can be exercised without a project.
+
+class DocumentSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+class DocumentChange:
+    """One change delivered to on_snapshot listeners (type ADDED/MODIFIED/REMOVED)"""
+
+    def __init__(self, change_type, document):
+        self.type = change_type
+        self.document = document
+
+def _apply_update(data, fields):
+    """Firestore-style update: dotted keys address nested maps"""
+    for path, value in fields.items():
+        target = data
+        *parents, leaf = path.split(".")
+        for key in parents:
+            target = target.setdefault(key, {})
+        target[leaf] = value
+
+class DocumentReference:
+    def __init__(self, collection, doc_id):
+        self.collection = collection
+        self.id = doc_id
+
+    def set(self, data, merge=False):
+        self.collection._commit([("set", self.id, data, merge)])
+
+    def update(self, fields):
+        self.collection._commit([("update", self.id, fields, False)])
+
+    def delete(self):
+        self.collection._commit([("delete", self.id, None, False)])
+
+    def get(self):
+        with self.collection._lock:
+            return DocumentSnapshot(self.id, copy.deepcopy(self.collection._docs.get(self.id)))
+
+class CollectionReference:
+    def __init__(self, name):
+        self.name = name
+        self._docs = {}
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def document(self, doc_id):
+        return DocumentReference(self, str(doc_id))
+
+    def stream(self):
+        with self._lock:
+            docs = [DocumentSnapshot(k, copy.deepcopy(v)) for k, v in self._docs.items()]
+        return iter(docs)
+
+    def on_snapshot(self, callback):
+        """callback(docs, changes, read_time) after every committed write; returns an unsubscribe function"""
+        with self._lock:
+            self._listeners.append(callback)
+        return lambda: self._listeners.remove(callback)
+
+    def _commit(self, writes):
+        changes = []
+        with self._lock:
+            for op, doc_id, data, merge in writes:
+                exists = doc_id in self._docs
+                if op == "delete":
+                    if exists:
+                        del self._docs[doc_id]
+                        changes.append(DocumentChange("REMOVED", DocumentSnapshot(doc_id, None)))
+                    continue
+                if op == "update":
+                    if not exists:
+                        raise KeyError(f"No document to update: {self.name}/{doc_id}")
+                    _apply_update(self._docs[doc_id], copy.deepcopy(data))
+                elif merge and exists:
+                    _apply_update(self._docs[doc_id], copy.deepcopy(data))
+                else:
+                    self._docs[doc_id] = copy.deepcopy(data)
+                changes.append(DocumentChange("MODIFIED" if exists else "ADDED",
+                                              DocumentSnapshot(doc_id, self._docs[doc_id])))
+            listeners = list(self._listeners)
+        if changes:
+            for callback in listeners:
+                callback(None, changes, None)
+
+class WriteBatch:
+    """Buffered writes applied atomically per collection on commit()"""
+
+    def __init__(self):
+        self._writes = []
+
+    def set(self, ref, data, merge=False):
+        self._writes.append((ref.collection, ("set", ref.id, data, merge)))
+
+    def update(self, ref, fields):
+        self._writes.append((ref.collection, ("update", ref.id, fields, False)))
+
+    def delete(self, ref):
+        self._writes.append((ref.collection, ("delete", ref.id, None, False)))
+
+    def commit(self):
+        by_collection = {}
+        for collection, write in self._writes:
+            by_collection.setdefault(id(collection), (collection, []))[1].append(write)
+        for collection, writes in by_collection.values():
+            collection._commit(writes)
+        self._writes = []
+
+class InMemoryFirestore:
+    """Process-local stand-in for google.cloud.firestore.Client"""
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def collection(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = CollectionReference(name)
+            return self._collections[name]
+
+    def batch(self):
+        return WriteBatch()
+
+def open_queue_db(spec=None):
+    """Client for the queue documents: "memory" or "firestore[:project]" """
+    spec = spec or QUEUE_DB
+    kind, _, project = spec.partition(":")
+    if kind == "memory":
+        return InMemoryFirestore()
+    if kind == "firestore":
+        try:
+            from google.cloud import firestore
+        except ImportError as e:
+            raise ImportError("TRIAGE_QUEUE_DB=firestore requires google-cloud-firestore") from e
+        return firestore.Client(project=project or None)
+    raise ValueError(f"Unknown queue database '{kind}'. Choose memory or firestore")
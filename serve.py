@@ -0,0 +1,193 @@
+"""Production launcher for the triage model server.
+
+WSGI mode (default) binds one listening socket and forks N workers; each
+worker imports model_server after fork, loads the model, and serves
+with a threaded werkzeug server on the shared socket. Crashed workers are
+respawned. ASGI mode runs asgi_server:app under uvicorn's workers.
+
+SIGTERM / Ctrl-C shut down gracefully: workers stop accepting
+connections, finish in-flight requests, and drain the micro-batcher and
+explanation pipeline, up to --graceful-timeout seconds.
+
+    python serve.py --workers 4 --port 5000 [--asgi] [--intra-op 2] [--preload]
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+import threading
+
+SERVE_WORKERS = int(os.environ.get("TRIAGE_SERVE_WORKERS", "0")) or os.cpu_count() or 1
+GRACEFUL_TIMEOUT_S = 30.0
+
+# A worker exiting within RAPID_EXIT_S of its start is respawned after an
+# exponential backoff; after MAX_RAPID_EXITS such exits in a row the server
+# gives up and exits non-zero instead of fork-looping on a bad artifact
+RAPID_EXIT_S = 10.0
+RESPAWN_BACKOFF_S = 0.5
+RESPAWN_BACKOFF_MAX_S = 30.0
+MAX_RAPID_EXITS = int(os.environ.get("TRIAGE_SERVE_MAX_RAPID_EXITS", "5"))
+
+def configure_threads(workers, intra_op=0, inter_op=0):
+    """Split the cores between workers; must run before numpy/TF are imported"""
+    intra_op = intra_op or max(1, (os.cpu_count() or 1) // workers)
+    inter_op = inter_op or 1
+    os.environ["TRIAGE_INTRA_OP_THREADS"] = str(intra_op)
+    os.environ["TRIAGE_INTER_OP_THREADS"] = str(inter_op)
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, str(intra_op))
+    return intra_op, inter_op
+
+# =========================
+# WSGI Pre-fork
+# =========================
+
+def _worker_main(sock, access_log=False):
+    # The parent coordinates Ctrl-C for the whole process group. SIGTERM is
+    # blocked before any thread starts (threads inherit the mask) and is
+    # consumed with sigwait, so no handler runs while a lock is held.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM})
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    import model_server
+
+    class RequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            if access_log:
+                super().log_request(*args, **kwargs)
+
+    model_server.init_worker()
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, model_server.app, threaded=True, fd=sock.fileno(),
+                         request_handler=RequestHandler)
+    # Non-daemon request threads so server_close() waits for in-flight requests
+    server.daemon_threads = False
+
+    serving = threading.Thread(target=server.serve_forever, name="serve", daemon=True)
+    serving.start()
+    signal.sigwait({signal.SIGTERM})
+
+    server.shutdown()
+    serving.join()
+    server.server_close()
+    model_server.shutdown_worker()
+
+def _spawn(sock, access_log=False):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _worker_main(sock, access_log)
+        except BaseException as e:
+            print(f"[{os.getpid()}] worker failed: {e}", file=sys.stderr)
+            code = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+    return pid
+
+def run_prefork(host, port, workers, graceful_timeout=GRACEFUL_TIMEOUT_S, preload=False, access_log=False):
+    """Fork `workers` processes sharing one listening socket; returns the exit status"""
+    if preload:
+        # Only fork-safe backends (numpy, bundle) are reused by the workers
+        import model_server
+        model_server.init_worker()
+
+    sock = socket.create_server((host, port), backlog=2048)
+    sock.set_inheritable(True)
+    print(f"🚀 Serving on http://{host}:{port} with {workers} workers (pid {os.getpid()})")
+
+    stopping = []
+
+    def request_stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    # pid -> (slot, start time); a slot's failures only count rapid exits in a row
+    children = {_spawn(sock, access_log): (slot, time.monotonic()) for slot in range(workers)}
+    rapid_exits = [0] * workers
+    respawn_at = {}
+    exit_code = 0
+    while not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid, status = 0, 0
+        now = time.monotonic()
+        if pid and pid in children:
+            slot, started = children.pop(pid)
+            rapid_exits[slot] = rapid_exits[slot] + 1 if now - started < RAPID_EXIT_S else 0
+            if rapid_exits[slot] >= MAX_RAPID_EXITS:
+                print(f"❌ Worker {pid} exited ({status}); slot {slot} failed {rapid_exits[slot]} times in a row "
+                      f"within {RAPID_EXIT_S:.0f}s of starting, giving up", file=sys.stderr)
+                exit_code = 1
+                break
+            delay = 0.0
+            if rapid_exits[slot]:
+                delay = min(RESPAWN_BACKOFF_S * 2 ** (rapid_exits[slot] - 1), RESPAWN_BACKOFF_MAX_S)
+            print(f"⚠️  Worker {pid} exited ({status}); respawning" + (f" in {delay:.1f}s" if delay else ""))
+            respawn_at[slot] = now + delay
+        for slot, at in list(respawn_at.items()):
+            if at <= now:
+                del respawn_at[slot]
+                children[_spawn(sock, access_log)] = (slot, time.monotonic())
+        if not pid:
+            time.sleep(min([0.5] + [max(at - now, 0.01) for at in respawn_at.values()]))
+
+    print("🛑 Shutting down workers...")
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.monotonic() + graceful_timeout
+    while children and time.monotonic() < deadline:
+        pid, _ = os.waitpid(-1, os.WNOHANG)
+        if pid:
+            children.pop(pid, None)
+        else:
+            time.sleep(0.1)
+    for pid in children:
+        print(f"⚠️  Worker {pid} did not stop in {graceful_timeout:.0f}s; killing")
+        os.kill(pid, signal.SIGKILL)
+    sock.close()
+    return exit_code
+
+# =========================
+# ASGI
+# =========================
+
+def run_asgi(host, port, workers, graceful_timeout=GRACEFUL_TIMEOUT_S):
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("ASGI mode needs uvicorn (pip install uvicorn asgiref)")
+    uvicorn.run("asgi_server:app", host=host, port=port, workers=workers, lifespan="on",
+                timeout_graceful_shutdown=graceful_timeout, log_level="warning")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-worker triage model server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--asgi", action="store_true", help="serve asgi_server:app with uvicorn")
+    parser.add_argument("--intra-op", type=int, default=0, help="threads per op (default cores / workers)")
+    parser.add_argument("--inter-op", type=int, default=0, help="concurrent ops per worker (default 1)")
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT_S)
+    parser.add_argument("--preload", action="store_true",
+                        help="load a fork-safe backend (numpy, bundle) once before forking")
+    parser.add_argument("--access-log", action="store_true", help="log every request (WSGI mode)")
+    args = parser.parse_args()
+
+    intra_op, inter_op = configure_threads(args.workers, args.intra_op, args.inter_op)
+    print(f"⚙️  {args.workers} workers x {intra_op} intra-op / {inter_op} inter-op threads")
+    if args.asgi:
+        run_asgi(args.host, args.port, args.workers, args.graceful_timeout)
+    else:
+        sys.exit(run_prefork(args.host, args.port, args.workers, args.graceful_timeout, args.preload,
+                             args.access_log))
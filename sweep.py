@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import random
+import argparse
+import itertools
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+
+from triage_rules import CRITICAL_THRESHOLD
+
+# =========================
+# Configuration
+# =========================
+
+SWEEP_DIR = "sweep_runs"
+LEADERBOARD_PATH = "sweep_leaderboard.json"
+SWEEP_WORKERS = int(os.environ.get("TRIAGE_SWEEP_WORKERS", "0")) or os.cpu_count() or 1
+SWEEP_TRIALS = 12
+SWEEP_EPOCHS = 100
+# Fraction of the training part held out to rank trials; the test part
+# only scores the winner
+SWEEP_VALIDATION = 0.2
+
+# Production architecture (build_enhanced_model defaults); always trial 0
+BASELINE_CONFIG = {
+    "units": [128, 64, 32],
+    "dropout": 0.3,
+    "l2": 0.001,
+    "learning_rate": 0.001,
+    "batch_size": 32,
+}
+
+SEARCH_SPACE = {
+    "units": [[128, 64, 32], [64, 32, 16], [256, 128, 64], [128, 64]],
+    "dropout": [0.2, 0.3, 0.4],
+    "l2": [0.0001, 0.001, 0.01],
+    "learning_rate": [0.0003, 0.001, 0.003],
+    "batch_size": [32, 128],
+}
+
+# =========================
+# Search Space
+# =========================
+
+def grid_configs(space=SEARCH_SPACE):
+    """Every combination in the search space"""
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[k] for k in keys))]
+
+def random_configs(n, space=SEARCH_SPACE, seed=42):
+    """n distinct configurations drawn from the grid, baseline first"""
+    grid = [c for c in grid_configs(space) if c != BASELINE_CONFIG]
+    picked = random.Random(seed).sample(grid, min(max(n - 1, 0), len(grid)))
+    return [dict(BASELINE_CONFIG)] + picked
+
+def model_kwargs(config):
+    """build_enhanced_model keyword arguments for a sweep configuration.
+
+    The first hidden layer gets `dropout`, the others 0.1 less, matching
+    the production 0.3 / 0.2 / 0.2 schedule.
+    """
+    units = tuple(config["units"])
+    later = round(max(config["dropout"] - 0.1, 0.0), 2)
+    return {
+        "units": units,
+        "dropouts": (config["dropout"],) + (later,) * (len(units) - 1),
+        "l2": config["l2"],
+        "learning_rate": config["learning_rate"],
+    }
+
+# =========================
+# Shared Data (memory-mapped .npy)
+# =========================
+
+DATA_ARRAYS = ("X_train", "X_val", "X_test", "y_train", "y_val", "y_test")
+
+def write_shared_arrays(data_dir, retrain=False, validation_size=SWEEP_VALIDATION):
+    """Prepare the scaled train/validation/test split once and store it as .npy files.
+
+    Workers open the files with mmap_mode='r', so every process shares
+    the same page-cache copy instead of receiving a pickled array.
+    Returns the fitted scaler.
+    """
+    import joblib
+    from main import prepare_training_arrays
+
+    os.makedirs(data_dir, exist_ok=True)
+    X_train, X_val, X_test, y_train, y_val, y_test, scaler = prepare_training_arrays(retrain, validation_size)
+    arrays = {"X_train": X_train, "X_val": X_val, "X_test": X_test,
+              "y_train": y_train, "y_val": y_val, "y_test": y_test}
+    for name in DATA_ARRAYS:
+        np.save(os.path.join(data_dir, f"{name}.npy"), np.ascontiguousarray(arrays[name], dtype=np.float32))
+    joblib.dump(scaler, os.path.join(data_dir, "scaler.pkl"))
+    print(f"📦 Shared arrays written to {data_dir} "
+          f"({len(X_train)} train / {len(X_val)} validation / {len(X_test)} test rows)")
+    return scaler
+
+def load_shared_arrays(data_dir):
+    return {name: np.load(os.path.join(data_dir, f"{name}.npy"), mmap_mode="r") for name in DATA_ARRAYS}
+
+# =========================
+# Worker Process
+# =========================
+
+def _init_worker(intra_op_threads):
+    """Pin each worker to its own slice of the cores before TF starts"""
+    os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
+    os.environ["OMP_NUM_THREADS"] = str(intra_op_threads)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+def run_trial(trial):
+    """Train one configuration; returns a leaderboard row (never raises)"""
+    result = {"trial": trial["trial"], "config": trial["config"]}
+    try:
+        result.update(_train_trial(trial))
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+def _train_trial(trial):
+    import tensorflow as tf
+    from main import balanced_class_weights, build_enhanced_model, export_to_tflite, training_callbacks
+
+    tf.keras.utils.set_random_seed(trial["seed"])
+    data = load_shared_arrays(trial["data_dir"])
+    trial_dir = trial["trial_dir"]
+    os.makedirs(trial_dir, exist_ok=True)
+    model_path = os.path.join(trial_dir, "model.keras")
+
+    model = build_enhanced_model(data["X_train"].shape[1], **model_kwargs(trial["config"]))
+    start = time.perf_counter()
+    history = model.fit(
+        data["X_train"], data["y_train"],
+        validation_split=0.2,
+        epochs=trial["epochs"],
+        batch_size=trial["config"]["batch_size"],
+        class_weight=balanced_class_weights(np.asarray(data["y_train"])),
+        callbacks=training_callbacks(model_path),
+        verbose=0
+    )
+    train_time = time.perf_counter() - start
+    # EarlyStopping restored the best weights; overwrite the last checkpoint with them
+    model.save(model_path)
+
+    tflite_path = export_to_tflite(model, os.path.join(trial_dir, "model.tflite"))
+
+    # Trials are ranked on validation rows; the test split is kept for the winner
+    return {
+        **score_split(model, data["X_val"], data["y_val"], "val"),
+        "train_time_s": round(train_time, 2),
+        "epochs_run": len(history.history["loss"]),
+        "tflite_kb": round(os.path.getsize(tflite_path) / 1024, 2),
+        "model_path": model_path,
+    }
+
+# =========================
+# Sweep Driver
+# =========================
+
+def score_split(model, X, y, prefix):
+    """{prefix_auc, prefix_recall_at_critical} for a Keras model on one split"""
+    from sklearn.metrics import roc_auc_score
+
+    y = np.asarray(y)
+    probs = model.predict(X, batch_size=4096, verbose=0).ravel()
+    positives = y >= 0.5
+    return {
+        f"{prefix}_auc": float(roc_auc_score(y, probs)),
+        f"{prefix}_recall_at_critical": float(np.mean(probs[positives] >= CRITICAL_THRESHOLD)) if positives.any() else None,
+    }
+
+def score_winner(row, data_dir):
+    """Test-split metrics for the selected trial only"""
+    import tensorflow as tf
+
+    data = load_shared_arrays(data_dir)
+    model = tf.keras.models.load_model(row["model_path"])
+    return score_split(model, data["X_test"], data["y_test"], "test")
+
+def _rank_key(row):
+    if "error" in row:
+        return (1, 0.0, 0.0, 0.0)
+    return (0, -row["val_auc"], -(row["val_recall_at_critical"] or 0.0), row["train_time_s"])
+
+def write_leaderboard(results, path=LEADERBOARD_PATH, **details):
+    """Rank by validation AUC, then validation recall at the critical threshold, then training time"""
+    ranked = sorted(results, key=_rank_key)
+    board = {"created": datetime.utcnow().isoformat(), **details, "trials": ranked}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(board, f, indent=2)
+    os.replace(tmp_path, path)
+    return ranked
+
+def print_leaderboard(ranked, top=10):
+    print(f"\n{'='*60}")
+    print("🏆 Sweep Leaderboard")
+    print(f"{'='*60}\n")
+    print(f"  {'#':>3} {'ValAUC':>7} {'Rec@crit':>9} {'Time(s)':>8} {'TFLite':>8}  Config")
+    for rank, row in enumerate(ranked[:top], 1):
+        if "error" in row:
+            print(f"  {rank:>3} {'failed':>7}  trial {row['trial']}: {row['error']}")
+            continue
+        recall = f"{row['val_recall_at_critical']:.3f}" if row["val_recall_at_critical"] is not None else "n/a"
+        print(f"  {rank:>3} {row['val_auc']:>7.4f} {recall:>9} {row['train_time_s']:>8.1f} "
+              f"{row['tflite_kb']:>6.1f}KB  {row['config']}")
+
+def promote(row, data_dir, retrain=False):
+    """Make a trial's model the production artifact set (MODEL_PATH etc.)"""
+    import joblib
+    import tensorflow as tf
+    from main import MODEL_VERSION, get_feedback_store, save_model_artifacts
+    from model_manifest import record_training_run
+
+    model = tf.keras.models.load_model(row["model_path"])
+    scaler = joblib.load(os.path.join(data_dir, "scaler.pkl"))
+    bundle = save_model_artifacts(model, scaler)
+    record_training_run(
+        MODEL_VERSION, "sweep",
+        get_feedback_store().latest_timestamp() if retrain else None,
+        bundle=bundle,
+        config=row["config"],
+        val_auc=row["val_auc"],
+        test_auc=row["test_auc"],
+        recall_at_critical=row["test_recall_at_critical"]
+    )
+
+def run_sweep(trials=SWEEP_TRIALS, grid=False, workers=SWEEP_WORKERS, epochs=SWEEP_EPOCHS,
+              retrain=False, promote_winner=True, seed=42, sweep_dir=SWEEP_DIR,
+              leaderboard_path=LEADERBOARD_PATH):
+    """Train many configurations in a process pool and promote the best.
+
+    The scaled split is prepared once and memory-mapped by every worker;
+    each worker gets cpu_count // workers intra-op threads so trials do
+    not oversubscribe the cores.
+    """
+    configs = grid_configs() if grid else random_configs(trials, seed=seed)
+    workers = max(1, min(workers, len(configs)))
+    intra_op_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    print(f"\n{'='*60}")
+    print(f"🔬 Sweep: {len(configs)} configurations on {workers} workers x {intra_op_threads} threads")
+    print(f"{'='*60}\n")
+
+    data_dir = os.path.join(sweep_dir, "data")
+    write_shared_arrays(data_dir, retrain)
+
+    jobs = [
+        {
+            "trial": i,
+            "config": config,
+            "seed": seed + i,
+            "epochs": epochs,
+            "data_dir": data_dir,
+            "trial_dir": os.path.join(sweep_dir, f"trial_{i:03d}"),
+        }
+        for i, config in enumerate(configs)
+    ]
+
+    results = []
+    # spawn: TensorFlow is not fork-safe, and workers must set threads before importing it
+    context = mp.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(intra_op_threads,)) as pool:
+        futures = [pool.submit(run_trial, job) for job in jobs]
+        for future in as_completed(futures):
+            row = future.result()
+            results.append(row)
+            status = f"validation AUC {row['val_auc']:.4f}" if "error" not in row else f"failed ({row['error']})"
+            print(f"  [{len(results)}/{len(jobs)}] trial {row['trial']}: {status}")
+
+    ranked = sorted(results, key=_rank_key)
+    winner = ranked[0] if ranked and "error" not in ranked[0] else None
+    if winner is not None:
+        winner.update(score_winner(winner, data_dir))
+    ranked = write_leaderboard(results, leaderboard_path, epochs=epochs, workers=workers,
+                               intra_op_threads=intra_op_threads, retrain=retrain)
+    print_leaderboard(ranked)
+    print(f"\n✅ Leaderboard written to {leaderboard_path}")
+
+    if winner is None:
+        print("❌ No trial finished successfully; nothing promoted")
+    elif promote_winner:
+        print(f"\n🚀 Promoting trial {winner['trial']}: {winner['config']} (test AUC {winner['test_auc']:.4f})")
+        promote(winner, data_dir, retrain)
+    return ranked
+
+def parse_sweep_args(argv):
+    """Keyword arguments for run_sweep from `main.py sweep ...` arguments"""
+    parser = argparse.ArgumentParser(prog="main.py sweep", description="Parallel hyperparameter sweep")
+    parser.add_argument("--trials", type=int, default=SWEEP_TRIALS, help="random configurations (incl. baseline)")
+    parser.add_argument("--grid", action="store_true", help="run the full grid instead of a random sample")
+    parser.add_argument("--workers", type=int, default=SWEEP_WORKERS, help="worker processes")
+    parser.add_argument("--epochs", type=int, default=SWEEP_EPOCHS, help="max epochs per trial (early stopping applies)")
+    parser.add_argument("--retrain", action="store_true", help="include clinician feedback in the data")
+    parser.add_argument("--no-promote", dest="promote_winner", action="store_false",
+                        help="only write the leaderboard")
+    parser.add_argument("--seed", type=int, default=42)
+    return vars(parser.parse_args(argv))
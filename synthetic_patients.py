@@ -0,0 +1,338 @@
+"""Seeded synthetic patient generator for training, feedback and load tests.
+
+    python synthetic_patients.py csv patients.csv --rows 5000000 [--seed 0]
+    python synthetic_patients.py parquet patients.parquet --rows 5000000
+    python synthetic_patients.py feedback sqlite:/tmp/feedback.db --rows 1000000
+    python synthetic_patients.py load --url http://127.0.0.1:5000 --rows 200000 [--batch-size 256] [--binary]
+"""
+import os
+import sys
+import time
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from triage_rules import FEATURES, MODERATE_THRESHOLD, SIGNAL_RULES, decision_band, risk_levels
+
+# =========================
+# Configuration
+# =========================
+
+CHUNK_ROWS = int(os.environ.get("TRIAGE_SYNTH_CHUNK_ROWS", "100000"))
+
+# Presenting scenarios: (complaint_encoded, share of arrivals). Complaint
+# codes follow triage_rules.COMPLAINT_CATEGORIES.
+SCENARIOS = {
+    "general": (0, 0.40),
+    "respiratory": (1, 0.20),
+    "cardiac": (2, 0.20),
+    "trauma": (3, 0.20),
+}
+
+# Per scenario: age mean/sd, latent severity Beta(a, b), and how severity
+# moves heart rate, SpO2, temperature and pain
+SCENARIO_PARAMS = {
+    #              age        severity    hr   spo2  temp  pain (base, per severity)
+    "general":     ((45, 20), (1.5, 6.0), 45,  3.0,  1.2,  (1.0, 4.0)),
+    "respiratory": ((55, 20), (2.5, 3.0), 50, 14.0,  2.2,  (2.0, 4.0)),
+    "cardiac":     ((64, 12), (2.5, 3.0), 60,  8.0,  0.6,  (4.0, 6.0)),
+    "trauma":      ((38, 17), (2.5, 3.0), 55,  6.0,  0.4,  (5.0, 5.0)),
+}
+
+# Share of presented patients a clinician reviews, and how often a
+# reviewing clinician escalates one band beyond their own read
+REVIEW_RATE = 0.8
+ESCALATION_RATE = 0.05
+CLINICIAN_DECISIONS = ("LOW", "MODERATE", "HIGH RISK", "CRITICAL")
+
+_COL = {k: j for j, k in enumerate(FEATURES)}
+INTEGER_FEATURES = ["age", "heart_rate", "oxygen", "pain_scale", "waiting_time", "complaint_encoded"]
+
+# =========================
+# Vectorized Generator
+# =========================
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+def _patients(rng, n):
+    """(X, severity, scenario index) for n patients drawn from the scenario mix"""
+    names = list(SCENARIOS)
+    shares = np.array([SCENARIOS[s][1] for s in names])
+    scenario = rng.choice(len(names), size=n, p=shares / shares.sum())
+
+    X = np.empty((n, len(FEATURES)), dtype=np.float64)
+    severity = np.empty(n)
+    hr_gain, spo2_gain, temp_gain = np.empty(n), np.empty(n), np.empty(n)
+    pain_base, pain_gain = np.empty(n), np.empty(n)
+    for i, name in enumerate(names):
+        idx = np.flatnonzero(scenario == i)
+        (age_mu, age_sd), (a, b), hr, spo2, temp, (p0, p1) = SCENARIO_PARAMS[name]
+        X[idx, _COL["age"]] = rng.normal(age_mu, age_sd, len(idx))
+        X[idx, _COL["complaint_encoded"]] = SCENARIOS[name][0]
+        severity[idx] = rng.beta(a, b, len(idx))
+        hr_gain[idx], spo2_gain[idx], temp_gain[idx] = hr, spo2, temp
+        pain_base[idx], pain_gain[idx] = p0, p1
+
+    age = np.clip(np.round(X[:, _COL["age"]]), 1, 95)
+    X[:, _COL["age"]] = age
+    # Sicker patients are faster, more hypoxic and warmer; older ones desaturate more
+    X[:, _COL["heart_rate"]] = 72 + hr_gain * severity + rng.normal(0, 9, n)
+    # A few older patients present bradycardic instead
+    brady = rng.random(n) < 0.03 * (age >= 65)
+    X[brady, _COL["heart_rate"]] = rng.normal(46, 4, int(brady.sum()))
+    X[:, _COL["oxygen"]] = 98.5 - spo2_gain * severity - 0.03 * np.maximum(age - 40, 0) + rng.normal(0, 1.2, n)
+    X[:, _COL["temperature"]] = 36.8 + temp_gain * severity + rng.normal(0, 0.35, n)
+    X[:, _COL["pain_scale"]] = pain_base + pain_gain * severity + rng.normal(0, 1.0, n)
+    # Sicker patients are seen sooner
+    X[:, _COL["waiting_time"]] = rng.gamma(2.0, 30.0 * (1.0 - 0.6 * severity))
+
+    for k, (lo, hi) in (("heart_rate", (30, 200)), ("oxygen", (60, 100)), ("temperature", (34.0, 42.0)),
+                        ("pain_scale", (0, 10)), ("waiting_time", (0, 240))):
+        X[:, _COL[k]] = np.clip(X[:, _COL[k]], lo, hi)
+    for k in INTEGER_FEATURES:
+        X[:, _COL[k]] = np.round(X[:, _COL[k]])
+    X[:, _COL["temperature"]] = np.round(X[:, _COL["temperature"]], 1)
+    return X, severity, scenario
+
+def _risk(X, severity, rules=None):
+    """True risk probability, driven by the same signal rules extract_signals uses"""
+    rules = rules or SIGNAL_RULES
+    masks, critical_counts = rules.evaluate(X)
+    masks = masks.astype(np.uint64)
+    n_signals = np.zeros(len(X), dtype=np.int64)
+    for i in range(len(rules.rules)):
+        n_signals += ((masks >> np.uint64(i)) & np.uint64(1)).astype(np.int64)
+    z = -4.0 + 3.5 * severity + 0.8 * (n_signals - critical_counts) + 2.5 * critical_counts
+    return _sigmoid(z), critical_counts
+
+class SyntheticPatients:
+    """Deterministic stream of synthetic patients in fixed-size chunks.
+
+    Chunk i is drawn from its own generator seeded with (seed, i), so a run
+    is reproducible for a given (seed, chunk_rows) and any chunk can be
+    regenerated on its own. Labels are 1 for every patient with a critical
+    signal from triage_rules and otherwise Bernoulli draws of a risk score
+    built from the signal counts and the latent severity.
+    """
+
+    def __init__(self, seed=0, chunk_rows=CHUNK_ROWS, rules=None):
+        self.seed = seed
+        self.chunk_rows = max(1, chunk_rows)
+        self.rules = rules or SIGNAL_RULES
+
+    def chunk(self, index, n=None):
+        """dict of X (n, 7) float64, label, risk, critical_count for chunk `index`"""
+        rng = np.random.default_rng([self.seed, index])
+        n = self.chunk_rows if n is None else n
+        X, severity, _ = _patients(rng, n)
+        risk, critical_counts = _risk(X, severity, self.rules)
+        label = (critical_counts > 0) | (rng.random(n) < risk)
+        return {"X": X, "label": label.astype(np.int8), "risk": risk,
+                "critical_count": critical_counts, "rng": rng}
+
+    def chunks(self, rows):
+        """Chunks covering `rows` patients; memory stays at one chunk"""
+        for index, offset in enumerate(range(0, rows, self.chunk_rows)):
+            yield self.chunk(index, min(self.chunk_rows, rows - offset))
+
+    def features(self, rows):
+        """(rows, 7) float32 feature matrix"""
+        if rows <= 0:
+            return np.empty((0, len(FEATURES)), dtype=np.float32)
+        return np.concatenate([c["X"] for c in self.chunks(rows)]).astype(np.float32)
+
+    def feedback_records(self, rows, start=datetime(2026, 1, 1), arrivals_per_min=5.0, model_version="synthetic"):
+        """Lists of feedback records (one list per chunk) shaped like main.save_feedback's"""
+        clock = start
+        for c in self.chunks(rows):
+            rng, X, n = c["rng"], c["X"], len(c["X"])
+            # The "model" sees the true risk through noise, so it sometimes lands in the wrong band
+            ai_probs = np.clip(c["risk"] + rng.normal(0, 0.12, n), 0.0, 1.0)
+            ai_decisions = risk_levels(ai_probs)
+            masks, critical_counts = self.rules.evaluate(X)
+
+            # Clinician read: critical signals -> CRITICAL, other positives -> HIGH RISK,
+            # negatives split at the moderate threshold of the true risk
+            read = np.where(c["label"] == 1, np.where(c["critical_count"] > 0, 3, 2),
+                            np.where(c["risk"] >= MODERATE_THRESHOLD, 1, 0))
+            read = np.minimum(read + (rng.random(n) < ESCALATION_RATE), 3)
+            reviewed = rng.random(n) < REVIEW_RATE
+            gaps = np.cumsum(rng.exponential(60.0 / arrivals_per_min, n))
+
+            batch = []
+            for i in range(n):
+                clinician = CLINICIAN_DECISIONS[read[i]] if reviewed[i] else None
+                batch.append({
+                    "timestamp": (clock + timedelta(seconds=float(gaps[i]))).isoformat(),
+                    "model_version": model_version,
+                    "patient_data": dict(zip(FEATURES, X[i].tolist())),
+                    "ai_risk_probability": float(ai_probs[i]),
+                    "ai_decision": ai_decisions[i],
+                    "ai_signals": self.rules.render(masks[i], critical_counts[i], X[i, _COL["complaint_encoded"]]),
+                    "ai_explanation": f"Predicted risk probability {ai_probs[i]:.2f}. Decision: {ai_decisions[i]}.",
+                    "clinician_decision": clinician,
+                    "clinician_notes": None,
+                    # Clinicians log short labels, so agreement compares risk bands
+                    "agreement": decision_band(clinician) == decision_band(ai_decisions[i]) if clinician else None,
+                })
+            clock += timedelta(seconds=float(gaps[-1]))
+            yield batch
+
+def generate_features(n, seed=0):
+    """(n, 7) float32 feature matrix of synthetic patients"""
+    return SyntheticPatients(seed).features(n)
+
+# =========================
+# Streaming Writers
+# =========================
+
+def _frame(c):
+    import pandas as pd
+    frame = pd.DataFrame(c["X"], columns=FEATURES)
+    frame[INTEGER_FEATURES] = frame[INTEGER_FEATURES].astype(np.int32)
+    frame["label"] = c["label"]
+    return frame
+
+def write_csv(path, rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """Labelled CSV with the columns of triage_synthetic_dataset.csv"""
+    written = 0
+    with open(path, "w", newline="") as f:
+        for c in SyntheticPatients(seed, chunk_rows).chunks(rows):
+            _frame(c).to_csv(f, index=False, header=written == 0)
+            written += len(c["X"])
+    return written
+
+def write_parquet(path, rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """Same columns as write_csv, one row group per chunk"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet output requires pyarrow (pip install pyarrow)") from e
+    writer, written = None, 0
+    try:
+        for c in SyntheticPatients(seed, chunk_rows).chunks(rows):
+            table = pa.Table.from_pandas(_frame(c), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            written += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+def write_feedback(spec, rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """Append feedback records to a store spec ("jsonl", "sqlite:/path/feedback.db", ...)"""
+    from feedback_store import open_feedback_store
+
+    store = open_feedback_store(spec)
+    written = 0
+    try:
+        for batch in SyntheticPatients(seed, chunk_rows).feedback_records(rows):
+            store.append_many(batch)
+            written += len(batch)
+    finally:
+        store.close()
+    return written
+
+# =========================
+# Load Driver
+# =========================
+
+def drive(url, rows, batch_size=1, concurrency=4, binary=True, seed=0, rate=0.0):
+    """Score `rows` synthetic patients against a running server.
+
+    batch_size 1 posts to /predict, larger sizes to /predict_batch. Each
+    client thread draws its own patient stream (seed + thread). With
+    `rate` > 0 the threads together hold that many rows per second.
+    """
+    from triage_client import TriageClient
+
+    latencies, errors, lock = [], [], threading.Lock()
+    scored = [0]
+
+    def worker(t):
+        client = TriageClient(url, binary=binary)
+        n = rows // concurrency + (t < rows % concurrency)
+        X = SyntheticPatients(seed + t, chunk_rows=max(1, min(n, CHUNK_ROWS))).features(n)
+        interval = batch_size * concurrency / rate if rate > 0 else 0.0
+        due = time.perf_counter()
+        local, done = [], 0
+        for offset in range(0, len(X), batch_size):
+            if interval:
+                due += interval
+                time.sleep(max(0.0, due - time.perf_counter()))
+            start = time.perf_counter()
+            try:
+                if batch_size == 1:
+                    client.predict(X[offset])
+                else:
+                    client.predict_batch(X[offset:offset + batch_size])
+            except (OSError, RuntimeError) as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            local.append(time.perf_counter() - start)
+            done += min(batch_size, len(X) - offset)
+        client.close()
+        with lock:
+            latencies.extend(local)
+            scored[0] += done
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    ms = np.asarray(latencies) * 1e3
+    return {
+        "rows": scored[0],
+        "requests": len(latencies),
+        "errors": len(errors),
+        "elapsed_s": elapsed,
+        "rows_per_s": scored[0] / elapsed if elapsed else 0.0,
+        "p50_ms": float(np.percentile(ms, 50)) if len(ms) else None,
+        "p99_ms": float(np.percentile(ms, 99)) if len(ms) else None,
+    }
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, target in (("csv", "output .csv path"), ("parquet", "output .parquet path"),
+                         ("feedback", "feedback store spec, e.g. sqlite:/tmp/feedback.db")):
+        p = sub.add_parser(name)
+        p.add_argument("target", help=target)
+        p.add_argument("--rows", type=int, default=1_000_000)
+        p.add_argument("--seed", type=int, default=0)
+        p.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    p = sub.add_parser("load", help="drive a running server with synthetic patients")
+    p.add_argument("--url", default="http://127.0.0.1:5000")
+    p.add_argument("--rows", type=int, default=100_000)
+    p.add_argument("--batch-size", type=int, default=1)
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--rate", type=float, default=0.0, help="target rows/s (0 = as fast as possible)")
+    p.add_argument("--binary", action="store_true", help="use the float32 wire format")
+    p.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "load":
+        r = drive(args.url, args.rows, args.batch_size, args.concurrency, args.binary, args.seed, args.rate)
+        # No latencies when every request failed
+        p50 = f"{r['p50_ms']:.2f} ms" if r["p50_ms"] is not None else "n/a"
+        p99 = f"{r['p99_ms']:.2f} ms" if r["p99_ms"] is not None else "n/a"
+        print(f"📈 {r['rows']} rows in {r['requests']} requests, {r['elapsed_s']:.1f}s: {r['rows_per_s']:.0f} rows/s, "
+              f"p50 {p50}, p99 {p99}, {r['errors']} errors")
+        sys.exit(1 if r["errors"] else 0)
+
+    writers = {"csv": write_csv, "parquet": write_parquet, "feedback": write_feedback}
+    n = writers[args.command](args.target, args.rows, args.seed, args.chunk_rows)
+    print(f"✅ Wrote {n:,} synthetic patients to {args.target} in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,199 @@
+import os
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+from inference_backends import MODEL_PATH, SCALER_PATH, TFLITE_MODEL_PATH, TFLiteBackend
+from triage_rules import FEATURES, risk_band_index
+
+# =========================
+# Configuration
+# =========================
+
+DATASET_PATH = "triage_synthetic_dataset.csv"
+EXPORT_REPORT_PATH = "tflite_export_report.json"
+
+# Variants written next to TFLITE_MODEL_PATH (model.tflite is "dynamic")
+VARIANTS = ("dynamic", "float16", "int8")
+
+# Max drop vs Keras for a variant to be recommended for the mobile app
+AUC_BUDGET = float(os.environ.get("TRIAGE_TFLITE_AUC_BUDGET", "0.01"))
+ACCURACY_BUDGET = float(os.environ.get("TRIAGE_TFLITE_ACCURACY_BUDGET", "0.01"))
+
+REPRESENTATIVE_ROWS = 500
+EVAL_ROWS = 2000
+LATENCY_RUNS = 500
+THROUGHPUT_BATCH = 1024
+
+def variant_path(variant, base_path=TFLITE_MODEL_PATH):
+    """mobile/.../model.tflite for dynamic, model_<variant>.tflite otherwise"""
+    if variant == "dynamic":
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}_{variant}{ext}"
+
+# =========================
+# Conversion
+# =========================
+
+def convert_tflite(model, variant="dynamic", representative_rows=None):
+    """TFLite flatbuffer bytes for one quantization variant.
+
+    dynamic: int8 weights, float32 activations (the original export)
+    float16: float16 weights, float32 activations
+    int8:    full-integer weights and activations with int8 input/output,
+             calibrated on `representative_rows` (already scaled)
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == "dynamic":
+        converter.target_spec.supported_types = [tf.float32]
+    elif variant == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "int8":
+        if representative_rows is None:
+            raise ValueError("int8 export needs representative_rows for calibration")
+        rows = np.asarray(representative_rows, dtype=np.float32)
+
+        def representative_dataset():
+            for i in range(len(rows)):
+                yield [rows[i:i + 1]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    else:
+        raise ValueError(f"Unknown TFLite variant '{variant}'. Choose from: {', '.join(VARIANTS)}")
+    return converter.convert()
+
+# =========================
+# Evaluation
+# =========================
+
+def labelled_rows(n, dataset_path=DATASET_PATH, seed=0):
+    """(X, y) sample of raw feature rows and labels from the training CSV"""
+    data = np.genfromtxt(dataset_path, delimiter=",", names=True)
+    X = np.column_stack([data[f] for f in FEATURES]).astype(np.float32)
+    y = data["label"].astype(np.float32)
+    idx = np.random.default_rng(seed).choice(len(X), size=min(n, len(X)), replace=False)
+    return X[idx], y[idx]
+
+def _classification_metrics(y, probs):
+    from sklearn.metrics import roc_auc_score
+    auc = float(roc_auc_score(y, probs)) if len(np.unique(y)) == 2 else None
+    return auc, float(np.mean((probs > 0.5) == (y >= 0.5)))
+
+def measure_latency(predict_scaled, Xs, runs=LATENCY_RUNS, batch=THROUGHPUT_BATCH):
+    """Single-row interpreter latency percentiles and batched throughput"""
+    predict_scaled(Xs[:1])  # warm up (tensor allocation)
+    timings = np.empty(runs)
+    for i in range(runs):
+        row = Xs[i % len(Xs):i % len(Xs) + 1]
+        start = time.perf_counter()
+        predict_scaled(row)
+        timings[i] = time.perf_counter() - start
+
+    X_batch = np.resize(Xs, (batch, Xs.shape[1]))
+    predict_scaled(X_batch)
+    repeats = 20
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predict_scaled(X_batch)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "latency_p50_ms": round(float(np.percentile(timings, 50)) * 1e3, 4),
+        "latency_p99_ms": round(float(np.percentile(timings, 99)) * 1e3, 4),
+        "throughput_rows_per_s": round(repeats * batch / elapsed, 1),
+    }
+
+def evaluate_variant(path, X, y, reference, scaler_path=SCALER_PATH):
+    """Drift vs Keras (`reference` probabilities) plus size and CPU latency"""
+    backend = TFLiteBackend(tflite_path=path, scaler_path=scaler_path)
+    Xs = backend.scaler.transform(X).astype(np.float32)
+    probs = backend.predict_scaled(Xs)
+    auc, accuracy = _classification_metrics(y, probs)
+    return {
+        "path": path,
+        "size_kb": round(os.path.getsize(path) / 1024, 2),
+        "auc": auc,
+        "accuracy": accuracy,
+        "max_abs_diff": float(np.max(np.abs(probs - reference))),
+        "band_agreement": float(np.mean(risk_band_index(probs) == risk_band_index(reference))),
+        **measure_latency(backend.predict_scaled, Xs),
+    }
+
+# =========================
+# Export + Report
+# =========================
+
+def export_variants(model, scaler, base_path=TFLITE_MODEL_PATH, dataset_path=DATASET_PATH,
+                    report_path=EXPORT_REPORT_PATH, variants=VARIANTS, scaler_path=SCALER_PATH):
+    """Write every TFLite variant, benchmark it and write the export report.
+
+    The int8 variant is calibrated on rows drawn from the training CSV.
+    The recommended variant is the smallest one whose AUC and accuracy
+    stay within AUC_BUDGET / ACCURACY_BUDGET of the Keras model.
+    """
+    print(f"\n{'='*60}")
+    print("📱 Exporting quantized TFLite variants")
+    print(f"{'='*60}\n")
+
+    X_rep, _ = labelled_rows(REPRESENTATIVE_ROWS, dataset_path, seed=1)
+    X_eval, y_eval = labelled_rows(EVAL_ROWS, dataset_path, seed=0)
+    reference = model.predict(scaler.transform(X_eval), verbose=0).ravel()
+    keras_auc, keras_accuracy = _classification_metrics(y_eval, reference)
+
+    results = {}
+    for variant in variants:
+        path = variant_path(variant, base_path)
+        content = convert_tflite(model, variant, scaler.transform(X_rep))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+
+        metrics = evaluate_variant(path, X_eval, y_eval, reference, scaler_path)
+        metrics["auc_drift"] = None if keras_auc is None or metrics["auc"] is None else keras_auc - metrics["auc"]
+        metrics["accuracy_drift"] = keras_accuracy - metrics["accuracy"]
+        metrics["within_budget"] = (
+            (metrics["auc_drift"] is None or metrics["auc_drift"] <= AUC_BUDGET)
+            and metrics["accuracy_drift"] <= ACCURACY_BUDGET
+        )
+        results[variant] = metrics
+        print(f"  {variant:<8} {metrics['size_kb']:>7.2f} KB  AUC {metrics['auc'] or float('nan'):.4f} "
+              f"(drift {metrics['auc_drift'] or 0.0:+.4f})  p50 {metrics['latency_p50_ms']:.3f} ms  "
+              f"{metrics['throughput_rows_per_s']:.0f} rows/s  {'✅' if metrics['within_budget'] else '❌'}")
+
+    eligible = [v for v in results if results[v]["within_budget"]]
+    recommended = min(eligible, key=lambda v: (results[v]["size_kb"], results[v]["latency_p50_ms"])) if eligible else None
+
+    report = {
+        "created": datetime.utcnow().isoformat(),
+        "eval_rows": int(len(X_eval)),
+        "budget": {"auc": AUC_BUDGET, "accuracy": ACCURACY_BUDGET},
+        "keras": {"auc": keras_auc, "accuracy": keras_accuracy},
+        "variants": results,
+        "recommended": recommended,
+    }
+    tmp_path = report_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, report_path)
+
+    if recommended:
+        print(f"\n✅ Recommended for mobile: {recommended} ({results[recommended]['path']})")
+    else:
+        print("\n⚠️  No variant is within the accuracy budget")
+    print(f"✅ Export report written to {report_path}")
+    return report
+
+if __name__ == "__main__":
+    import joblib
+    import tensorflow as tf
+
+    export_variants(tf.keras.models.load_model(MODEL_PATH), joblib.load(SCALER_PATH))
@@ -0,0 +1,89 @@
+"""Python client for the triage model server.
+
+Speaks the binary wire format (wire_format.py: packed float32 rows in,
+float32 probabilities out) by default, or JSON with binary=False. Keeps
+one persistent HTTP connection; not thread-safe, use one client per thread.
+
+    client = TriageClient("http://127.0.0.1:5000")
+    prob, version = client.predict({"age": 70, "heart_rate": 128, ...})
+    probs, version = client.predict_batch(X)        # (n, 7) in FEATURES order
+"""
+import http.client
+import json
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from triage_rules import FEATURES
+from wire_format import BINARY_MIMETYPE, FEATURE_ORDER, FEATURE_ORDER_HEADER, decode_probs, encode_rows
+
+class TriageClient:
+    def __init__(self, url="http://127.0.0.1:5000", binary=True, timeout=30.0, headers=None):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.binary = binary
+        self.timeout = timeout
+        # e.g. {"X-Model-Slot": "canary"} or {"X-Route-Key": patient_id}
+        self.headers = dict(headers or {})
+        self._conn = None
+
+    def predict(self, features):
+        """(probability, model_version) for one patient (feature dict or row in FEATURES order)"""
+        row = [float(features[k]) for k in FEATURES] if isinstance(features, dict) else features
+        if self.binary:
+            probs, version = self._post_binary("/predict", np.asarray(row).reshape(1, -1))
+            return float(probs[0]), version
+        payload, version = self._post_json("/predict", {"features": dict(zip(FEATURES, map(float, row)))})
+        return payload["probability"], version
+
+    def predict_batch(self, X):
+        """(probabilities, model_version) for an (n, 7) matrix in FEATURES order"""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURES))
+        if self.binary:
+            return self._post_binary("/predict_batch", X)
+        columns = {k: X[:, j].tolist() for j, k in enumerate(FEATURES)}
+        payload, version = self._post_json("/predict_batch", {"columns": columns})
+        return np.asarray(payload["probabilities"], dtype=np.float64), version
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _post_binary(self, path, X):
+        body, headers = self._request(path, encode_rows(X), {
+            "Content-Type": BINARY_MIMETYPE,
+            FEATURE_ORDER_HEADER: FEATURE_ORDER,
+        })
+        return decode_probs(body), headers.get("X-Model-Version")
+
+    def _post_json(self, path, payload):
+        body, headers = self._request(path, json.dumps(payload).encode(), {"Content-Type": "application/json"})
+        return json.loads(body), headers.get("X-Model-Version")
+
+    def _request(self, path, body, headers):
+        headers = {**self.headers, **headers}
+        # One retry on a fresh connection if the server closed an idle keep-alive one
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request("POST", path, body, headers)
+                response = self._conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                self.close()
+                if attempt:
+                    raise
+                continue
+            if response.getheader("Connection", "").lower() == "close" or response.version == 10:
+                self.close()
+            if response.status != 200:
+                raise RuntimeError(f"{path} returned {response.status}: {data[:200]!r}")
+            return data, response.headers
@@ -0,0 +1,322 @@
+import os
+import json
+import operator
+
+import numpy as np
+
+# =========================
+# Feature Schema
+# =========================
+
+FEATURES = [
+    "age",
+    "heart_rate",
+    "oxygen",
+    "temperature",
+    "pain_scale",
+    "waiting_time",
+    "complaint_encoded"
+]
+
+def features_matrix(patients, default=None):
+    """Stack a list of patient feature dicts into an (n, 7) float matrix.
+
+    Missing keys raise KeyError unless `default` is given.
+    """
+    if default is None:
+        rows = [[float(p[k]) for k in FEATURES] for p in patients]
+    else:
+        rows = [[float(p.get(k, default)) for k in FEATURES] for p in patients]
+    return np.array(rows, dtype=np.float64).reshape(len(rows), len(FEATURES))
+
+def rows_to_patients(X):
+    """Inverse of features_matrix: one feature dict per row"""
+    return [dict(zip(FEATURES, map(float, row))) for row in np.asarray(X)]
+
+COMPLAINT_CATEGORIES = {
+    0: "General complaint",
+    1: "Respiratory issue",
+    2: "Chest pain/cardiac",
+    3: "Trauma/injury"
+}
+
+def complaint_category(code):
+    """Human-readable chief complaint for a complaint_encoded value"""
+    try:
+        return COMPLAINT_CATEGORIES.get(int(code), "Unknown")
+    except (TypeError, ValueError):
+        return "Unknown"
+
+# =========================
+# Risk Classification Logic
+# =========================
+
+CRITICAL_THRESHOLD = 0.8
+MODERATE_THRESHOLD = 0.4
+
+RISK_LABELS = np.array([
+    "LOW RISK - Routine",
+    "MODERATE RISK - Monitor closely",
+    "HIGH RISK - Immediate attention",
+])
+
+def risk_level(prob):
+    """Classify risk based on probability thresholds"""
+    if prob >= CRITICAL_THRESHOLD:
+        return "HIGH RISK - Immediate attention"
+    elif prob >= MODERATE_THRESHOLD:
+        return "MODERATE RISK - Monitor closely"
+    else:
+        return "LOW RISK - Routine"
+
+def risk_band_index(probs):
+    """Vectorized risk band: 0 = low, 1 = moderate, 2 = high"""
+    probs = np.asarray(probs, dtype=np.float64)
+    return (probs >= MODERATE_THRESHOLD).astype(np.int8) + (probs >= CRITICAL_THRESHOLD).astype(np.int8)
+
+def decision_band(decision):
+    """Collapse free-text AI/clinician decisions to HIGH, MODERATE, LOW or OTHER.
+
+    Clinicians log labels such as "CRITICAL" and older logs use an en dash
+    in "HIGH RISK – Immediate attention", so match on the leading word.
+    """
+    if not decision:
+        return None
+    head = decision.strip().upper()
+    if head.startswith(("HIGH", "CRITICAL")):
+        return "HIGH"
+    if head.startswith("MODERATE"):
+        return "MODERATE"
+    if head.startswith("LOW"):
+        return "LOW"
+    return "OTHER"
+
+def risk_levels(probs):
+    """Vectorized risk_level over an array of probabilities"""
+    return RISK_LABELS[risk_band_index(probs)].tolist()
+
+# =========================
+# Enhanced Rule-Based Clinical Signals
+# =========================
+# Declarative rule table. Rules sharing a `group` behave like an if/elif
+# chain: the first matching rule in table order wins. Each rule owns one bit
+# in the per-patient signal mask, so bulk evaluation is a handful of NumPy
+# comparisons and strings are only rendered on demand. Point
+# TRIAGE_SIGNAL_RULES at a JSON file with the same structure to tune
+# thresholds without code edits (`python triage_rules.py dump-rules`).
+
+DEFAULT_SIGNAL_RULES = {
+    "multi_critical_min": 2,
+    "multi_critical_message": "🚨 MULTIPLE CRITICAL INDICATORS PRESENT",
+    "normal_message": "All vital signs within normal range",
+    "rules": [
+        # Oxygen saturation (SpO2)
+        {"id": "spo2_severe", "group": "oxygen", "feature": "oxygen", "op": "<", "value": 85,
+         "critical": True, "message": "⚠️  CRITICAL: Severe hypoxemia (SpO2 < 85%)"},
+        {"id": "spo2_low", "group": "oxygen", "feature": "oxygen", "op": "<", "value": 90,
+         "message": "⚠️  Low oxygen saturation (SpO2 < 90%)"},
+        {"id": "spo2_borderline", "group": "oxygen", "feature": "oxygen", "op": "<", "value": 93,
+         "message": "Borderline oxygen level (SpO2 < 93%)"},
+        # Heart rate (tachycardia/bradycardia)
+        {"id": "hr_severe_tachy", "group": "heart_rate", "feature": "heart_rate", "op": ">", "value": 140,
+         "critical": True, "message": "⚠️  CRITICAL: Severe tachycardia (HR > 140)"},
+        {"id": "hr_elevated", "group": "heart_rate", "feature": "heart_rate", "op": ">", "value": 120,
+         "message": "⚠️  Elevated heart rate (HR > 120)"},
+        {"id": "hr_brady", "group": "heart_rate", "feature": "heart_rate", "op": "<", "value": 50,
+         "message": "⚠️  Bradycardia detected (HR < 50)"},
+        # Temperature (fever/hypothermia)
+        {"id": "temp_high_fever", "group": "temperature", "feature": "temperature", "op": ">=", "value": 39.5,
+         "critical": True, "message": "⚠️  CRITICAL: High fever (≥ 39.5°C)"},
+        {"id": "temp_fever", "group": "temperature", "feature": "temperature", "op": ">=", "value": 38.5,
+         "message": "⚠️  Moderate fever (≥ 38.5°C)"},
+        {"id": "temp_hypothermia", "group": "temperature", "feature": "temperature", "op": "<", "value": 36.0,
+         "message": "⚠️  Hypothermia (< 36°C)"},
+        # Pain scale
+        {"id": "pain_severe", "group": "pain", "feature": "pain_scale", "op": ">=", "value": 9,
+         "critical": True, "message": "⚠️  CRITICAL: Severe pain (9-10/10)"},
+        {"id": "pain_significant", "group": "pain", "feature": "pain_scale", "op": ">=", "value": 7,
+         "message": "⚠️  Significant pain (7-8/10)"},
+        {"id": "pain_moderate", "group": "pain", "feature": "pain_scale", "op": ">=", "value": 4,
+         "message": "Moderate pain (4-6/10)"},
+        # Waiting time
+        {"id": "wait_prolonged", "group": "waiting_time", "feature": "waiting_time", "op": ">", "value": 60,
+         "message": "⚠️  Prolonged waiting time (> 1 hour)"},
+        {"id": "wait_extended", "group": "waiting_time", "feature": "waiting_time", "op": ">", "value": 30,
+         "message": "Extended waiting time (> 30 minutes)"},
+        # Age considerations
+        {"id": "age_elderly", "group": "age", "feature": "age", "op": ">=", "value": 75,
+         "message": "👴 Elderly patient (≥ 75 years) - increased risk"},
+        {"id": "age_older", "group": "age", "feature": "age", "op": ">=", "value": 65,
+         "message": "Older adult (65-74 years)"},
+    ],
+}
+
+_OPS = {
+    "<": (np.less, operator.lt),
+    "<=": (np.less_equal, operator.le),
+    ">": (np.greater, operator.gt),
+    ">=": (np.greater_equal, operator.ge),
+}
+
+class RuleTable:
+    """Compiled signal rule table (at most 64 rules, one mask bit each)"""
+
+    def __init__(self, spec):
+        rules = spec["rules"]
+        if len(rules) > 64:
+            raise ValueError("Signal rule tables support at most 64 rules")
+        for rule in rules:
+            if rule["feature"] not in FEATURES:
+                raise ValueError(f"Rule '{rule['id']}' uses unknown feature '{rule['feature']}'")
+            if rule["op"] not in _OPS:
+                raise ValueError(f"Rule '{rule['id']}' uses unsupported op '{rule['op']}'")
+        self.spec = spec
+        self.rules = rules
+        self.ids = [r["id"] for r in rules]
+        self.messages = [r["message"] for r in rules]
+        self.multi_critical_min = spec.get("multi_critical_min", 2)
+        self.multi_critical_message = spec["multi_critical_message"]
+        self.normal_message = spec["normal_message"]
+        self.mask_dtype = np.uint32 if len(rules) <= 32 else np.uint64
+        self.critical_mask = sum(1 << i for i, r in enumerate(rules) if r.get("critical"))
+        self._columns = [FEATURES.index(r["feature"]) for r in rules]
+        self._groups = {}
+        for i, rule in enumerate(rules):
+            self._groups.setdefault(rule["group"], []).append(i)
+        # Pre-bound (feature, op, value, bit, critical, message) tuples for the scalar path
+        self._scalar_groups = [
+            [(rules[i]["feature"], _OPS[rules[i]["op"]][1], rules[i]["value"], 1 << i,
+              int(bool(rules[i].get("critical"))), rules[i]["message"]) for i in indices]
+            for indices in self._groups.values()
+        ]
+
+    def bit(self, rule_id):
+        """Mask bit for a rule id"""
+        return 1 << self.ids.index(rule_id)
+
+    def evaluate(self, X):
+        """Signal masks and critical counts for an (n, 7) feature matrix"""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURES))
+        masks = np.zeros(len(X), dtype=self.mask_dtype)
+        critical_counts = np.zeros(len(X), dtype=np.int8)
+        for indices in self._groups.values():
+            unmatched = np.ones(len(X), dtype=bool)
+            for i in indices:
+                rule = self.rules[i]
+                hit = _OPS[rule["op"]][0](X[:, self._columns[i]], rule["value"]) & unmatched
+                unmatched &= ~hit
+                masks[hit] |= self.mask_dtype(1 << i)
+                if rule.get("critical"):
+                    critical_counts += hit
+        return masks, critical_counts
+
+    def evaluate_one(self, data):
+        """Scalar fast path of evaluate() for a single feature dict"""
+        mask, critical_count = 0, 0
+        for group in self._scalar_groups:
+            for feature, op, value, bit, critical, _ in group:
+                if op(data[feature], value):
+                    mask |= bit
+                    critical_count += critical
+                    break
+        return mask, critical_count
+
+    def signals_one(self, data):
+        """evaluate_one + render in a single pass over the table"""
+        signals, critical_count = [], 0
+        for group in self._scalar_groups:
+            for feature, op, value, _, critical, message in group:
+                if op(data[feature], value):
+                    signals.append(message)
+                    critical_count += critical
+                    break
+        signals.append(f"Chief complaint: {complaint_category(data.get('complaint_encoded', 0))}")
+        if critical_count >= self.multi_critical_min:
+            signals.insert(0, self.multi_critical_message)
+        return signals
+
+    def render(self, mask, critical_count, complaint_code):
+        """Signal strings for one mask, in rule-table order"""
+        mask = int(mask)
+        signals = []
+        i = 0
+        while mask:
+            if mask & 1:
+                signals.append(self.messages[i])
+            mask >>= 1
+            i += 1
+        signals.append(f"Chief complaint: {complaint_category(complaint_code)}")
+        if critical_count >= self.multi_critical_min:
+            signals.insert(0, self.multi_critical_message)
+        return signals if signals else [self.normal_message]
+
+def load_rule_table(path=None):
+    """Rule table from a JSON file, or the built-in defaults"""
+    if not path:
+        return RuleTable(DEFAULT_SIGNAL_RULES)
+    with open(path, "r", encoding="utf-8") as f:
+        return RuleTable(json.load(f))
+
+SIGNAL_RULES = load_rule_table(os.environ.get("TRIAGE_SIGNAL_RULES"))
+
+def signal_masks(X, rules=None):
+    """Vectorized rule evaluation: (masks, critical_counts) for every row"""
+    return (rules or SIGNAL_RULES).evaluate(X)
+
+def extract_signals(data, rules=None):
+    """Extract clinically significant signals from patient data"""
+    return (rules or SIGNAL_RULES).signals_one(data)
+
+def extract_signals_batch(X, rules=None):
+    """extract_signals for every row of an (n, 7) feature matrix"""
+    rules = rules or SIGNAL_RULES
+    X = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURES))
+    masks, critical_counts = rules.evaluate(X)
+    complaints = X[:, FEATURES.index("complaint_encoded")]
+    return [rules.render(m, c, code) for m, c, code in zip(masks, critical_counts, complaints)]
+
+# =========================
+# Retrospective Signal Audit
+# =========================
+
+def audit_signals(X, rules=None):
+    """Signal prevalence over a whole dataset in one vectorized pass"""
+    rules = rules or SIGNAL_RULES
+    masks, critical_counts = rules.evaluate(X)
+    masks = masks.astype(np.uint64)
+    counts = {rule_id: int(np.count_nonzero(masks & np.uint64(1 << i)))
+              for i, rule_id in enumerate(rules.ids)}
+    return {
+        "patients": int(len(masks)),
+        "rule_counts": counts,
+        "multi_critical": int(np.count_nonzero(critical_counts >= rules.multi_critical_min)),
+        "no_vital_signals": int(np.count_nonzero(masks == 0)),
+    }
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Signal rule table tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    d = sub.add_parser("dump-rules", help="write the active rule table as JSON")
+    d.add_argument("path", nargs="?", default="-")
+    a = sub.add_parser("audit", help="signal prevalence over a CSV or feedback store")
+    a.add_argument("--csv", default=None, help="CSV with FEATURES columns")
+    a.add_argument("--store", default=None, help="feedback store spec, e.g. sqlite:feedback.db")
+    args = parser.parse_args()
+
+    if args.command == "dump-rules":
+        text = json.dumps(SIGNAL_RULES.spec, indent=2, ensure_ascii=False)
+        if args.path == "-":
+            print(text)
+        else:
+            with open(args.path, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+    elif args.command == "audit":
+        if args.store:
+            from feedback_store import open_feedback_store
+            X, _ = open_feedback_store(args.store).feature_rows()
+        else:
+            data = np.genfromtxt(args.csv or "triage_synthetic_dataset.csv", delimiter=",", names=True)
+            X = np.column_stack([data[f] for f in FEATURES])
+        print(json.dumps(audit_signals(X), indent=2))
@@ -0,0 +1,456 @@
+import os
+import json
+import time
+import queue
+import threading
+
+import numpy as np
+
+from instrumentation import stage
+from triage_rules import FEATURES, SIGNAL_RULES, risk_levels
+
+# =========================
+# Configuration
+# =========================
+
+# Patients tracked per process; the least recently seen one is evicted when full
+STREAM_CAPACITY = int(os.environ.get("TRIAGE_STREAM_CAPACITY", "4096"))
+# Samples kept per patient and channel in the rolling window
+STREAM_WINDOW = int(os.environ.get("TRIAGE_STREAM_WINDOW", "64"))
+# Features bedside monitors send continuously; they get ring buffers. The
+# rest (age, complaint, ...) are sent once or rarely and only keep their latest value.
+STREAM_CHANNELS = [c for c in os.environ.get(
+    "TRIAGE_STREAM_CHANNELS", "heart_rate,oxygen,temperature").split(",") if c]
+
+# Re-infer when a feature moves this far from the value last scored, even
+# inside one signal band. "heart_rate=5,oxygen=1" overrides single entries.
+DEFAULT_STREAM_DELTAS = {"heart_rate": 10.0, "oxygen": 2.0, "temperature": 0.5, "pain_scale": 2.0}
+
+def parse_deltas(spec):
+    deltas = dict(DEFAULT_STREAM_DELTAS)
+    for item in filter(None, (spec or "").split(",")):
+        feature, _, value = item.partition("=")
+        if feature not in FEATURES:
+            raise ValueError(f"Unknown feature '{feature}' in TRIAGE_STREAM_DELTAS")
+        deltas[feature] = float(value)
+    return deltas
+
+STREAM_DELTAS = parse_deltas(os.environ.get("TRIAGE_STREAM_DELTAS"))
+
+# A streaming request scores its pending samples after this many lines or
+# this long after the first pending one, whichever comes first
+STREAM_BATCH_LINES = int(os.environ.get("TRIAGE_STREAM_BATCH_LINES", "512"))
+STREAM_FLUSH_MS = float(os.environ.get("TRIAGE_STREAM_FLUSH_MS", "50"))
+
+_COLUMN = {k: j for j, k in enumerate(FEATURES)}
+_COMPLAINT = _COLUMN["complaint_encoded"]
+
+# =========================
+# Rolling Per-Patient State
+# =========================
+# Everything lives in preallocated arrays indexed by a patient slot: the
+# latest value of each feature, the vector and signal mask at the last
+# forward pass, and one ring buffer per streamed channel. A chunk of
+# samples is applied with a few fancy-indexed writes, and the patients it
+# touched are re-scored together in one forward pass, only if one of their
+# features crossed a signal-rule band (the extract_signals mask changed) or
+# drifted more than STREAM_DELTAS from the value last scored.
+
+class VitalsState:
+    def __init__(self, capacity=STREAM_CAPACITY, window=STREAM_WINDOW, channels=STREAM_CHANNELS,
+                 deltas=STREAM_DELTAS, rules=None):
+        unknown = [c for c in channels if c not in _COLUMN]
+        if unknown:
+            raise ValueError(f"Unknown stream channels: {', '.join(unknown)}")
+        self.capacity = capacity
+        self.window = window
+        self.channels = list(channels)
+        self.rules = rules or SIGNAL_RULES
+        # Feature column -> ring channel (-1: latest value only)
+        self._channel_of = np.full(len(FEATURES), -1, dtype=np.int64)
+        for i, c in enumerate(self.channels):
+            self._channel_of[_COLUMN[c]] = i
+        self._deltas = np.array([deltas.get(k, np.inf) for k in FEATURES], dtype=np.float64)
+
+        n_features, n_channels = len(FEATURES), len(self.channels)
+        self.current = np.full((capacity, n_features), np.nan)
+        self.scored = np.full((capacity, n_features), np.nan)
+        self.masks = np.zeros(capacity, dtype=self.rules.mask_dtype)
+        self.probs = np.full(capacity, np.nan, dtype=np.float32)
+        self.last_seen = np.zeros(capacity)
+        self.ring = np.full((capacity, n_channels, window), np.nan, dtype=np.float32)
+        self.ring_t = np.zeros((capacity, n_channels, window))
+        self.heads = np.zeros((capacity, n_channels), dtype=np.int64)
+
+        self.ids = [None] * capacity
+        self._slots = {}
+        self._free = list(range(capacity - 1, -1, -1))
+        # Bumped on every eviction/discharge so sessions can drop buffered
+        # samples whose slot changed hands before they were applied
+        self.generation = 0
+        self._lock = threading.Lock()
+        self.counters = {"samples": 0, "readings": 0, "chunks": 0, "inferences": 0, "forward_passes": 0, "evictions": 0}
+
+    # -------- slots --------
+
+    def slot(self, patient_id):
+        """Slot of a patient, allocating one (evicting the stalest) if new; call under the lock"""
+        s = self._slots.get(patient_id)
+        if s is not None:
+            return s
+        if self._free:
+            s = self._free.pop()
+        else:
+            s = int(np.argmin(self.last_seen))
+            self._release(s)
+            self._free.pop()
+            self.counters["evictions"] += 1
+        self.ids[s] = patient_id
+        self._slots[patient_id] = s
+        self.last_seen[s] = time.monotonic()
+        return s
+
+    def _release(self, s):
+        del self._slots[self.ids[s]]
+        self.ids[s] = None
+        self.current[s] = np.nan
+        self.scored[s] = np.nan
+        self.masks[s] = 0
+        self.probs[s] = np.nan
+        self.ring[s] = np.nan
+        self.heads[s] = 0
+        self._free.append(s)
+        self.generation += 1
+
+    def discharge(self, patient_id):
+        with self._lock:
+            s = self._slots.get(patient_id)
+            if s is not None:
+                self._release(s)
+            return s is not None
+
+    # -------- ingestion --------
+
+    def apply(self, slots, columns, values, times, samples=None):
+        """Write one chunk of readings (parallel arrays, arrival order); returns the touched slots.
+
+        `samples` is the number of input lines they came from (default: one per reading).
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        times = np.asarray(times, dtype=np.float64)
+        n_features = len(FEATURES)
+
+        # Latest value per (slot, feature): first hit in reversed order is the last sample
+        keys = slots * n_features + columns
+        last_keys, first = np.unique(keys[::-1], return_index=True)
+        self.current.reshape(-1)[last_keys] = values[::-1][first]
+        touched = np.unique(slots)
+        self.last_seen[touched] = time.monotonic()
+
+        channel = self._channel_of[columns]
+        streamed = channel >= 0
+        if streamed.any():
+            self._push(slots[streamed], channel[streamed], values[streamed], times[streamed])
+        self.counters["samples"] += len(values) if samples is None else samples
+        self.counters["readings"] += len(values)
+        self.counters["chunks"] += 1
+        return touched
+
+    def _push(self, slots, channels, values, times):
+        # Rank each sample within its (slot, channel) group so a chunk can
+        # carry several samples per patient and still land in order
+        n_channels = len(self.channels)
+        keys = slots * n_channels + channels
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        sizes = np.diff(np.r_[starts, len(keys)])
+        rank = np.arange(len(keys)) - np.repeat(starts, sizes)
+        # Only the newest `window` samples of a group survive the wrap-around
+        keep = rank >= np.repeat(sizes, sizes) - self.window
+        heads = self.heads.reshape(-1)
+        pos = (heads[keys] + rank) % self.window
+        s, c = slots[order][keep], channels[order][keep]
+        self.ring[s, c, pos[keep]] = values[order][keep]
+        self.ring_t[s, c, pos[keep]] = times[order][keep]
+        group_keys = keys[starts]
+        heads[group_keys] += sizes
+
+    def due(self, touched):
+        """(slots, reasons, feature rows) among `touched` that need a forward pass"""
+        X = self.current[touched]
+        complete = ~np.isnan(X).any(axis=1)
+        touched, X = touched[complete], X[complete]
+        if not len(touched):
+            return touched, np.empty(0, dtype=object), X
+        masks, _ = self.rules.evaluate(X)
+        scored = self.scored[touched]
+        new = np.isnan(scored).any(axis=1)
+        band = masks != self.masks[touched]
+        with np.errstate(invalid="ignore"):
+            drift = (np.abs(X - scored) > self._deltas).any(axis=1)
+        hit = new | band | drift
+        reasons = np.where(new, "new", np.where(band, "band", "delta"))[hit]
+        return touched[hit], reasons, X[hit]
+
+    def commit(self, slots, ids, X, probs):
+        """Record a forward pass; skips slots reassigned while it ran"""
+        live = np.array([self.ids[s] == pid for s, pid in zip(slots, ids)], dtype=bool)
+        slots, X, probs = slots[live], X[live], probs[live]
+        self.scored[slots] = X
+        self.masks[slots], _ = self.rules.evaluate(X)
+        self.probs[slots] = probs
+        self.counters["inferences"] += len(slots)
+        self.counters["forward_passes"] += 1
+        return live
+
+    # -------- reads --------
+
+    def history(self, patient_id):
+        """Rolling window of every channel (oldest first), latest values and last score"""
+        with self._lock:
+            s = self._slots.get(patient_id)
+            if s is None:
+                return None
+            channels = {}
+            for i, name in enumerate(self.channels):
+                count = min(int(self.heads[s, i]), self.window)
+                idx = (self.heads[s, i] - count + np.arange(count)) % self.window
+                channels[name] = {"t": self.ring_t[s, i, idx].tolist(),
+                                  "values": self.ring[s, i, idx].astype(float).tolist()}
+            prob = float(self.probs[s])
+            return {
+                "patient_id": patient_id,
+                "features": {k: (None if np.isnan(v) else float(v)) for k, v in zip(FEATURES, self.current[s])},
+                "probability": None if np.isnan(prob) else prob,
+                "channels": channels,
+            }
+
+    def stats(self):
+        with self._lock:
+            samples, inferences = self.counters["samples"], self.counters["inferences"]
+            return dict(
+                self.counters,
+                patients=len(self._slots),
+                capacity=self.capacity,
+                window=self.window,
+                channels=self.channels,
+                inferences_per_sample=inferences / samples if samples else 0.0,
+                state_bytes=sum(a.nbytes for a in (self.current, self.scored, self.masks, self.probs,
+                                                    self.last_seen, self.ring, self.ring_t, self.heads)),
+            )
+
+# =========================
+# Ingestion Sessions
+# =========================
+
+class IngestSession:
+    """One telemetry stream: NDJSON lines in, NDJSON updates out.
+
+    Each line is a sample {"patient_id": ..., "t": <epoch s>, <feature>: value, ...}
+    carrying any subset of the 7 features (monitors send vitals; admission
+    sends age, complaint, pain and waiting time once), or
+    {"patient_id": ..., "discharge": true}. Lines are buffered and applied
+    as a chunk; flush() returns one update per re-scored patient. A patient
+    is first scored once all 7 features are known.
+    """
+
+    def __init__(self, state, score_fn):
+        self.state = state
+        self.score_fn = score_fn
+        self.lines = 0
+        self.errors = 0
+        self._pending = ([], [], [], [], [])
+        self._pending_samples = 0
+        self._generation = None
+        self._discharges = []
+        self._pending_since = None
+        self._pending_lines = 0
+        self._out = []
+
+    def feed(self, line):
+        """Buffer one line; returns updates if the chunk is due"""
+        line = line.strip()
+        if not line:
+            return []
+        self.lines += 1
+        with stage("json_parse"):
+            try:
+                sample = json.loads(line)
+                self._add(sample)
+            except (ValueError, TypeError, KeyError, AttributeError) as e:
+                self.errors += 1
+                self._out.append({"error": f"{type(e).__name__}: {e}", "line": self.lines})
+        self._pending_lines += 1
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+        if (self._pending_lines >= STREAM_BATCH_LINES
+                or (time.monotonic() - self._pending_since) * 1000.0 >= STREAM_FLUSH_MS):
+            return self.flush()
+        return []
+
+    def flush_wait(self):
+        """Seconds until buffered samples are due (0 if overdue), or None with nothing buffered"""
+        if self._pending_since is None:
+            return None
+        return max(0.0, self._pending_since + STREAM_FLUSH_MS / 1000.0 - time.monotonic())
+
+    def _add(self, sample):
+        patient_id = str(sample["patient_id"])
+        if sample.get("discharge"):
+            self._discharges.append(patient_id)
+            return
+        t = float(sample.get("t") or time.time())
+        values = [(_COLUMN[k], float(v)) for k, v in sample.items() if k in _COLUMN]
+        if not values:
+            return
+        with self.state._lock:
+            s = self.state.slot(patient_id)
+            if self._generation is None:
+                self._generation = self.state.generation
+        slots, columns, vals, times, ids = self._pending
+        self._pending_samples += 1
+        for column, value in values:
+            ids.append(patient_id)
+            slots.append(s)
+            columns.append(column)
+            vals.append(value)
+            times.append(t)
+
+    def _apply(self):
+        slots, columns, values, times, ids = self._pending
+        generation, self._generation = self._generation, None
+        samples, self._pending_samples = self._pending_samples, 0
+        self._pending = ([], [], [], [], [])
+        if not slots:
+            return np.empty(0, dtype=np.int64)
+        with stage("feature_assembly"):
+            with self.state._lock:
+                if generation != self.state.generation:
+                    owners = self.state.ids
+                    live = [i for i, (s, pid) in enumerate(zip(slots, ids)) if owners[s] == pid]
+                    if len(live) < len(slots):
+                        slots, columns, values, times = ([a[i] for i in live]
+                                                         for a in (slots, columns, values, times))
+                        if not slots:
+                            return np.empty(0, dtype=np.int64)
+                return self.state.apply(slots, columns, values, times, samples)
+
+    def flush(self):
+        """Apply buffered samples and score the patients that need it"""
+        touched = self._apply()
+        self._pending_since = None
+        self._pending_lines = 0
+        out, self._out = self._out, []
+        out.extend(self._score(touched))
+        for patient_id in self._discharges:
+            out.append({"patient_id": patient_id, "discharged": self.state.discharge(patient_id)})
+        self._discharges = []
+        return out
+
+    def _score(self, touched):
+        out = []
+        if not len(touched):
+            return out
+        state = self.state
+        with state._lock:
+            slots, reasons, X = state.due(touched)
+            ids = [state.ids[s] for s in slots]
+        if not len(slots):
+            return out
+
+        probs, version = self.score_fn(X)
+        probs = np.asarray(probs, dtype=np.float32).reshape(-1)
+        with state._lock:
+            live = state.commit(slots, ids, X, probs)
+        with stage("extract_signals"):
+            masks, critical_counts = state.rules.evaluate(X)
+        decisions = risk_levels(probs)
+        for i in np.flatnonzero(live):
+            out.append({
+                "patient_id": ids[i],
+                "probability": float(probs[i]),
+                "decision": decisions[i],
+                "signals": state.rules.render(masks[i], critical_counts[i], X[i, _COMPLAINT]),
+                "reason": str(reasons[i]),
+                "model_version": version,
+            })
+        return out
+
+    def summary(self):
+        return {"lines": self.lines, "errors": self.errors, "stream": self.state.stats()}
+
+def body_lines(stream, content_length=None, block_size=1 << 16):
+    """Lines of a request body as they arrive.
+
+    A body with a known length is a bounded upload (e.g. a replayed
+    recording) and is read in large blocks. A chunked body is a live stream
+    and is read line by line, so a slow monitor's samples are not held back
+    waiting for a block to fill.
+    """
+    if content_length is None:
+        yield from stream
+        return
+    tail = b""
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        *lines, tail = (tail + block).split(b"\n")
+        yield from lines
+    if tail:
+        yield tail
+
+_END = object()
+
+def _read_lines(lines, inbox, stop):
+    try:
+        for line in lines:
+            if stop.is_set():
+                return
+            inbox.put(line)
+    except Exception as e:
+        inbox.put(e)
+    finally:
+        inbox.put(_END)
+
+def _timed_lines(session, lines):
+    """Yield (line or None) from a reader thread; None means the flush deadline passed.
+
+    feed() only checks TRIAGE_STREAM_FLUSH_MS when a line arrives, so on a
+    live stream a quiet monitor's last sample would wait for its next one.
+    """
+    inbox, stop = queue.Queue(), threading.Event()
+    reader = threading.Thread(target=_read_lines, args=(lines, inbox, stop), name="ingest-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            try:
+                item = inbox.get(timeout=session.flush_wait())
+            except queue.Empty:
+                yield None
+                continue
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def ingest_lines(state, score_fn, lines, live=False):
+    """Generator of NDJSON update lines for an iterable of input lines (bytes or str).
+
+    With `live` (a chunked request body), lines are read on a thread so
+    buffered samples are flushed on time even while the stream is quiet.
+    """
+    session = IngestSession(state, score_fn)
+    for line in (_timed_lines(session, lines) if live else lines):
+        updates = session.flush() if line is None else session.feed(line)
+        for update in updates:
+            yield json.dumps(update, ensure_ascii=False) + "\n"
+    for update in session.flush():
+        yield json.dumps(update, ensure_ascii=False) + "\n"
+    yield json.dumps({"summary": session.summary()}, ensure_ascii=False) + "\n"
@@ -0,0 +1,42 @@
+import numpy as np
+
+from triage_rules import FEATURES
+
+# =========================
+# Binary Wire Format
+# =========================
+# Request bodies are packed little-endian float32 rows in FEATURES order,
+# 28 bytes per patient, read with np.frombuffer straight into the matrix
+# the model scores (the batcher and backends run in float32 anyway).
+# Responses are one little-endian float32 probability per row. Callers may
+# send X-Feature-Order (comma-separated names) to have the column order
+# checked; responses always carry it.
+
+BINARY_MIMETYPE = "application/x-triage-f32"
+ROW_DTYPE = np.dtype("<f4")
+ROW_BYTES = ROW_DTYPE.itemsize * len(FEATURES)
+FEATURE_ORDER_HEADER = "X-Feature-Order"
+FEATURE_ORDER = ",".join(FEATURES)
+
+def check_feature_order(header):
+    """Reject a declared column order that differs from FEATURES"""
+    if header and header.replace(" ", "") != FEATURE_ORDER:
+        raise ValueError(f"{FEATURE_ORDER_HEADER} must be '{FEATURE_ORDER}'")
+
+def decode_rows(body):
+    """(n, 7) float32 view of a packed request body (no copy; read-only)"""
+    if len(body) % ROW_BYTES:
+        raise ValueError(f"binary body must be a multiple of {ROW_BYTES} bytes ({len(FEATURES)} float32 per row)")
+    return np.frombuffer(body, dtype=ROW_DTYPE).reshape(-1, len(FEATURES))
+
+def encode_rows(X):
+    """Packed request body for an (n, 7) feature matrix"""
+    X = np.asarray(X).reshape(-1, len(FEATURES))
+    return np.ascontiguousarray(X, dtype=ROW_DTYPE).tobytes()
+
+def encode_probs(probs):
+    """Response body: one float32 per row"""
+    return np.ascontiguousarray(probs, dtype=ROW_DTYPE).reshape(-1).tobytes()
+
+def decode_probs(body):
+    return np.frombuffer(body, dtype=ROW_DTYPE)